@@ -0,0 +1,125 @@
+import json
+import os
+import random
+from typing import Optional
+
+
+# ========================================================================= #
+# Synthetic COCO                                                            #
+# ========================================================================= #
+
+
+def make_coco(
+    root: str,
+    num_images: int,
+    annos_per_image: int = 10,
+    num_categories: int = 10,
+    rel_instance_file: str = 'annotations/instances_default.json',
+    seed: Optional[int] = 7777,
+) -> str:
+    # write the file incrementally so that generating large datasets does not need much memory
+    rng = random.Random(seed)
+    path = os.path.join(root, rel_instance_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as fp:
+        fp.write('{"licenses": [{"name": "", "id": 0, "url": ""}], "info": {"contributor": "", "description": ""},\n')
+        fp.write('"categories": ')
+        json.dump([{'id': i + 1, 'name': f'category_{i}', 'supercategory': ''} for i in range(num_categories)], fp)
+        # images
+        fp.write(',\n"images": [\n')
+        for i in range(num_images):
+            if i: fp.write(',\n')
+            json.dump({'id': i + 1, 'width': 1920, 'height': 1080, 'file_name': f'image_{i:08d}.jpg', 'license': 0}, fp)
+        # annotations
+        fp.write('\n],\n"annotations": [\n')
+        for i in range(num_images * annos_per_image):
+            if i: fp.write(',\n')
+            x, y = rng.uniform(0, 1800), rng.uniform(0, 1000)
+            w, h = rng.uniform(1, 1920 - x), rng.uniform(1, 1080 - y)
+            json.dump({
+                'id': i + 1,
+                'image_id': (i // annos_per_image) + 1,
+                'category_id': rng.randint(1, num_categories),
+                'segmentation': [],
+                'area': round(w * h, 2),
+                'bbox': [round(x, 2), round(y, 2), round(w, 2), round(h, 2)],
+                'iscrowd': 0,
+                'attributes': {'occluded': False},
+            }, fp)
+        fp.write('\n]}\n')
+    return path
+
+
+# ========================================================================= #
+# Synthetic YOLO                                                            #
+# ========================================================================= #
+
+
+def make_yolo(
+    root: str,
+    num_images: int,
+    annos_per_image: int = 10,
+    num_classes: int = 10,
+    images_per_dir: int = 1000,
+    seed: Optional[int] = 7777,
+) -> str:
+    # empty image files and one label file per image, split over sub-directories
+    rng = random.Random(seed)
+    with open(os.path.join(root, 'classes.txt'), 'w') as fp:
+        fp.write(''.join(f'category_{i}\n' for i in range(num_classes)))
+    for i in range(num_images):
+        rel_dir = f'{i // images_per_dir:04d}'
+        if i % images_per_dir == 0:
+            os.makedirs(os.path.join(root, 'images', rel_dir), exist_ok=True)
+            os.makedirs(os.path.join(root, 'labels', rel_dir), exist_ok=True)
+        open(os.path.join(root, 'images', rel_dir, f'image_{i:08d}.jpg'), 'w').close()
+        lines = []
+        for _ in range(annos_per_image):
+            w, h = rng.uniform(0.01, 0.5), rng.uniform(0.01, 0.5)
+            cx, cy = rng.uniform(w / 2, 1 - w / 2), rng.uniform(h / 2, 1 - h / 2)
+            lines.append(f'{rng.randrange(num_classes)} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n')
+        with open(os.path.join(root, 'labels', rel_dir, f'image_{i:08d}.txt'), 'w') as fp:
+            fp.write(''.join(lines))
+    return root
+
+
+# ========================================================================= #
+# Synthetic VOC                                                             #
+# ========================================================================= #
+
+
+def make_voc(
+    root: str,
+    num_images: int,
+    annos_per_image: int = 10,
+    num_classes: int = 10,
+    images_per_dir: int = 1000,
+    seed: Optional[int] = 7777,
+) -> str:
+    # one annotation file per image, split over sub-directories, the image files are not needed
+    rng = random.Random(seed)
+    for i in range(num_images):
+        rel_dir = f'{i // images_per_dir:04d}'
+        if i % images_per_dir == 0:
+            os.makedirs(os.path.join(root, 'Annotations', rel_dir), exist_ok=True)
+        objects = []
+        for _ in range(annos_per_image):
+            x, y = rng.randint(0, 1800), rng.randint(0, 1000)
+            w, h = rng.randint(1, 1920 - x), rng.randint(1, 1080 - y)
+            objects.append(
+                f'\t<object>\n\t\t<name>category_{rng.randrange(num_classes)}</name>\n\t\t<pose>Unspecified</pose>\n'
+                f'\t\t<truncated>0</truncated>\n\t\t<difficult>{int(rng.random() < 0.1)}</difficult>\n'
+                f'\t\t<bndbox>\n\t\t\t<xmin>{x}</xmin>\n\t\t\t<ymin>{y}</ymin>\n\t\t\t<xmax>{x + w}</xmax>\n\t\t\t<ymax>{y + h}</ymax>\n\t\t</bndbox>\n\t</object>\n'
+            )
+        with open(os.path.join(root, 'Annotations', rel_dir, f'image_{i:08d}.xml'), 'w') as fp:
+            fp.write(
+                f'<annotation>\n\t<folder>{rel_dir}</folder>\n\t<filename>image_{i:08d}.jpg</filename>\n'
+                f'\t<size>\n\t\t<width>1920</width>\n\t\t<height>1080</height>\n\t\t<depth>3</depth>\n\t</size>\n'
+                f'\t<segmented>0</segmented>\n{"".join(objects)}</annotation>\n'
+            )
+    return root
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
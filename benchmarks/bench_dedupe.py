@@ -0,0 +1,76 @@
+"""
+Measure finding duplicate images by their contents, compared to hashing every
+file completely, and when the hashes are already in the on-disk cache.
+
+    $ PYTHONPATH=. python benchmarks/bench_dedupe.py --images 20000 --duplicates 0.1 --workers 8
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _naive_find_duplicates(paths):
+    # read and hash every file completely
+    groups = {}
+    for path in paths:
+        with open(path, 'rb') as fp:
+            groups.setdefault(hashlib.sha256(fp.read()).hexdigest(), []).append(path)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def main():
+    from datasmith import Dataset
+    from datasmith import DatasetItemPath
+    from datasmith import image_cache
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=20000)
+    parser.add_argument('--duplicates', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    rng = random.Random(7777)
+    with tempfile.TemporaryDirectory() as root:
+        # a few file sizes shared by many images, so that the size alone does not
+        # rule out most files, like images from the same camera
+        paths, sources = [], []
+        for i in range(args.images):
+            path = os.path.join(root, f'{i:08d}.jpg')
+            if sources and rng.random() < args.duplicates:
+                data = rng.choice(sources)
+            else:
+                data = os.urandom(rng.choice([200_000, 300_000, 400_000]))
+                sources.append(data)
+                sources = sources[-100:]
+            with open(path, 'wb') as fp:
+                fp.write(data)
+            paths.append(path)
+        print(f'cpus: {os.cpu_count()}, images: {args.images}, size: {sum(map(os.path.getsize, paths)) / 2**20:.0f} MiB')
+        t = time.perf_counter()
+        naive = _naive_find_duplicates(paths)
+        print(f'naive full hash: {time.perf_counter() - t:6.2f}s, groups: {len(naive)}')
+        with image_cache(os.path.join(root, 'cache.sqlite')):
+            for name in ['cold', 'warm']:
+                dataset = Dataset([DatasetItemPath(p) for p in paths])
+                t = time.perf_counter()
+                groups = dataset.find_duplicates(workers=args.workers)
+                print(f'find_duplicates {name}: {time.perf_counter() - t:6.2f}s, groups: {len(groups)}')
+            t = time.perf_counter()
+            deduped = dataset.dedupe(workers=args.workers)
+            print(f'dedupe warm: {time.perf_counter() - t:6.2f}s, items: {len(dataset)} -> {len(deduped)}')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,94 @@
+"""
+Measure removing duplicate boxes from a columnar dataset, compared to
+looping over the annotations of each item in python.
+
+    $ PYTHONPATH=. python benchmarks/bench_dedupe_boxes.py --items 100000 --annos 10
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _make_columns(num_items: int, annos_per_item: int, num_labels: int, duplicates: float, seed: int = 7777):
+    from datasmith import BboxColumns
+    rng = np.random.default_rng(seed)
+    n = num_items * annos_per_item
+    xy = rng.uniform(0, 0.8, size=(n, 2))
+    wh = rng.uniform(0.02, 0.2, size=(n, 2))
+    coords = np.concatenate([xy, xy + wh], axis=1)
+    # some boxes are slightly moved copies of the previous box in the same item, like double labelling
+    dup = (rng.random(n) < duplicates) & (np.arange(n) % annos_per_item != 0)
+    rows = np.flatnonzero(dup)
+    coords[rows] = coords[rows - 1] + rng.uniform(-0.002, 0.002, size=(len(rows), 4))
+    labels = rng.integers(1, num_labels + 1, size=n)
+    labels[rows] = labels[rows - 1]
+    return BboxColumns(
+        coords=coords,
+        item_offsets=np.arange(num_items + 1) * annos_per_item,
+        item_paths=[f'{i}.jpg' for i in range(num_items)],
+        item_uids=[str(i) for i in range(num_items)],
+        anno_label_codes=labels,
+        label_sets=[()] + [(f'label_{i}',) for i in range(num_labels)],
+    )
+
+
+def _naive_dedupe(dataset, iou_threshold: float):
+    # pairwise python loop over the annotations of each item
+    def iou(a, b):
+        w = min(a.x1, b.x1) - max(a.x0, b.x0)
+        h = min(a.y1, b.y1) - max(a.y0, b.y0)
+        inter = max(w, 0) * max(h, 0)
+        union = (a.x1 - a.x0) * (a.y1 - a.y0) + (b.x1 - b.x0) * (b.y1 - b.y0) - inter
+        return inter / union if union > 0 else 0
+    num_duplicates = 0
+    for item in dataset:
+        kept = []
+        for anno in item.annotations:
+            box = anno.value
+            if any(k.labels == anno.labels and iou(k.value, box) >= iou_threshold for k in kept):
+                num_duplicates += 1
+            else:
+                kept.append(anno)
+    return num_duplicates
+
+
+def main():
+    from datasmith import Dataset
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--annos', type=int, default=10)
+    parser.add_argument('--labels', type=int, default=5)
+    parser.add_argument('--duplicates', type=float, default=0.05)
+    parser.add_argument('--iou', type=float, default=0.9)
+    parser.add_argument('--naive-items', type=int, default=10000)
+    args = parser.parse_args()
+    columns = _make_columns(args.items, args.annos, args.labels, args.duplicates)
+    dataset = Dataset.from_columns(columns)
+    print(f'items: {args.items}, boxes: {columns.num_annotations}')
+    # the naive loop is too slow for the whole dataset, so it is extrapolated
+    naive_items = min(args.naive_items, args.items)
+    t = time.perf_counter()
+    _naive_dedupe(dataset[:naive_items], args.iou)
+    t = (time.perf_counter() - t) * args.items / naive_items
+    print(f'naive python loop (extrapolated): {t:6.2f}s')
+    for per_label in [True, False]:
+        t = time.perf_counter()
+        deduped = dataset.dedupe_boxes(iou_threshold=args.iou, per_label=per_label)
+        t = time.perf_counter() - t
+        print(f'dedupe_boxes per_label={per_label}: {t:6.2f}s, {columns.num_annotations / t:10.0f} boxes/s, removed: {columns.num_annotations - deduped.to_columns().num_annotations}')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,91 @@
+"""
+Round trip a synthetic COCO dataset through `import_coco` and `export_coco`,
+comparing the streaming exporter against building one dict for `json.dump`.
+
+    $ PYTHONPATH=. python benchmarks/bench_export_coco.py --images 20000 --annos-per-image 10
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from _synthetic import make_coco
+
+
+# ========================================================================= #
+# Naive Exporter                                                            #
+# ========================================================================= #
+
+
+def _export_coco_naive(dataset, path, image_wh, images_dir):
+    # the whole document is built in memory, one box at a time
+    categories = {label: i for i, label in enumerate(dataset.labels, start=1)}
+    images, annotations = [], []
+    for i, item in enumerate(dataset, start=1):
+        images.append({'id': i, 'width': image_wh[0], 'height': image_wh[1], 'file_name': os.path.relpath(item.path, images_dir)})
+        for anno in item.annotations:
+            x, y, w, h = anno.value.get_xywh(image_wh=image_wh)
+            category_id = categories.setdefault(anno.labels[0], len(categories) + 1)
+            annotations.append({'id': len(annotations) + 1, 'image_id': i, 'category_id': category_id, 'bbox': [round(x, 3), round(y, 3), round(w, 3), round(h, 3)], 'area': round(w * h, 3), 'iscrowd': 0})
+    with open(path, 'w') as fp:
+        json.dump({'info': {}, 'licenses': [], 'images': images, 'annotations': annotations, 'categories': [{'id': i, 'name': k, 'supercategory': ''} for k, i in categories.items()]}, fp)
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _timed(fn, trace: bool = False):
+    # tracing memory slows everything down, so it is measured in a separate run
+    t = time.perf_counter()
+    result = fn()
+    t = time.perf_counter() - t
+    if not trace:
+        return result, t, None
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, t, peak / 1024**2
+
+
+def main():
+    from datasmith import export_coco
+    from datasmith import import_coco
+    from datasmith import import_coco_many
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=20000)
+    parser.add_argument('--annos-per-image', type=int, default=10)
+    args = parser.parse_args()
+    num_boxes = args.images * args.annos_per_image
+    with tempfile.TemporaryDirectory() as root:
+        make_coco(root, num_images=args.images, annos_per_image=args.annos_per_image)
+        images_dir = os.path.join(root, 'images')
+        for name, load in [('objects', lambda: import_coco(root, streaming=True)), ('columns', lambda: import_coco_many([root], workers=1))]:
+            dataset, t, _ = _timed(load)
+            print(f'[{name}] import: {t:.2f}s, {num_boxes / t:10.0f} boxes/s')
+            for export_name, export in [('naive', _export_coco_naive), ('export_coco', export_coco)]:
+                out_root = os.path.join(root, f'{name}_{export_name}')
+                out_path = os.path.join(out_root, 'annotations', 'instances_default.json')
+                os.makedirs(os.path.dirname(out_path))
+                _, t, peak = _timed(lambda: export(dataset, out_path, image_wh=(1920, 1080), images_dir=images_dir), trace=True)
+                print(f'[{name}] {export_name:>11s}: {t:6.2f}s, {num_boxes / t:10.0f} boxes/s, peak traced memory: {peak:8.1f} MiB')
+            # check the round trip
+            exported = import_coco(out_root, validation='off')
+            assert len(exported) == len(dataset)
+            assert np.allclose(exported.boxes(), dataset.boxes(), atol=1e-5)
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,81 @@
+"""
+Compare adding items to datasets and annotations to items one at a time,
+against the batched `extend`, with and without checks.
+
+    $ PYTHONPATH=. python benchmarks/bench_extend.py --items 200000 --annos 500
+
+Appends and lookups of given uids on a dataset of items with lazy uids are
+also timed, these should cost the same as for a dataset with uuid4 uids.
+"""
+
+import argparse
+import time
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _timed(name: str, n: int, fn, repeat: int = 3):
+    t = min(_time(fn) for _ in range(repeat))
+    print(f'{name:>32s}: {t:7.4f}s, {n / t:12.0f} objects/s')
+
+
+def _time(fn) -> float:
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+
+def _append_each(dataset, items):
+    for item in items:
+        dataset.append(item)
+    return dataset
+
+
+def _append_lookup_each(dataset, items):
+    # each append checks the uid, and each lookup misses
+    for item in items:
+        dataset.append(item)
+        assert ('missing' + item.uid) not in dataset
+    return dataset
+
+
+def main():
+    from datasmith import Annotation
+    from datasmith import Bbox
+    from datasmith import Dataset
+    from datasmith import DatasetItemPath
+    from datasmith import uid_strategy
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--annos', type=int, default=500)
+    args = parser.parse_args()
+    with uid_strategy('counter'):
+        items = [DatasetItemPath(f'{i}.jpg') for i in range(args.items)]
+        annotations = [Annotation(Bbox(0.1, 0.1, 0.2, 0.2)) for _ in range(args.annos)]
+    print(f'items: {args.items}, annotations per item: {args.annos}')
+    _timed('dataset append', args.items, lambda: _append_each(Dataset(), items))
+    _timed('dataset extend', args.items, lambda: Dataset().extend(items))
+    _timed('dataset extend (trusted)', args.items, lambda: Dataset().extend(items, trusted=True))
+    n = max(args.items // args.annos, 1)
+    _timed('item annotations append', n * args.annos, lambda: [_append_each(DatasetItemPath('a.jpg').annotations, annotations) for _ in range(n)])
+    _timed('item annotations (init)', n * args.annos, lambda: [DatasetItemPath('a.jpg', annotations=annotations) for _ in range(n)])
+    _timed('item annotations (trusted)', n * args.annos, lambda: [DatasetItemPath('a.jpg').annotations.extend(annotations, trusted=True) for _ in range(n)])
+    # appends to datasets that already contain many items
+    m = min(args.items, 1000)
+    appended = [DatasetItemPath(f'{i}.jpg', uid=f'given{i}') for i in range(m)]
+    for strategy in ('uuid4', 'lazy'):
+        with uid_strategy(strategy):
+            dataset = Dataset([DatasetItemPath(f'{i}.jpg') for i in range(args.items)])
+        _timed(f'append + lookup ({strategy})', m, lambda: _append_lookup_each(dataset, appended), repeat=1)
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,79 @@
+"""
+Compare the peak memory and throughput of `import_coco` when loading
+the whole instances file vs. streaming it, and of only iterating over
+the streamed items with `iter_coco_items`, without keeping them.
+
+    $ PYTHONPATH=. python benchmarks/bench_import_coco.py --images 20000 --annos-per-image 10
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from _synthetic import make_coco
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+MODES = {
+    'load': dict(streaming=False),
+    'streaming': dict(streaming=True),
+    'iter_items': None,
+}
+
+
+def _run_child(mode: str, root: str):
+    from datasmith import import_coco
+    from datasmith import iter_coco_items
+    t = time.perf_counter()
+    if MODES[mode] is None:
+        num_items, num_annotations = 0, 0
+        for item in iter_coco_items(root):
+            num_items, num_annotations = num_items + 1, num_annotations + len(item.annotations)
+    else:
+        dataset = import_coco(root, **MODES[mode])
+        num_items, num_annotations = len(dataset), sum(len(item.annotations) for item in dataset)
+    t = time.perf_counter() - t
+    # ru_maxrss is in KiB on linux
+    print(json.dumps({
+        'mode': mode,
+        'items': num_items,
+        'annotations': num_annotations,
+        'seconds': t,
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=20000)
+    parser.add_argument('--annos-per-image', type=int, default=10)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'ROOT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    # each mode runs in a fresh process so that peak memory is measured independently
+    if args.child:
+        return _run_child(*args.child)
+    with tempfile.TemporaryDirectory() as root:
+        path = make_coco(root, num_images=args.images, annos_per_image=args.annos_per_image)
+        print(f'instances file: {os.path.getsize(path) / 1024**2:.1f} MiB')
+        for mode in MODES:
+            out = subprocess.run([sys.executable, __file__, '--child', mode, root], check=True, stdout=subprocess.PIPE, text=True).stdout
+            r = json.loads(out)
+            print(f'{r["mode"]:>10s}: {r["items"] / r["seconds"]:10.0f} items/s, {r["annotations"] / r["seconds"]:10.0f} annotations/s, peak rss: {r["peak_rss_mib"]:8.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
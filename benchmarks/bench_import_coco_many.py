@@ -0,0 +1,59 @@
+"""
+Compare importing several COCO split files one at a time with `import_coco`
+vs. in a process pool with `import_coco_many`.
+
+    $ PYTHONPATH=. python benchmarks/bench_import_coco_many.py --splits 4 --images 10000 --workers 1 2 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from _synthetic import make_coco
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def main():
+    from datasmith import import_coco
+    from datasmith import import_coco_many
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--splits', type=int, default=4)
+    parser.add_argument('--images', type=int, default=10000, help='images per split')
+    parser.add_argument('--annos-per-image', type=int, default=10)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count()])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        sources = []
+        for i in range(args.splits):
+            rel_file = f'annotations/instances_{i}.json'
+            make_coco(root, num_images=args.images, annos_per_image=args.annos_per_image, rel_instance_file=rel_file, seed=i)
+            sources.append((root, rel_file))
+        num_boxes = args.splits * args.images * args.annos_per_image
+        print(f'cpus: {os.cpu_count()}, splits: {args.splits}, boxes: {num_boxes}')
+        # baseline, each file imported as objects one after the other
+        t = time.perf_counter()
+        for src_root, rel_file in sources:
+            import_coco(src_root, rel_instance_file=rel_file, streaming=True)
+        t = time.perf_counter() - t
+        print(f'{"import_coco":>24s}: {t:7.2f}s, {num_boxes / t:10.0f} boxes/s')
+        # parallel import into columns
+        for workers in args.workers:
+            t = time.perf_counter()
+            dataset = import_coco_many(sources, workers=workers)
+            t = time.perf_counter() - t
+            assert len(dataset) == args.splits * args.images
+            print(f'{f"import_coco_many({workers})":>24s}: {t:7.2f}s, {num_boxes / t:10.0f} boxes/s')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,64 @@
+"""
+Compare eager and lazy `import_coco` for the common "filter then export"
+workflow, where only a small subset of the items is ever accessed.
+
+    $ PYTHONPATH=. python benchmarks/bench_lazy_coco.py --images 20000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from _synthetic import make_coco
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _timed(name: str, fn):
+    t = time.perf_counter()
+    result = fn()
+    print(f'{name:>36s}: {time.perf_counter() - t:7.2f}s')
+    return result
+
+
+def _filter_export(dataset, path: str, min_area: float):
+    from datasmith import export_coco
+    view = dataset.filter_boxes(min_area=min_area)
+    export_coco(view, path)
+    return view
+
+
+def main():
+    from datasmith import import_coco
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=20000)
+    parser.add_argument('--annos-per-image', type=int, default=10)
+    parser.add_argument('--min-area', type=float, default=0.25)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        path = make_coco(root, num_images=args.images, annos_per_image=args.annos_per_image)
+        print(f'images: {args.images}, boxes: {args.images * args.annos_per_image}')
+        # lower bound, only parsing the file
+        _timed('json.load', lambda: json.load(open(path)))
+        for streaming in (False, True):
+            for lazy in (False, True):
+                name = f'{"lazy" if lazy else "eager"}{", streaming" if streaming else ""}'
+                out = os.path.join(root, f'out_{int(lazy)}_{int(streaming)}.json')
+                t = time.perf_counter()
+                dataset = _timed(f'import ({name})', lambda: import_coco(root, streaming=streaming, lazy=lazy))
+                view = _timed(f'filter + export ({name})', lambda: _filter_export(dataset, out, args.min_area))
+                print(f'{"total":>36s}: {time.perf_counter() - t:7.2f}s, {len(view)} of {len(dataset)} items exported')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
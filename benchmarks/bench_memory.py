@@ -0,0 +1,68 @@
+"""
+Measure the memory used per bounding box annotation by the object
+model and by the columnar storage, on a synthetic dataset.
+
+    $ PYTHONPATH=. python benchmarks/bench_memory.py --boxes 10000000
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _make_items(num_boxes: int, per_item: int, num_labels: int = 10):
+    from datasmith import Annotation
+    from datasmith import Bbox
+    from datasmith import DatasetItemPath
+    # label strings are created per box, as they would be when parsed from a file
+    for i in range(num_boxes // per_item):
+        yield DatasetItemPath(
+            path=f'images/image_{i:08d}.jpg',
+            annotations=[Annotation(Bbox(0.1, 0.2, 0.3 + j / 1000, 0.4), labels=[f'category_{(i + j) % num_labels}']) for j in range(per_item)],
+        )
+
+
+def _run_child(model: str, num_boxes: int, per_item: int):
+    from datasmith import Dataset
+    tracemalloc.start()
+    t = time.perf_counter()
+    dataset = Dataset(_make_items(num_boxes, per_item), name='memory')
+    if model == 'columns':
+        dataset = Dataset.from_columns(dataset.to_columns(anno_uids=False), name='memory')
+    t = time.perf_counter() - t
+    # only count memory still held by the final dataset
+    current, peak = tracemalloc.get_traced_memory()
+    print(json.dumps({'model': model, 'bytes': current, 'peak': peak, 'seconds': t, 'boxes': num_boxes}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--boxes', type=int, default=1_000_000)
+    parser.add_argument('--per-item', type=int, default=10)
+    parser.add_argument('--models', nargs='+', default=['objects', 'columns'])
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return _run_child(args.models[0], args.boxes, args.per_item)
+    # each model runs in a fresh process so that measurements are independent
+    for model in args.models:
+        out = subprocess.run([sys.executable, __file__, '--child', '--models', model, '--boxes', str(args.boxes), '--per-item', str(args.per_item)], check=True, stdout=subprocess.PIPE, text=True).stdout
+        r = json.loads(out)
+        print(f'{r["model"]:>8s}: {r["bytes"] / r["boxes"]:7.1f} bytes/box, total: {r["bytes"] / 1024**2:9.1f} MiB, peak: {r["peak"] / 1024**2:9.1f} MiB, traced build: {r["seconds"]:6.2f}s')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,86 @@
+"""
+Measure merging many columnar shards into one dataset, compared to
+extending a dataset with the items of every shard.
+
+    $ PYTHONPATH=. python benchmarks/bench_merge.py --shards 200 --items 2000 --annos 5
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _make_shard(i: int, num_items: int, annos_per_item: int, num_labels: int, rng):
+    from datasmith import BboxColumns
+    from datasmith import Dataset
+    n = num_items * annos_per_item
+    xy = rng.uniform(0, 0.5, size=(n, 2))
+    # every shard names its labels differently, and some uids are shared between shards
+    columns = BboxColumns(
+        coords=np.concatenate([xy, xy + 0.1], axis=1),
+        item_offsets=np.arange(num_items + 1) * annos_per_item,
+        item_paths=[f'shard_{i}/{j}.jpg' for j in range(num_items)],
+        item_uids=[f'{j}' if (j % 100 == 0) else f'{i}-{j}' for j in range(num_items)],
+        anno_label_codes=rng.integers(1, num_labels + 1, size=n),
+        label_sets=[()] + [(f'shard_{i}_label_{k}',) for k in range(num_labels)],
+    )
+    return Dataset.from_columns(columns, labels=[labels[0] for labels in columns.label_sets[1:]])
+
+
+def _naive_merge(shards, label_maps):
+    # extend a dataset with copies of the items, relabelling every annotation
+    from datasmith import Annotation
+    from datasmith import Dataset
+    from datasmith import DatasetItemPath
+    merged = Dataset()
+    for i, (shard, label_map) in enumerate(zip(shards, label_maps)):
+        items = []
+        for item in shard:
+            uid = item.uid if (item.uid not in merged) else f'{item.uid}.{i}'
+            items.append(DatasetItemPath(item.path, uid=uid, annotations=[
+                Annotation(anno.value, labels=[label_map.get(label, label) for label in anno.labels], uid=anno.uid)
+                for anno in item.annotations
+            ]))
+        merged.extend(items)
+    return merged
+
+
+def main():
+    from datasmith import Dataset
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', type=int, default=200)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--annos', type=int, default=5)
+    parser.add_argument('--labels', type=int, default=10)
+    parser.add_argument('--naive-shards', type=int, default=10)
+    args = parser.parse_args()
+    rng = np.random.default_rng(7777)
+    shards = [_make_shard(i, args.items, args.annos, args.labels, rng) for i in range(args.shards)]
+    label_maps = [{f'shard_{i}_label_{k}': f'label_{k}' for k in range(args.labels)} for i in range(args.shards)]
+    print(f'shards: {args.shards}, items: {args.shards * args.items}, boxes: {args.shards * args.items * args.annos}')
+    # the naive merge is too slow for all the shards, so it is extrapolated
+    naive_shards = min(args.naive_shards, args.shards)
+    t = time.perf_counter()
+    _naive_merge(shards[:naive_shards], label_maps[:naive_shards])
+    t = (time.perf_counter() - t) * args.shards / naive_shards
+    print(f'naive extend (extrapolated): {t:6.2f}s')
+    for n in sorted({max(1, args.shards // 4), args.shards}):
+        t = time.perf_counter()
+        merged = Dataset.merge(*shards[:n], label_map=label_maps[:n])
+        t = time.perf_counter() - t
+        print(f'merge {n:4d} shards: {t:6.2f}s, items: {len(merged)}, labels: {len(merged.labels)}')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
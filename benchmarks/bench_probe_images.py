@@ -0,0 +1,57 @@
+"""
+Measure probing the sizes of many images, when the headers need
+to be read vs. when the sizes are already in the on-disk cache.
+
+    $ PYTHONPATH=. python benchmarks/bench_probe_images.py --images 20000 --workers 1 8
+"""
+
+import argparse
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _write_png(path: str, w: int, h: int):
+    # a valid header followed by junk, only the header is ever read
+    ihdr = struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)
+    with open(path, 'wb') as fp:
+        fp.write(b'\x89PNG\r\n\x1a\n' + struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr)) + os.urandom(4096))
+
+
+def main():
+    from datasmith import Dataset
+    from datasmith import DatasetItemPath
+    from datasmith import image_cache
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        paths = [os.path.join(root, f'{i:08d}.png') for i in range(args.images)]
+        for i, path in enumerate(paths):
+            _write_png(path, 100 + i % 1000, 50 + i % 500)
+        print(f'cpus: {os.cpu_count()}, images: {args.images}')
+        for workers in args.workers:
+            with image_cache(os.path.join(root, f'cache_{workers}.sqlite')):
+                for name in ['cold', 'warm']:
+                    dataset = Dataset([DatasetItemPath(p) for p in paths])
+                    t = time.perf_counter()
+                    dataset.probe_images(workers=workers)
+                    t = time.perf_counter() - t
+                    print(f'workers={workers} {name}: {t:6.2f}s, {args.images / t:10.0f} images/s')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
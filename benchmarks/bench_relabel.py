@@ -0,0 +1,89 @@
+"""
+Measure in-place relabelling and tagging of large datasets, against rebuilding
+every item and annotation with the new labels.
+
+    $ PYTHONPATH=. python benchmarks/bench_relabel.py --items 200000 --annos 5 --labels 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _make_columns(num_items: int, annos_per_item: int, num_labels: int, seed: int = 7777):
+    from datasmith import BboxColumns
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(0, 2 * annos_per_item + 1, size=num_items)
+    n = int(counts.sum())
+    xy = rng.uniform(0, 0.5, size=(n, 2))
+    return BboxColumns(
+        coords=np.concatenate([xy, xy + 0.1], axis=1),
+        item_offsets=np.concatenate([[0], np.cumsum(counts)]),
+        item_paths=[f'{i}.jpg' for i in range(num_items)],
+        item_uids=[str(i) for i in range(num_items)],
+        anno_label_codes=rng.integers(1, num_labels + 1, size=n),
+        label_sets=[()] + [(f'label_{k}',) for k in range(num_labels)],
+    )
+
+
+def _naive_relabel(dataset, label_map):
+    # rebuild every annotation and item with the new labels, then the dataset and its index
+    from datasmith import Annotation
+    from datasmith import Dataset
+    from datasmith import DatasetItemPath
+    relabel = lambda labels: [label_map.get(v, v) for v in labels]
+    items = [
+        DatasetItemPath(item.path, annotations=[Annotation(a.value, labels=relabel(a.labels), tags=a.tags, uid=a.uid) for a in item.annotations], labels=relabel(item.labels), tags=item.tags, uid=item.uid)
+        for item in dataset
+    ]
+    relabelled = Dataset(items, labels=relabel(dataset.labels), tags=dataset.tags, name=dataset.name)
+    relabelled.label_counts()
+    return relabelled
+
+
+def _time(fn) -> float:
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+
+def main():
+    from datasmith import Dataset
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--annos', type=int, default=5)
+    parser.add_argument('--labels', type=int, default=100)
+    args = parser.parse_args()
+    columns = _make_columns(args.items, args.annos, args.labels)
+    label_map = {f'label_{k}': f'renamed_{k}' for k in range(0, args.labels, 2)}
+    print(f'items: {args.items}, annotations: {columns.num_annotations}, relabelled: {len(label_map)} of {args.labels} labels')
+    # object datasets
+    objects = Dataset(columns.to_items(), labels=[s[0] for s in columns.label_sets[1:]])
+    t_build = _time(objects.label_counts)
+    print(f'build index (objects):    {t_build:6.2f}s')
+    print(f'naive rebuild (objects):  {_time(lambda: _naive_relabel(objects, label_map)):6.2f}s')
+    print(f'relabel (objects):        {_time(lambda: (objects.relabel(label_map), objects.label_counts())):6.2f}s')
+    selection = np.arange(len(objects)) % 10 == 0
+    print(f'tag 10% items (objects):  {_time(lambda: (objects.tag_items(selection, "reviewed"), objects.tag_counts(of="items"))):6.2f}s')
+    # columnar datasets
+    dataset = Dataset.from_columns(columns, labels=[s[0] for s in columns.label_sets[1:]])
+    print(f'build index (columnar):   {_time(dataset.label_counts):6.2f}s')
+    print(f'relabel (columnar):       {_time(lambda: (dataset.relabel(label_map), dataset.label_counts())):6.2f}s')
+    print(f'tag 10% items (columnar): {_time(lambda: (dataset.tag_items(selection, "reviewed"), dataset.tag_counts(of="items"))):6.2f}s')
+    assert objects.label_counts() == dataset.label_counts()
+    assert objects.tag_counts(of='items') == dataset.tag_counts(of='items')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,106 @@
+"""
+Measure region and area queries with the spatial index, compared to
+scanning the annotations of every item in python, and to checking every
+box with numpy.
+
+    $ PYTHONPATH=. python benchmarks/bench_spatial.py --items 100000 --annos 10
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _make_columns(num_items: int, annos_per_item: int, seed: int = 7777):
+    from datasmith import BboxColumns
+    rng = np.random.default_rng(seed)
+    n = num_items * annos_per_item
+    # mostly small boxes, and a few that cover most of the image
+    wh = rng.uniform(0.01, 0.1, size=(n, 2)) * np.where(rng.random(n) < 0.01, 9, 1)[:, None]
+    xy = rng.uniform(0, 1, size=(n, 2)) * (1 - wh)
+    return BboxColumns(
+        coords=np.concatenate([xy, xy + wh], axis=1),
+        item_offsets=np.arange(num_items + 1) * annos_per_item,
+        item_paths=[f'{i}.jpg' for i in range(num_items)],
+        item_uids=[str(i) for i in range(num_items)],
+    )
+
+
+def _python_scan(dataset, region):
+    x0, y0, x1, y1 = region
+    return sum(
+        1
+        for item in dataset
+        for anno in item.annotations
+        if (anno.value.x0 <= x1) and (anno.value.x1 >= x0) and (anno.value.y0 <= y1) and (anno.value.y1 >= y0)
+    )
+
+
+def _numpy_scan(coords, region):
+    x0, y0, x1, y1 = region
+    return int(np.count_nonzero((coords[:, 0] <= x1) & (coords[:, 2] >= x0) & (coords[:, 1] <= y1) & (coords[:, 3] >= y0)))
+
+
+def _time(fn, repeats: int) -> float:
+    t = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - t) / repeats
+
+
+def main():
+    from datasmith import Dataset
+    from datasmith import DatasetItemPath
+    from datasmith import Annotation
+    from datasmith import Bbox
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--annos', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--scan-items', type=int, default=10000)
+    args = parser.parse_args()
+    columns = _make_columns(args.items, args.annos)
+    dataset = Dataset.from_columns(columns)
+    region = (0.40, 0.40, 0.45, 0.45)
+    print(f'items: {args.items}, boxes: {columns.num_annotations}')
+    # baselines, the python scan is extrapolated
+    scan_items = min(args.scan_items, args.items)
+    t = _time(lambda: _python_scan(dataset[:scan_items], region), 1) * args.items / scan_items
+    print(f'python scan (extrapolated): {t * 1000:9.2f}ms')
+    print(f'numpy scan:                 {_time(lambda: _numpy_scan(columns.coords, region), args.repeats) * 1000:9.2f}ms')
+    # index
+    t = time.perf_counter()
+    dataset._get_spatial_index()
+    print(f'index build:                {(time.perf_counter() - t) * 1000:9.2f}ms')
+    queries = {
+        'small region': dict(region=region),
+        'point contains': dict(region=(0.5, 0.5, 0.5, 0.5), mode='contains'),
+        'large region within': dict(region=(0.0, 0.0, 0.5, 0.5), mode='within'),
+        'area > 50%': dict(min_area=0.5),
+    }
+    for name, query in queries.items():
+        t = _time(lambda: dataset.find_boxes(**query), args.repeats)
+        print(f'find_boxes {name + ":":20s} {t * 1000:9.2f}ms, matches: {dataset.find_boxes(**query).num_matches}')
+    # incremental appends
+    items = [DatasetItemPath(f'new_{i}.jpg', annotations=[Annotation(Bbox(0.1, 0.1, 0.2, 0.2))]) for i in range(10000)]
+    t = time.perf_counter()
+    for item in items:
+        dataset.append(item)
+    print(f'append 10000 items:         {(time.perf_counter() - t) * 1000:9.2f}ms')
+    t = _time(lambda: dataset.find_boxes(region=region), args.repeats)
+    print(f'find_boxes after appends:   {t * 1000:9.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,86 @@
+"""
+Measure stratified splitting of a large columnar dataset, and how well
+the splits match the requested ratios for common and rare labels.
+
+    $ PYTHONPATH=. python benchmarks/bench_split.py --items 1000000 --annos 5 --labels 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _make_columns(num_items: int, annos_per_item: int, num_labels: int, seed: int = 7777):
+    from datasmith import BboxColumns
+    rng = np.random.default_rng(seed)
+    # a varying number of annotations per item, with a long tail of rare labels
+    counts = rng.integers(0, 2 * annos_per_item + 1, size=num_items)
+    n = int(counts.sum())
+    xy = rng.uniform(0, 0.5, size=(n, 2))
+    return BboxColumns(
+        coords=np.concatenate([xy, xy + 0.1], axis=1),
+        item_offsets=np.concatenate([[0], np.cumsum(counts)]),
+        item_paths=[f'{i}.jpg' for i in range(num_items)],
+        item_uids=[str(i) for i in range(num_items)],
+        anno_label_codes=np.minimum(rng.zipf(1.3, size=n), num_labels),
+        label_sets=[()] + [(f'label_{k}',) for k in range(num_labels)],
+    )
+
+
+def _naive_split(dataset, ratios, seed: int):
+    # shuffle the items in python, then slice
+    import random
+    items = list(range(len(dataset)))
+    random.Random(seed).shuffle(items)
+    bounds = np.cumsum([0] + [int(r * len(items)) for r in ratios])
+    return [dataset[sorted(items[a:b])] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def _relative_errors(dataset, splits, ratios):
+    # worst relative error of the label counts in each split, for common and rare labels
+    total = dataset.to_columns(anno_uids=False)
+    counts = np.bincount(total.anno_label_codes, minlength=len(total.label_sets))
+    errors = []
+    for split, ratio in zip(splits, ratios):
+        c = np.bincount(split.to_columns(anno_uids=False).anno_label_codes, minlength=len(total.label_sets))
+        errors.append(np.abs(c - ratio * counts) / np.maximum(ratio * counts, 1))
+    errors = np.max(errors, axis=0)
+    common, rare = counts >= 1000, (counts >= 20) & (counts < 1000)
+    return errors[common].max(initial=0), errors[rare].max(initial=0)
+
+
+def main():
+    from datasmith import Dataset
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=1000000)
+    parser.add_argument('--annos', type=int, default=5)
+    parser.add_argument('--labels', type=int, default=500)
+    args = parser.parse_args()
+    ratios = (0.8, 0.1, 0.1)
+    columns = _make_columns(args.items, args.annos, args.labels)
+    dataset = Dataset.from_columns(columns)
+    print(f'items: {args.items}, boxes: {columns.num_annotations}, labels: {args.labels}')
+    t = time.perf_counter()
+    splits = _naive_split(dataset, ratios, seed=0)
+    t = time.perf_counter() - t
+    print(f'random split:     {t:6.2f}s, sizes: {[len(s) for s in splits]}, worst error common/rare labels: {"%.3f / %.3f" % _relative_errors(dataset, splits, ratios)}')
+    for stratify in [None, 'annotation_labels']:
+        t = time.perf_counter()
+        splits = dataset.split(ratios, stratify=stratify, seed=0)
+        t = time.perf_counter() - t
+        print(f'split {str(stratify):17s} {t:6.2f}s, sizes: {[len(s) for s in splits]}, worst error common/rare labels: {"%.3f / %.3f" % _relative_errors(dataset, splits, ratios)}')
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,55 @@
+"""
+Compare the time to get a dataset by re-importing the COCO instances
+file vs. loading a saved dataset file, with and without memory mapping.
+
+    $ PYTHONPATH=. python benchmarks/bench_storage.py --images 100000 --annos-per-image 10
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from _synthetic import make_coco
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _timed(name: str, fn):
+    t = time.perf_counter()
+    result = fn()
+    print(f'{name:>24s}: {time.perf_counter() - t:8.3f}s')
+    return result
+
+
+def main():
+    from datasmith import Dataset
+    from datasmith import import_coco
+    from datasmith import import_coco_many
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=100000)
+    parser.add_argument('--annos-per-image', type=int, default=10)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        make_coco(root, num_images=args.images, annos_per_image=args.annos_per_image)
+        path = os.path.join(root, 'dataset.bin')
+        _timed('import_coco', lambda: import_coco(root, streaming=True))
+        dataset = _timed('import_coco_many', lambda: import_coco_many([root], workers=1))
+        _timed('save', lambda: dataset.save(path))
+        print(f'{"file size":>24s}: {os.path.getsize(path) / 1024**2:8.1f} MiB')
+        for mmap in [False, True]:
+            loaded = _timed(f'load(mmap={mmap})', lambda: Dataset.load(path, mmap=mmap))
+            _timed(f'  boxes(mmap={mmap})', lambda: loaded.boxes().sum())
+            _timed(f'  lookup(mmap={mmap})', lambda: loaded[dataset[-1].uid])
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
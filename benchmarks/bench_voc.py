@@ -0,0 +1,107 @@
+"""
+Compare the throughput of `import_voc` and `export_voc` against a naive
+loop that parses a full DOM and writes one annotation file at a time.
+
+    $ PYTHONPATH=. python benchmarks/bench_voc.py --images 20000 --workers 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from xml.dom import minidom
+
+from _synthetic import make_voc
+
+
+# ========================================================================= #
+# Naive                                                                     #
+# ========================================================================= #
+
+
+def _import_voc_naive(root: str):
+    from datasmith import Annotation
+    from datasmith import Bbox
+    from datasmith import Dataset
+    from datasmith import DatasetItemPath
+    text = lambda node, tag: node.getElementsByTagName(tag)[0].firstChild.data
+    items, labels = [], {}
+    for dirpath, _, file_names in sorted(os.walk(os.path.join(root, 'Annotations'))):
+        for file_name in sorted(file_names):
+            doc = minidom.parse(os.path.join(dirpath, file_name))
+            image_wh = (int(text(doc, 'width')), int(text(doc, 'height')))
+            annotations = []
+            for obj in doc.getElementsByTagName('object'):
+                name = text(obj, 'name')
+                labels[name] = True
+                xyxy = [float(text(obj, k)) for k in ('xmin', 'ymin', 'xmax', 'ymax')]
+                tags = ['difficult'] if text(obj, 'difficult') == '1' else []
+                annotations.append(Annotation(Bbox.from_xyxy(*xyxy, image_wh=image_wh), labels=[name], tags=tags))
+            rel_dir = os.path.relpath(dirpath, os.path.join(root, 'Annotations'))
+            items.append(DatasetItemPath(os.path.join(root, 'JPEGImages', rel_dir, text(doc, 'filename')), annotations=annotations, image_wh=image_wh))
+    return Dataset(items, labels=list(labels))
+
+
+def _export_voc_naive(dataset, root: str, images_dir: str):
+    from xml.etree import ElementTree
+    for item in dataset:
+        w, h = item._get_known_image_wh()
+        rel_path = os.path.relpath(item.path, images_dir)
+        node = ElementTree.Element('annotation')
+        ElementTree.SubElement(node, 'filename').text = os.path.basename(rel_path)
+        size = ElementTree.SubElement(node, 'size')
+        ElementTree.SubElement(size, 'width').text = str(w)
+        ElementTree.SubElement(size, 'height').text = str(h)
+        for anno in item.annotations:
+            obj = ElementTree.SubElement(node, 'object')
+            ElementTree.SubElement(obj, 'name').text = anno.labels[0]
+            ElementTree.SubElement(obj, 'difficult').text = str(int('difficult' in anno.tags))
+            bndbox = ElementTree.SubElement(obj, 'bndbox')
+            for k, v in zip(('xmin', 'ymin', 'xmax', 'ymax'), anno.value.get_xyxy(image_wh=(w, h))):
+                ElementTree.SubElement(bndbox, k).text = str(round(v))
+        path = os.path.join(root, 'Annotations', os.path.splitext(rel_path)[0] + '.xml')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        ElementTree.ElementTree(node).write(path, encoding='utf-8')
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _timed(name: str, num_boxes: int, fn):
+    t = time.perf_counter()
+    result = fn()
+    t = time.perf_counter() - t
+    print(f'{name:>24s}: {t:7.2f}s, {num_boxes / t:10.0f} boxes/s')
+    return result
+
+
+def main():
+    from datasmith import export_voc
+    from datasmith import import_voc
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=20000)
+    parser.add_argument('--annos-per-image', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    num_boxes = args.images * args.annos_per_image
+    with tempfile.TemporaryDirectory() as root:
+        make_voc(root, num_images=args.images, annos_per_image=args.annos_per_image)
+        images_dir = os.path.join(root, 'JPEGImages')
+        print(f'cpus: {os.cpu_count()}, images: {args.images}, boxes: {num_boxes}')
+        naive = _timed('naive import', num_boxes, lambda: _import_voc_naive(root))
+        dataset = _timed('import_voc', num_boxes, lambda: import_voc(root, workers=args.workers))
+        assert len(naive) == len(dataset)
+        assert naive.label_counts() == dataset.label_counts()
+        _timed('naive export', num_boxes, lambda: _export_voc_naive(naive, os.path.join(root, 'out_naive'), images_dir))
+        _timed('export_voc', num_boxes, lambda: export_voc(dataset, os.path.join(root, 'out'), images_dir=images_dir, workers=args.workers))
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
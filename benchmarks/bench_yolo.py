@@ -0,0 +1,90 @@
+"""
+Compare the throughput of `import_yolo` and `export_yolo` against a naive
+loop that opens, parses and writes one label file at a time.
+
+    $ PYTHONPATH=. python benchmarks/bench_yolo.py --images 100000 --workers 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from _synthetic import make_yolo
+
+
+# ========================================================================= #
+# Naive                                                                     #
+# ========================================================================= #
+
+
+def _import_yolo_naive(root: str):
+    from datasmith import Annotation
+    from datasmith import Bbox
+    from datasmith import Dataset
+    from datasmith import DatasetItemPath
+    with open(os.path.join(root, 'classes.txt')) as fp:
+        names = fp.read().split()
+    items = []
+    for dirpath, _, file_names in sorted(os.walk(os.path.join(root, 'images'))):
+        for file_name in sorted(file_names):
+            rel_path = os.path.relpath(os.path.join(dirpath, file_name), os.path.join(root, 'images'))
+            annotations = []
+            with open(os.path.join(root, 'labels', os.path.splitext(rel_path)[0] + '.txt')) as fp:
+                for line in fp:
+                    c, cx, cy, w, h = line.split()
+                    annotations.append(Annotation(Bbox.from_cxywh(float(cx), float(cy), float(w), float(h)), labels=[names[int(c)]]))
+            items.append(DatasetItemPath(os.path.join(dirpath, file_name), annotations=annotations))
+    return Dataset(items, labels=names)
+
+
+def _export_yolo_naive(dataset, root: str, images_dir: str):
+    classes = {label: i for i, label in enumerate(dataset.labels)}
+    for item in dataset:
+        path = os.path.join(root, 'labels', os.path.splitext(os.path.relpath(item.path, images_dir))[0] + '.txt')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fp:
+            for anno in item.annotations:
+                fp.write('{} {:.6f} {:.6f} {:.6f} {:.6f}\n'.format(classes[anno.labels[0]], *anno.value.get_cxywh()))
+
+
+# ========================================================================= #
+# Benchmark                                                                 #
+# ========================================================================= #
+
+
+def _timed(name: str, num_boxes: int, fn):
+    t = time.perf_counter()
+    result = fn()
+    t = time.perf_counter() - t
+    print(f'{name:>24s}: {t:7.2f}s, {num_boxes / t:10.0f} boxes/s')
+    return result
+
+
+def main():
+    from datasmith import export_yolo
+    from datasmith import import_yolo
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=100000)
+    parser.add_argument('--annos-per-image', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    num_boxes = args.images * args.annos_per_image
+    with tempfile.TemporaryDirectory() as root:
+        make_yolo(root, num_images=args.images, annos_per_image=args.annos_per_image)
+        images_dir = os.path.join(root, 'images')
+        print(f'cpus: {os.cpu_count()}, images: {args.images}, boxes: {num_boxes}')
+        naive = _timed('naive import', num_boxes, lambda: _import_yolo_naive(root))
+        dataset = _timed('import_yolo', num_boxes, lambda: import_yolo(root, workers=args.workers))
+        assert len(naive) == len(dataset)
+        _timed('naive export', num_boxes, lambda: _export_yolo_naive(naive, os.path.join(root, 'out_naive'), images_dir))
+        _timed('export_yolo', num_boxes, lambda: export_yolo(dataset, os.path.join(root, 'out'), images_dir=images_dir, workers=args.workers))
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,304 @@
+"""
+Reproducible benchmark suite for the hot paths of datasmith: importing,
+filtering, validating, indexing, converting and exporting synthetic COCO
+datasets of 10k, 100k and 1M annotations, as well as peak memory.
+
+Each size runs in a fresh process so that measurements are independent,
+and each timing is the best of a few repeats. Results can be saved as a
+baseline, and later runs compared against it to detect regressions, in
+which case the exit code is non-zero.
+
+    $ PYTHONPATH=. python benchmarks/suite.py --sizes 10k 100k 1M --save baseline.json
+    $ PYTHONPATH=. python benchmarks/suite.py --sizes 10k 100k 1M --compare baseline.json
+    $ PYTHONPATH=. python benchmarks/suite.py --sizes 10k --cases 'import_*' 'filter_*'
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+
+import numpy as np
+
+from _synthetic import make_coco
+
+
+# ========================================================================= #
+# Cases                                                                     #
+# ========================================================================= #
+
+
+class _Case(NamedTuple):
+    name: str
+    # returns the function to time, called before every repeat so that caches can be reset
+    setup: Callable[['_Context'], Callable[[], object]]
+    # memory cases record the peak and retained memory of a single run instead of the time
+    memory: bool = False
+
+
+class _Context(object):
+
+    # the synthetic dataset of one size, and the datasets that are imported from it once and shared between cases
+
+    def __init__(self, root: str, num_annotations: int, annos_per_image: int = 10, seed: int = 7777):
+        self.root = root
+        self.num_annotations = num_annotations
+        self.path = make_coco(root, num_images=max(num_annotations // annos_per_image, 1), annos_per_image=annos_per_image)
+        self.rng = np.random.default_rng(seed)
+        self._datasets = {}
+
+    def dataset(self, lazy: bool = False):
+        from datasmith import import_coco
+        if lazy not in self._datasets:
+            self._datasets[lazy] = import_coco(self.root, lazy=lazy)
+        return self._datasets[lazy]
+
+    def sample(self, n: int, size: int = 10000) -> np.ndarray:
+        return self.rng.integers(0, n, size=min(size, n))
+
+
+def _reset_index(dataset):
+    # the label index is cached on the dataset, and rebuilt when cleared
+    dataset._index = None
+    return dataset
+
+
+def _import_coco(**kwargs):
+    def setup(ctx: _Context):
+        from datasmith import import_coco
+        return lambda: import_coco(ctx.root, **kwargs)
+    return setup
+
+
+def _filter_items(lazy: bool, **kwargs):
+    def setup(ctx: _Context):
+        dataset = _reset_index(ctx.dataset(lazy=lazy))
+        return lambda: dataset.filter_items(**kwargs)
+    return setup
+
+
+def _validate(lazy: bool, deep: bool):
+    from datasmith import DatasetLabelNotFoundError
+    # coco items do not have labels of their own, so validation fails after all the labels are collected
+    def validate(dataset):
+        try:
+            dataset.validate(deep=deep)
+        except DatasetLabelNotFoundError:
+            pass
+    def setup(ctx: _Context):
+        dataset = _reset_index(ctx.dataset(lazy=lazy))
+        return lambda: validate(dataset)
+    return setup
+
+
+def _index_items(lazy: bool, by_uid: bool):
+    def setup(ctx: _Context):
+        dataset = ctx.dataset(lazy=lazy)
+        idxs = ctx.sample(len(dataset)).tolist()
+        keys = [dataset[i].uid for i in idxs] if by_uid else idxs
+        return lambda: [dataset[k] for k in keys]
+    return setup
+
+
+def _bbox_from_xywh(ctx: _Context):
+    from datasmith import Bbox
+    xywh = ctx.dataset().boxes('xywh', normalized=False, image_wh=(1920, 1080))
+    rows = xywh.tolist()
+    return lambda: [Bbox.from_xywh(*row, image_wh=(1920, 1080)) for row in rows]
+
+
+def _bbox_get_cxywh(ctx: _Context):
+    boxes = [anno.value for item in ctx.dataset() for anno in item.annotations]
+    return lambda: [bbox.get_cxywh(image_wh=(1920, 1080)) for bbox in boxes]
+
+
+def _bbox_batch_from_xywh(ctx: _Context):
+    from datasmith import Bbox
+    xywh = ctx.dataset().boxes('xywh', normalized=False, image_wh=(1920, 1080))
+    return lambda: Bbox.batch_from_xywh(xywh, image_wh=(1920, 1080))
+
+
+def _dataset_boxes(lazy: bool):
+    def setup(ctx: _Context):
+        dataset = ctx.dataset(lazy=lazy)
+        return lambda: dataset.boxes('cxywh')
+    return setup
+
+
+def _export_coco(lazy: bool):
+    def setup(ctx: _Context):
+        from datasmith import export_coco
+        dataset = ctx.dataset(lazy=lazy)
+        return lambda: export_coco(dataset, os.path.join(ctx.root, 'export.json'))
+    return setup
+
+
+CASES = [
+    _Case('import_coco', _import_coco()),
+    _Case('import_coco_streaming', _import_coco(streaming=True)),
+    _Case('import_coco_lazy', _import_coco(lazy=True)),
+    _Case('filter_items_labels', _filter_items(lazy=False, anno_labels=['category_0'])),
+    _Case('filter_items_fn', _filter_items(lazy=False, anno_fn=lambda anno: anno.value.x0 < 0.5)),
+    _Case('filter_items_labels_lazy', _filter_items(lazy=True, anno_labels=['category_0'])),
+    _Case('validate', _validate(lazy=False, deep=False)),
+    _Case('validate_deep', _validate(lazy=False, deep=True)),
+    _Case('validate_lazy', _validate(lazy=True, deep=False)),
+    _Case('index_position', _index_items(lazy=False, by_uid=False)),
+    _Case('index_uid', _index_items(lazy=False, by_uid=True)),
+    _Case('index_uid_lazy', _index_items(lazy=True, by_uid=True)),
+    _Case('bbox_from_xywh', _bbox_from_xywh),
+    _Case('bbox_get_cxywh', _bbox_get_cxywh),
+    _Case('bbox_batch_from_xywh', _bbox_batch_from_xywh),
+    _Case('dataset_boxes', _dataset_boxes(lazy=False)),
+    _Case('dataset_boxes_lazy', _dataset_boxes(lazy=True)),
+    _Case('export_coco', _export_coco(lazy=False)),
+    _Case('export_coco_lazy', _export_coco(lazy=True)),
+    _Case('memory_import_coco', _import_coco(), memory=True),
+    _Case('memory_import_coco_lazy', _import_coco(lazy=True), memory=True),
+]
+
+
+# ========================================================================= #
+# Runner                                                                    #
+# ========================================================================= #
+
+
+def _time_case(ctx: _Context, case: _Case, repeat: int, budget: float) -> Dict[str, float]:
+    # best of a few repeats, stopping early once the time budget is used up
+    times = []
+    while (len(times) < repeat) and (sum(times) < budget or not times):
+        fn = case.setup(ctx)
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return {'seconds': min(times), 'repeats': len(times)}
+
+
+def _memory_case(ctx: _Context, case: _Case) -> Dict[str, float]:
+    # tracing slows everything down, so the time is not recorded
+    fn = case.setup(ctx)
+    tracemalloc.start()
+    try:
+        result = fn()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {'peak_bytes': peak, 'retained_bytes': retained}
+
+
+def _run_size(num_annotations: int, patterns: List[str], repeat: int, budget: float) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        ctx = _Context(root, num_annotations)
+        for case in CASES:
+            if not any(fnmatch.fnmatch(case.name, p) for p in patterns):
+                continue
+            results[case.name] = _memory_case(ctx, case) if case.memory else _time_case(ctx, case, repeat, budget)
+            print(_format_result(case.name, results[case.name]), file=sys.stderr, flush=True)
+    return results
+
+
+# ========================================================================= #
+# Regression Check                                                          #
+# ========================================================================= #
+
+
+# only these metrics are compared against a baseline, lower is better. Differences
+# smaller than the noise floor of each metric are never counted as regressions.
+METRICS = {'seconds': 0.002, 'peak_bytes': 1024**2}
+
+
+def _format_result(name: str, result: Dict[str, float]) -> str:
+    if 'seconds' in result:
+        return f'{name:>28s}: {result["seconds"]:9.4f}s'
+    return f'{name:>28s}: {result["peak_bytes"] / 1024**2:9.1f} MiB peak, {result["retained_bytes"] / 1024**2:9.1f} MiB retained'
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    # a regression is a metric that got worse by more than the tolerance, relative to the baseline
+    regressions = []
+    for size, cases in results['sizes'].items():
+        for name, result in cases.items():
+            base = baseline['sizes'].get(size, {}).get(name)
+            if base is None:
+                continue
+            for metric in METRICS:
+                if (metric not in result) or (metric not in base) or (base[metric] <= 0):
+                    continue
+                ratio = result[metric] / base[metric]
+                significant = abs(result[metric] - base[metric]) > METRICS[metric]
+                flag = '' if not significant else ('REGRESSION' if (ratio > 1 + tolerance) else ('improved' if (ratio < 1 - tolerance) else ''))
+                print(f'{size:>8s} {name:>28s} {metric:>10s}: {base[metric]:12.4g} -> {result[metric]:12.4g} ({ratio:5.2f}x) {flag}')
+                if flag == 'REGRESSION':
+                    regressions.append(f'{size}/{name}/{metric}')
+    return regressions
+
+
+# ========================================================================= #
+# Main                                                                      #
+# ========================================================================= #
+
+
+def _parse_size(size: str) -> int:
+    scale = {'k': 1000, 'm': 1000000}.get(size[-1:].lower(), 1)
+    return int(float(size[:-1] if (scale > 1) else size) * scale)
+
+
+def _get_machine() -> Dict[str, str]:
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', default=['10k', '100k', '1M'], help='number of annotations in each synthetic dataset')
+    parser.add_argument('--cases', nargs='+', default=['*'], help='glob patterns of the cases to run')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=10.0, help='stop repeating a case after this many seconds')
+    parser.add_argument('--save', type=str, default=None, help='save the results as json')
+    parser.add_argument('--compare', type=str, default=None, help='compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative slowdown that counts as a regression')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    parser.add_argument('--child', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.list:
+        return print('\n'.join(case.name for case in CASES))
+    if args.child is not None:
+        return print(json.dumps(_run_size(_parse_size(args.child), args.cases, args.repeat, args.budget)))
+    # each size runs in a fresh process so that memory measurements are independent
+    results = {'machine': _get_machine(), 'sizes': {}}
+    for size in args.sizes:
+        print(f'annotations: {size} ({_parse_size(size)})', file=sys.stderr, flush=True)
+        cmd = [sys.executable, __file__, '--child', size, '--cases', *args.cases, '--repeat', str(args.repeat), '--budget', str(args.budget)]
+        results['sizes'][size] = json.loads(subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout)
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump(results, fp, indent=2)
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if baseline.get('machine') != results['machine']:
+            print(f'warning: baseline was recorded on a different machine: {baseline.get("machine")}', file=sys.stderr)
+        regressions = compare_results(results, baseline, tolerance=args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regressions: {regressions}', file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -2,4 +2,13 @@
 from datasmith._annotations import *
 from datasmith._base import *
 from datasmith._importers import *
+from datasmith._exporters import *
 from datasmith._items import *
+from datasmith._images import *
+from datasmith._columnar import *
+from datasmith._dedupe import *
+from datasmith._spatial import *
+from datasmith._merge import *
+from datasmith._split import *
+from datasmith._relabel import *
+from datasmith._profiling import *
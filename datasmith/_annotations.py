@@ -1,8 +1,90 @@
 import warnings
+from contextlib import contextmanager
+from typing import Iterator
+from typing import List
 from typing import Optional
 from typing import Tuple
+from typing import Union
+
+import numpy as np
 
 from datasmith._base import AnnotationValue
+from datasmith._profiling import profile_count
+
+
+# ========================================================================= #
+# Bounding Box Validation                                                   #
+# ========================================================================= #
+
+
+class BboxBoundsError(ValueError):
+    pass
+
+
+# how boxes are checked when they are constructed:
+# - off:       boxes are not checked
+# - warn:      a warning is emitted for every invalid box
+# - warn-once: a single warning is emitted for the first invalid box since the mode was set
+# - collect:   invalid boxes are stored and can be retrieved with `pop_bbox_violations`
+# - raise:     a `BboxBoundsError` is raised
+BBOX_VALIDATION_MODES = ('off', 'warn', 'warn-once', 'collect', 'raise')
+
+_BBOX_VALIDATION: str = 'warn'
+_BBOX_WARNED: bool = False
+_BBOX_VIOLATIONS: List['Bbox'] = []
+
+
+def get_bbox_validation() -> str:
+    return _BBOX_VALIDATION
+
+
+def set_bbox_validation(mode: str) -> str:
+    global _BBOX_VALIDATION, _BBOX_WARNED
+    if mode not in BBOX_VALIDATION_MODES:
+        raise KeyError(f'unsupported bbox validation mode: {repr(mode)}, must be one of: {BBOX_VALIDATION_MODES}')
+    # returns the previous mode
+    prev, _BBOX_VALIDATION, _BBOX_WARNED = _BBOX_VALIDATION, mode, False
+    return prev
+
+
+@contextmanager
+def bbox_validation(mode: str) -> Iterator[str]:
+    prev = set_bbox_validation(mode)
+    try:
+        yield mode
+    finally:
+        set_bbox_validation(prev)
+
+
+def pop_bbox_violations() -> List['Bbox']:
+    # get and clear the invalid boxes collected in the 'collect' mode
+    global _BBOX_VIOLATIONS
+    violations, _BBOX_VIOLATIONS = _BBOX_VIOLATIONS, []
+    return violations
+
+
+def _claim_bbox_warning() -> bool:
+    # in the 'warn-once' mode only the first caller since the mode was set may warn
+    global _BBOX_WARNED
+    warned, _BBOX_WARNED = _BBOX_WARNED, True
+    return not warned
+
+
+def _handle_bbox_violation(bbox: 'Bbox', mode: Optional[str] = None):
+    mode = _BBOX_VALIDATION if (mode is None) else mode
+    profile_count('bbox_violations')
+    if mode == 'collect':
+        _BBOX_VIOLATIONS.append(bbox)
+    elif mode == 'raise':
+        raise BboxBoundsError(f'invalid bounds for: {repr(bbox)}, must satisfy: 0 <= x0 <= x1 <= 1 and 0 <= y0 <= y1 <= 1')
+    elif mode == 'warn-once':
+        if _claim_bbox_warning():
+            profile_count('warnings')
+            warnings.warn(f'invalid bounds for: {repr(bbox)}, further bbox warnings are suppressed, use `Dataset.check_bounds` to find all invalid boxes')
+    elif mode == 'warn':
+        profile_count('warnings')
+        if not (0 <= bbox.x0 <= bbox.x1 <= 1): warnings.warn(f'not (0 <= {bbox.x0} [x0] <= {bbox.x1} [x1] <= 1)')
+        if not (0 <= bbox.y0 <= bbox.y1 <= 1): warnings.warn(f'not (0 <= {bbox.y0} [y0] <= {bbox.y1} [y1] <= 1)')
 
 
 # ========================================================================= #
@@ -10,12 +92,48 @@ from datasmith._base import AnnotationValue
 # ========================================================================= #
 
 
+# supported formats for batch conversion, the internal format is always normalised xyxy
+BBOX_FORMATS = ('xyxy', 'xywh', 'cxywh')
+
+# either a single (W, H) for all boxes, or an array of shape (N, 2) with a row for each box
+ImageWH = Union[Tuple[float, float], np.ndarray]
+
+
 def _get_scale_wh(image_wh: Optional[Tuple[float, float]] = None):
     return (1, 1) if (image_wh is None) else image_wh
 
 
+def _get_batch_scale(image_wh: Optional[ImageWH] = None) -> np.ndarray:
+    # returns an array that broadcasts against (N, 4) boxes
+    if image_wh is None:
+        return np.ones((1, 4))
+    wh = np.asarray(image_wh, dtype=np.float64)
+    if wh.shape == (2,):
+        wh = wh[None, :]
+    if (wh.ndim != 2) or (wh.shape[1] != 2):
+        raise ValueError(f'image_wh must have shape (2,) or (N, 2), got: {wh.shape}')
+    return np.concatenate([wh, wh], axis=1)
+
+
+def _get_batch_boxes(boxes: np.ndarray) -> np.ndarray:
+    boxes = np.asarray(boxes)
+    if not np.issubdtype(boxes.dtype, np.floating):
+        boxes = boxes.astype(np.float64)
+    if (boxes.ndim != 2) or (boxes.shape[1] != 4):
+        raise ValueError(f'boxes must have shape (N, 4), got: {boxes.shape}')
+    return boxes
+
+
+def _check_format(fmt: str) -> str:
+    if fmt not in BBOX_FORMATS:
+        raise KeyError(f'unsupported bbox format: {repr(fmt)}, must be one of: {BBOX_FORMATS}')
+    return fmt
+
+
 class Bbox(AnnotationValue):
 
+    __slots__ = ('x0', 'y0', 'x1', 'y1')
+
     def __init__(
         self,
         x0: float,
@@ -23,12 +141,14 @@ class Bbox(AnnotationValue):
         x1: float,
         y1: float,
     ):
-        if not (0 <= x0 <= x1 <= 1): warnings.warn(f'not (0 <= {x0} [x0] <= {x1} [x1] <= 1)')   # usually ratio of original image dimensions
-        if not (0 <= y0 <= y1 <= 1): warnings.warn(f'not (0 <= {y0} [y0] <= {y1} [y1] <= 1)')   # usually ratio of original image dimensions
         self.x0 = x0
         self.y0 = y0
         self.x1 = x1
         self.y1 = y1
+        # usually ratio of original image dimensions
+        if _BBOX_VALIDATION != 'off':
+            if not ((0 <= x0 <= x1 <= 1) and (0 <= y0 <= y1 <= 1)):
+                _handle_bbox_violation(self)
 
     def __repr__(self):
         return f'{self.__class__.__name__}(x0={repr(self.x0)}, y0={repr(self.y0)}, x1={repr(self.x1)}, y1={repr(self.y1)})'
@@ -71,6 +191,21 @@ class Bbox(AnnotationValue):
         W, H = _get_scale_wh(image_wh)
         return cls(x0=x0/W, y0=y0/H, x1=x1/W, y1=y1/H)
 
+    @classmethod
+    def _from_xywh_unchecked(
+        cls,
+        x0: float,
+        y0: float,
+        w: float,
+        h: float,
+        image_wh: Optional[Tuple[float, float]] = None,
+    ):
+        # same as `from_xywh` without checking the bounds, for callers that check all their boxes at once
+        W, H = _get_scale_wh(image_wh)
+        bbox = cls.__new__(cls)
+        bbox.x0, bbox.y0, bbox.x1, bbox.y1 = x0/W, y0/H, (x0 + w)/W, (y0 + h)/H
+        return bbox
+
     # --- to --- #
 
     def get_cxywh(self, image_wh: Optional[Tuple[float, float]] = None) -> Tuple[float, float, float, float]:
@@ -97,6 +232,100 @@ class Bbox(AnnotationValue):
         y1 = self.y1
         return (x0*W, y0*H, x1*W, y1*H)
 
+    # --- batch from --- #
+    # convert arrays of shape (N, 4) to arrays of normalised (x0, y0, x1, y1)
+
+    @classmethod
+    def batch_from_cxywh(cls, cxywh: np.ndarray, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        cxywh = _get_batch_boxes(cxywh)
+        c, hwh = cxywh[:, :2], cxywh[:, 2:] / 2
+        return np.concatenate([c - hwh, c + hwh], axis=1) / _get_batch_scale(image_wh)
+
+    @classmethod
+    def batch_from_xywh(cls, xywh: np.ndarray, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        xywh = _get_batch_boxes(xywh)
+        xy = xywh[:, :2]
+        return np.concatenate([xy, xy + xywh[:, 2:]], axis=1) / _get_batch_scale(image_wh)
+
+    @classmethod
+    def batch_from_xyxy(cls, xyxy: np.ndarray, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        return _get_batch_boxes(xyxy) / _get_batch_scale(image_wh)
+
+    @classmethod
+    def batch_from(cls, fmt: str, boxes: np.ndarray, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        return getattr(cls, f'batch_from_{_check_format(fmt)}')(boxes, image_wh=image_wh)
+
+    # --- batch to --- #
+    # convert arrays of normalised (x0, y0, x1, y1) with shape (N, 4) to other formats
+
+    @classmethod
+    def batch_get_cxywh(cls, xyxy: np.ndarray, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        xyxy = _get_batch_boxes(xyxy)
+        xy0, xy1 = xyxy[:, :2], xyxy[:, 2:]
+        return np.concatenate([(xy0 + xy1) / 2, xy1 - xy0], axis=1) * _get_batch_scale(image_wh)
+
+    @classmethod
+    def batch_get_xywh(cls, xyxy: np.ndarray, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        xyxy = _get_batch_boxes(xyxy)
+        xy0, xy1 = xyxy[:, :2], xyxy[:, 2:]
+        return np.concatenate([xy0, xy1 - xy0], axis=1) * _get_batch_scale(image_wh)
+
+    @classmethod
+    def batch_get_xyxy(cls, xyxy: np.ndarray, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        return _get_batch_boxes(xyxy) * _get_batch_scale(image_wh)
+
+    @classmethod
+    def batch_get(cls, fmt: str, xyxy: np.ndarray, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        return getattr(cls, f'batch_get_{_check_format(fmt)}')(xyxy, image_wh=image_wh)
+
+
+# ========================================================================= #
+# Bounding Box Geometry                                                     #
+# ========================================================================= #
+# arrays of boxes with shape (..., 4) in xyxy format, broadcast against each other like numpy arrays.
+# the iou of normalised boxes is the same as the iou of the boxes in pixels, so no image size is needed.
+
+
+def _get_geometry_boxes(boxes: np.ndarray) -> np.ndarray:
+    boxes = np.asarray(boxes)
+    if not np.issubdtype(boxes.dtype, np.floating):
+        boxes = boxes.astype(np.float64)
+    if (boxes.ndim < 1) or (boxes.shape[-1] != 4):
+        raise ValueError(f'boxes must have shape (..., 4), got: {boxes.shape}')
+    return boxes
+
+
+def bbox_area(boxes: np.ndarray) -> np.ndarray:
+    # boxes with inverted coordinates have no area
+    boxes = _get_geometry_boxes(boxes)
+    return np.maximum(boxes[..., 2] - boxes[..., 0], 0) * np.maximum(boxes[..., 3] - boxes[..., 1], 0)
+
+
+def bbox_intersection(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a, b = _get_geometry_boxes(a), _get_geometry_boxes(b)
+    w = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    h = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    return np.maximum(w, 0) * np.maximum(h, 0)
+
+
+def bbox_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # intersection over union, boxes that both have no area have an iou of 0
+    a, b = _get_geometry_boxes(a), _get_geometry_boxes(b)
+    inter = bbox_intersection(a, b)
+    union = bbox_area(a) + bbox_area(b) - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union > 0, inter / union, 0)
+
+
+def bbox_pairwise_intersection(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # boxes with shapes (N, 4) and (M, 4) give an array with shape (N, M)
+    return bbox_intersection(_get_batch_boxes(a)[:, None, :], _get_batch_boxes(b)[None, :, :])
+
+
+def bbox_pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # boxes with shapes (N, 4) and (M, 4) give an array with shape (N, M)
+    return bbox_iou(_get_batch_boxes(a)[:, None, :], _get_batch_boxes(b)[None, :, :])
+
 
 # ========================================================================= #
 # Bounding Box Object                                                       #
@@ -1,5 +1,10 @@
+import hashlib
+import itertools
+import sys
 import uuid
 from abc import ABCMeta
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Callable
 from typing import Dict
 from typing import Generic
@@ -14,10 +19,118 @@ from typing import Type
 from typing import TypeVar
 from typing import Union
 
+import numpy as np
 
+from datasmith._index import _DatasetIndex
+from datasmith._profiling import profile_stage
+from datasmith._util import isinstance_cached
 from datasmith._util import repr_truelike_kwargs_no_uid
 
 
+# ========================================================================= #
+# Unique ID Generation                                                      #
+# ========================================================================= #
+
+
+# how uids are generated for objects that are not given one:
+# - uuid4:   random uuid strings
+# - counter: short increasing integer strings, only unique within the current process
+# - lazy:    random uuid strings, only generated if the uid is accessed
+UID_STRATEGIES = ('uuid4', 'counter', 'lazy')
+
+UidStrategy = Union[str, Callable[[], str]]
+
+_UID_STRATEGY: UidStrategy = 'uuid4'
+_UID_COUNTER = itertools.count()
+
+
+def _make_uuid4() -> str:
+    return str(uuid.uuid4())
+
+
+def _make_counter_uid() -> str:
+    return f'#{next(_UID_COUNTER)}'
+
+
+def _make_lazy_uid() -> None:
+    return None
+
+
+# number of lazy uids that have been generated, lists only look for newly generated
+# uids among their items with lazy uids when this has changed since they last looked
+_LAZY_UIDS_GENERATED: int = 0
+
+
+_new_uid: Callable[[], Optional[str]] = _make_uuid4
+
+
+def _generate_uid() -> str:
+    # generate a uid now with the current strategy, lazy uids cannot be deferred
+    uid = _new_uid()
+    return _make_uuid4() if (uid is None) else uid
+
+
+def get_uid_strategy() -> UidStrategy:
+    return _UID_STRATEGY
+
+
+def set_uid_strategy(strategy: UidStrategy) -> UidStrategy:
+    global _UID_STRATEGY, _new_uid
+    if callable(strategy):
+        new_uid = strategy
+    elif strategy == 'uuid4':
+        new_uid = _make_uuid4
+    elif strategy == 'counter':
+        new_uid = _make_counter_uid
+    elif strategy == 'lazy':
+        new_uid = _make_lazy_uid
+    else:
+        raise KeyError(f'unsupported uid strategy: {repr(strategy)}, must be callable or one of: {UID_STRATEGIES}')
+    # returns the previous strategy
+    prev, _UID_STRATEGY, _new_uid = _UID_STRATEGY, strategy, new_uid
+    return prev
+
+
+@contextmanager
+def uid_strategy(strategy: UidStrategy) -> Iterator[UidStrategy]:
+    prev = set_uid_strategy(strategy)
+    try:
+        yield strategy
+    finally:
+        set_uid_strategy(prev)
+
+
+def make_source_uid(*parts) -> str:
+    # deterministic uid derived from source ids, eg. `make_source_uid('my-coco', 'image', 42)`
+    # so that re-importing the same source produces the same uids
+    return hashlib.blake2b('\x1f'.join(map(str, parts)).encode('utf-8'), digest_size=8).hexdigest()
+
+
+# ========================================================================= #
+# Interned Labels & Tags                                                    #
+# ========================================================================= #
+
+
+# labels & tags are sets, stored as sorted tuples so that equal sets compare equal and
+# can share the same tuple. Recently used sets are cached, and their strings are interned.
+_INTERNED_STRS_SIZE = 4096
+
+
+@lru_cache(maxsize=_INTERNED_STRS_SIZE)
+def _intern_key(key: Tuple[str, ...]) -> Tuple[str, ...]:
+    # `str` subclasses like `np.str_` cannot be interned, so they are converted first
+    return tuple(sys.intern(str(v)) for v in key)
+
+
+def _intern_strs(values: Optional[Iterable[str]], kind: str) -> Tuple[str, ...]:
+    if values is None:
+        return ()
+    values = set(values)
+    if any(not isinstance(v, str) for v in values):
+        raise TypeError(f'{kind} must all be of type str, got: {repr(tuple(values))}')
+    return _intern_key(tuple(sorted(values))) if values else ()
+
+
 # ========================================================================= #
 # Base unique ID object                                                     #
 # ========================================================================= #
@@ -25,43 +138,102 @@ from datasmith._util import repr_truelike_kwargs_no_uid
 
 class _UidObj(object):
 
+    __slots__ = ('_labels', '_tags', '_uid')
+
     def __init__(
         self,
         labels: Optional[Iterable[str]] = None,
         tags: Optional[Iterable[str]] = None,
         uid: Optional[str] = None,
     ):
-        self._labels: Tuple[str, ...] = ()                if (labels is None) else tuple(set(labels))
-        self._tags: Tuple[str, ...]   = ()                if (tags   is None) else tuple(set(tags))
-        self._uid: str                = str(uuid.uuid4()) if (uid    is None) else uid
-        # validate
-        if not isinstance(self._uid, str):
-            raise TypeError(f'uid must be of type str, got type: {type(uid)}, for: {repr(uid)}')
-        if any(not isinstance(tag, str) for tag in self._tags):
-            raise TypeError(f'tags must all be of type str, got: {repr(self._tags)}')
-        if any(not isinstance(label, str) for label in self._labels):
-            raise TypeError(f'labels must all be of type str, got: {repr(self._labels)}')
+        self._labels: Tuple[str, ...] = _intern_strs(labels, 'labels')
+        self._tags: Tuple[str, ...]   = _intern_strs(tags, 'tags')
+        self._uid: Optional[str]      = _new_uid() if (uid is None) else uid
+        # validate, lazy uids are generated on first access
+        if (self._uid is not None) and not isinstance(self._uid, str):
+            raise TypeError(f'uid must be of type str, got type: {type(self._uid)}, for: {repr(self._uid)}')
 
     @property
     def uid(self) -> str:
+        if self._uid is None:
+            global _LAZY_UIDS_GENERATED
+            self._uid = _make_uuid4()
+            _LAZY_UIDS_GENERATED += 1
         return self._uid
 
-    # TODO: make these mutable!
-    # TODO: make these mutable!
-    # TODO: make these mutable!
-
     @property
     def labels(self) -> Tuple[str, ...]:
         return self._labels
 
+    @labels.setter
+    def labels(self, labels: Optional[Iterable[str]]):
+        self._set_strs('labels', _intern_strs(labels, 'labels'))
+
     @property
     def tags(self) -> Tuple[str, ...]:
         return self._tags
 
+    @tags.setter
+    def tags(self, tags: Optional[Iterable[str]]):
+        self._set_strs('tags', _intern_strs(tags, 'tags'))
+
+    def _set_strs(self, kind: str, values: Tuple[str, ...]) -> NoReturn:
+        # `values` must already be interned, subclasses that store their labels & tags elsewhere override this.
+        # Many items are rather changed with `Dataset.relabel` & `Dataset.retag`, which keep indexes up to date.
+        if kind == 'labels':
+            self._labels = values
+        else:
+            self._tags = values
+
     def __repr__(self):
         return repr_truelike_kwargs_no_uid(self, labels=self.labels, tags=self.tags, uid=self.uid)
 
 
+# ========================================================================= #
+# Modification Tracking                                                     #
+# ========================================================================= #
+
+
+# The indexes of a dataset are rebuilt when the annotations, labels or tags of its items are modified
+# after they were added. Objects reference the list they were added to as their owner, and modifications
+# are passed up through the owners until they reach the storage of a dataset, so that only the indexes
+# of that dataset are invalidated. Objects that were added to more than one list are shared, and
+# modifying them invalidates the indexes of every dataset.
+
+
+class _Generation(object):
+
+    # the number of modifications to the items in the storage of a dataset
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+
+_SHARED = object()
+_SHARED_GENERATION: int = 0
+
+
+def _notify_modified(owner) -> NoReturn:
+    global _SHARED_GENERATION
+    while owner is not None:
+        if owner is _SHARED:
+            _SHARED_GENERATION += 1
+            return
+        if type(owner) is _Generation:
+            owner.value += 1
+            return
+        owner = owner._owner
+
+
+def _set_owner(objs: Iterable, owner) -> NoReturn:
+    for obj in objs:
+        prev = obj._owner
+        if prev is not owner:
+            obj._owner = owner if (prev is None) else _SHARED
+
+
 # ========================================================================= #
 # Base Unique ID List                                                       #
 # ========================================================================= #
@@ -76,53 +248,161 @@ UidMultiIdx = Union[slice, List[UidIdx]]
 
 class _UidList(Generic[T], metaclass=ABCMeta):
 
+    __slots__ = ('_uid_idxs', '_item_objs', '_lazy_idxs', '_lazy_checked')
+
     # must implement these
     ITEM_TYPE: Type[T]
     ITEM_NAME: str
     PARENT_NAME: str
 
-    def __init__(self, items: Optional[Iterable[T]]):
-        # storage
-        self._item_uids: Dict[str, T] = {}
+    def __init__(self, items: Optional[Iterable[T]], trusted: bool = False):
+        # storage, the positions of items with lazy uids are kept instead of their uids. Lazy uids are
+        # new uuids, so until they are generated they cannot be looked up or be repeated by other items.
+        self._uid_idxs: Dict[str, int] = {}
         self._item_objs: List[T] = []
-        # add items
+        self._lazy_idxs: List[int] = []
+        # the value of `_LAZY_UIDS_GENERATED` when the lazy uids were last checked
+        self._lazy_checked: int = -1
+        # add items, this is not a mutation as nothing can reference the list yet
         if items is not None:
-            self.extend(items)
+            self._extend(items, trusted=trusted)
 
     # --- iterators --- #
 
     def __len__(self):
-        return len(self._item_uids)
+        return len(self._item_objs)
 
     def __iter__(self) -> Iterator[T]:
         yield from self._item_objs
 
     # --- parent / children --- #  TODO: move this logic into its own class so that it can be used for annotations too!
 
-    def append(self, item: T) -> NoReturn:
+    def _append(self, item: T) -> NoReturn:
         # validate the item, making sure the type is correct and UID does not already exist
-        if not isinstance(item, self.ITEM_TYPE):
+        if not isinstance_cached(item, self.ITEM_TYPE):
             raise TypeError(f'{self.ITEM_NAME} must be of type: {self.ITEM_TYPE.__name__}, but got type: {type(item)}, for: {repr(item)}')
-        if item.uid in self._item_uids:
+        if item._uid is None:
+            self._lazy_idxs.append(len(self._item_objs))
+        elif self._lookup_uid(item._uid) is not None:
             raise KeyError(f'{self.ITEM_NAME} with id: {item.uid} already in {self.PARENT_NAME}')
+        else:
+            self._uid_idxs[item._uid] = len(self._item_objs)
         # add the item to the dataset
-        self._item_uids[item.uid] = item
         self._item_objs.append(item)
-
-    def extend(self, items: Iterable[T]) -> NoReturn:
+        owner = self._get_items_owner()
+        if owner is not None:
+            _set_owner([item], owner)
+
+    def _extend(self, items: Iterable[T], trusted: bool = False) -> NoReturn:
+        # the whole batch is checked at once, a single check of each distinct type and a single check for
+        # duplicate uids. Invalid batches are rather added one item at a time, so that the same error is
+        # raised after adding the same items as `append` would. The types of trusted items are not checked,
+        # these must be new objects that the caller just created itself, eg. the items built by importers.
+        items = items if isinstance(items, list) else list(items)
+        if not items:
+            return
+        if not trusted and not all(issubclass(t, self.ITEM_TYPE) for t in set(map(type, items))):
+            return self._append_each(items)
+        # lazy uids are left out of the lookup
+        start = len(self)
+        uids = [item._uid for item in items]
+        uid_idxs = dict(zip(uids, range(start, start + len(items))))
+        num_uids = len(items)
+        if None in uid_idxs:
+            del uid_idxs[None]
+            num_uids -= uids.count(None)
+        if uid_idxs and self._lazy_idxs:
+            self._update_lazy_uids()
+        known_idxs = self._get_uid_idxs()
+        if (len(uid_idxs) != num_uids) or (known_idxs and not known_idxs.keys().isdisjoint(uid_idxs)):
+            return self._append_each(items)
+        self._add_batch(items, uid_idxs)
+
+    def _append_each(self, items: List[T]) -> NoReturn:
         for item in items:
-            self.append(item)
+            self._append(item)
 
-    def _get_single_item(self, uid: UidIdx):
+    def _add_batch(self, items: List[T], uid_idxs: Dict[str, int]) -> NoReturn:
+        # add items that were already checked, subclasses that store items elsewhere override this.
+        # `uid_idxs` does not contain the items with lazy uids.
+        if self._uid_idxs:
+            self._uid_idxs.update(uid_idxs)
+        else:
+            self._uid_idxs = uid_idxs
+        if len(uid_idxs) < len(items):
+            start = len(self._item_objs)
+            self._lazy_idxs.extend(i for i, item in enumerate(items, start) if item._uid is None)
+        self._item_objs.extend(items)
+        owner = self._get_items_owner()
+        if owner is not None:
+            _set_owner(items, owner)
+        assert len(self._uid_idxs) + len(self._lazy_idxs) == len(self._item_objs), f'{self.PARENT_NAME} has {len(self._uid_idxs)} uids and {len(self._lazy_idxs)} lazy uids for {len(self._item_objs)} {self.ITEM_NAME}s'
+
+    def _update_lazy_uids(self) -> NoReturn:
+        # add the lazy uids that have been generated since their items were added, without generating the others.
+        # nothing needs to be checked if no lazy uids were generated anywhere since the last check
+        if self._lazy_checked == _LAZY_UIDS_GENERATED:
+            return
+        self._lazy_checked = _LAZY_UIDS_GENERATED
+        lazy_idxs, uid_idxs = [], self._get_uid_idxs()
+        for i in self._lazy_idxs:
+            uid = self._item_objs[i]._uid
+            if uid is None:
+                lazy_idxs.append(i)
+            else:
+                uid_idxs[uid] = i
+        self._lazy_idxs = lazy_idxs
+
+    def _get_uid_idxs(self) -> Dict[str, int]:
+        # lookup from uid to item index, subclasses that build this lazily override this
+        return self._uid_idxs
+
+    def _lookup_uid(self, uid: str) -> Optional[int]:
+        idx = self._get_uid_idxs().get(uid)
+        if (idx is None) and self._lazy_idxs:
+            self._update_lazy_uids()
+            idx = self._get_uid_idxs().get(uid)
+        return idx
+
+    def _get_items_owner(self):
+        # the owner of added items that are modified later, see `_notify_modified`
+        return None
+
+    def _on_mutated(self) -> NoReturn:
+        # called after items are added to an existing list
+        pass
+
+    def append(self, item: T) -> NoReturn:
+        try:
+            self._append(item)
+        finally:
+            self._on_mutated()
+
+    def extend(self, items: Iterable[T], trusted: bool = False) -> NoReturn:
+        try:
+            self._extend(items, trusted=trusted)
+        finally:
+            self._on_mutated()
+
+    def _get_position(self, uid: UidIdx) -> int:
         # support multiple indexing modes, including indexing and unique ids
         if isinstance(uid, int):
-            return self._item_objs[uid]
+            n = len(self)
+            if not (-n <= uid < n):
+                raise IndexError(f'{self.ITEM_NAME} index out of range: {uid}')
+            return uid % n
         elif isinstance(uid, str):
-            return self._item_uids[uid]
+            idx = self._lookup_uid(uid)
         elif isinstance(uid, self.ITEM_TYPE):
-            return self._item_uids[uid.uid]
+            idx = self._lookup_uid(uid.uid)
         else:
             raise TypeError(f'unsupported indexing type: {type(uid)}, for: {repr(uid)}')
+        if idx is None:
+            raise KeyError(uid if isinstance(uid, str) else uid.uid)
+        return idx
+
+    def _get_single_item(self, uid: UidIdx):
+        return self._item_objs[self._get_position(uid)]
 
     def __getitem__(self, uid: Union[UidIdx, UidMultiIdx]) -> Union[T, List[T]]:
         # support single or multiple indexing modes, including slicing and list indexing
@@ -136,9 +416,9 @@ class _UidList(Generic[T], metaclass=ABCMeta):
     def __contains__(self, uid: Union[str, T]) -> bool:
         # support indexing by unique id
         if isinstance(uid, str):
-            return (uid in self._item_uids)
+            return (self._lookup_uid(uid) is not None)
         elif isinstance(uid, self.ITEM_TYPE):
-            return (uid.uid in self._item_uids)
+            return (self._lookup_uid(uid.uid) is not None)
         else:
             raise TypeError(f'unsupported contains type: {type(uid)}, for: {repr(uid)}')
 
@@ -152,11 +432,13 @@ class _UidList(Generic[T], metaclass=ABCMeta):
 
 
 class AnnotationValue(object, metaclass=ABCMeta):
-    pass
+    __slots__ = ()
 
 
 class Annotation(Generic[T], _UidObj):
 
+    __slots__ = ('_value', '_owner')
+
     def __init__(
         self,
         value: T,
@@ -164,17 +446,26 @@ class Annotation(Generic[T], _UidObj):
         tags: Optional[Iterable[str]] = None,
         uid: Optional[str] = None,
     ):
-        if not isinstance(value, AnnotationValue):
+        if not isinstance_cached(value, AnnotationValue):
             raise TypeError(f'annotation value must be an instance of: {AnnotationValue.__name__}, got type: {type(value)}, for: {repr(value)}')
         # init
         super().__init__(labels=labels, tags=tags, uid=uid)
         # storage
         self._value = value
+        self._owner = None
 
     @property
     def value(self) -> T:
         return self._value
 
+    def _set_strs(self, kind: str, values: Tuple[str, ...]) -> NoReturn:
+        super()._set_strs(kind, values)
+        _notify_modified(self._owner)
+
+    def _copy(self) -> 'Annotation[T]':
+        # copy with the same uid, values are never modified in place so they are shared
+        return Annotation(self.value, labels=self.labels, tags=self.tags, uid=self.uid)
+
     def __repr__(self):
         return repr_truelike_kwargs_no_uid(self, value=self.value, labels=self.labels, tags=self.tags, uid=self.uid)
 
@@ -187,11 +478,28 @@ class Annotation(Generic[T], _UidObj):
 
 class DatasetItem(_UidObj, metaclass=ABCMeta):
 
+    __slots__ = ('_annotations', '_owner')
+
+    # the type of copies, views of items that are stored elsewhere are copied to the type they are a view of
+    _COPY_TYPE: Optional[Type['DatasetItem']] = None
+
     class _AnnotationList(_UidList[Annotation]):
+        __slots__ = ('_owner',)
         ITEM_TYPE = Annotation
         ITEM_NAME = 'annotation'
         PARENT_NAME = 'item'
 
+        def __init__(self, items: Optional[Iterable[Annotation]], trusted: bool = False):
+            # the item that the list belongs to
+            self._owner: Optional[DatasetItem] = None
+            super().__init__(items, trusted=trusted)
+
+        def _get_items_owner(self):
+            return self
+
+        def _on_mutated(self) -> NoReturn:
+            _notify_modified(self._owner)
+
     def __init__(
         self,
         annotations: Optional[Iterable[Annotation]] = None,
@@ -201,12 +509,31 @@ class DatasetItem(_UidObj, metaclass=ABCMeta):
     ):
         super().__init__(labels=labels, tags=tags, uid=uid)
         # storage
+        self._owner = None
         self._annotations = self._AnnotationList(annotations)
+        self._annotations._owner = self
 
     @property
     def annotations(self) -> _AnnotationList:
         return self._annotations
 
+    def _set_strs(self, kind: str, values: Tuple[str, ...]) -> NoReturn:
+        super()._set_strs(kind, values)
+        _notify_modified(self._owner)
+
+    def _copy(self) -> 'DatasetItem':
+        # independent copy with the same uids, used when datasets are derived from other datasets.
+        # subclasses with fields of their own extend this to copy those fields too
+        item = object.__new__(self._COPY_TYPE or type(self))
+        DatasetItem.__init__(
+            item,
+            annotations=[anno._copy() for anno in self.annotations],
+            labels=self.labels,
+            tags=self.tags,
+            uid=self.uid,
+        )
+        return item
+
     def __repr__(self):
         return repr_truelike_kwargs_no_uid(self, annotations=list(self.annotations), labels=self.labels, tags=self.tags, uid=self.uid)
 
@@ -224,10 +551,19 @@ class DatasetLabelNotFoundError(Exception):
 class Dataset(_UidObj):
 
     class _DatasetList(_UidList[DatasetItem]):
+        __slots__ = ('_generation',)
         ITEM_TYPE = DatasetItem
         ITEM_NAME = 'item'
         PARENT_NAME = 'dataset'
 
+        def __init__(self, items: Optional[Iterable[DatasetItem]], trusted: bool = False):
+            # modifications of the items after they were added, shared by the dataset and its views
+            self._generation = _Generation()
+            super().__init__(items, trusted=trusted)
+
+        def _get_items_owner(self) -> _Generation:
+            return self._generation
+
     def __init__(
         self,
         items: Optional[Iterable[DatasetItem]] = None,
@@ -236,19 +572,28 @@ class Dataset(_UidObj):
         name: Optional[str] = None,
         uid: Optional[str] = None,
     ):
-        if not isinstance(name, str):
+        if (name is not None) and not isinstance(name, str):
             raise TypeError(f'dataset name must be a str, got type: {type(name)}, for: {repr(name)}')
         # init
         super().__init__(labels=labels, tags=tags, uid=uid)
         # storage
         self._name = name if name else self.uid
-        self._items = self._DatasetList(items)
+        if items is None:
+            self._items = self._DatasetList(None)
+        else:
+            # iterating over the items can include parsing them, eg. when streaming
+            with profile_stage('dataset.add_items') as stage:
+                self._items = self._DatasetList(items)
+                stage.count('items', len(self._items))
+        # built on first use
+        self._index: Optional[_DatasetIndex] = None
+        self._spatial_index: Optional['_BboxGridIndex'] = None
 
     # --- properties --- #
 
     @property
     def name(self) -> str:
-        return self.name
+        return self._name
 
     def __repr__(self):
         return repr_truelike_kwargs_no_uid(self, items='<hidden>', labels=self.labels, tags=self.tags, uid=self.uid)
@@ -262,27 +607,207 @@ class Dataset(_UidObj):
         yield from self._items
 
     def append(self, item: DatasetItem) -> NoReturn:
-        return self._items.append(item)
-
-    def extend(self, items: Iterable[DatasetItem]) -> NoReturn:
-        return self._items.extend(items)
-
-    def __getitem__(self, uid: Union[UidIdx, UidMultiIdx]) -> Union[DatasetItem, List[DatasetItem]]:
-        return self._items.__getitem__(uid)
+        self._items.append(item)
+        for index in (self._index, self._spatial_index):
+            if index is not None:
+                index.add(len(self._items) - 1, item)
+
+    def extend(self, items: Iterable[DatasetItem], trusted: bool = False) -> NoReturn:
+        # trusted items are not checked, see `_UidList._extend`
+        with profile_stage('dataset.add_items') as stage:
+            start = len(self._items)
+            try:
+                self._extend(items, trusted=trusted)
+            finally:
+                stage.count('items', len(self._items) - start)
+
+    def _extend(self, items: Iterable[DatasetItem], trusted: bool = False) -> NoReturn:
+        if (self._index is None) and (self._spatial_index is None):
+            return self._items.extend(items, trusted=trusted)
+        # update the indices with all the items that were added, even if one fails
+        items, start = list(items), len(self._items)
+        try:
+            self._items.extend(items, trusted=trusted)
+        finally:
+            for index in (self._index, self._spatial_index):
+                if index is not None:
+                    index.add_items(start, items[:len(self._items) - start])
+
+    def _get_position(self, uid: UidIdx) -> int:
+        return self._items._get_position(uid)
+
+    def __getitem__(self, uid: Union[UidIdx, UidMultiIdx]) -> Union[DatasetItem, 'DatasetView']:
+        # slicing and list indexing return views instead of copies
+        if isinstance(uid, slice):
+            return DatasetView(self, np.arange(*uid.indices(len(self))))
+        elif isinstance(uid, list):
+            return DatasetView(self, [self._get_position(i) for i in uid])
+        return self._items._get_single_item(uid)
 
     def __contains__(self, uid: Union[str, DatasetItem]) -> bool:
         return self._items.__contains__(uid)
 
+    def merge(
+        self,
+        *datasets: 'Dataset',
+        on_conflict: str = 'rename',
+        label_map: Union[None, Dict[str, str], Sequence[Optional[Dict[str, str]]]] = None,
+        name: Optional[str] = None,
+    ) -> 'Dataset':
+        from datasmith._merge import merge_datasets
+        # combine this dataset with the others into a new columnar dataset, either
+        # with `a.merge(b, c)` or `Dataset.merge(a, b, c)`
+        return merge_datasets([self, *datasets], on_conflict=on_conflict, label_map=label_map, name=name)
+
+    # --- columnar storage --- #
+
+    @classmethod
+    def from_columns(
+        cls,
+        columns: 'BboxColumns',
+        labels: Optional[Sequence[str]] = None,
+        tags: Optional[Sequence[str]] = None,
+        name: Optional[str] = None,
+        uid: Optional[str] = None,
+        check_uids: bool = True,
+    ) -> 'Dataset':
+        from datasmith._columnar import _ColumnarDatasetList
+        # items are created as lightweight views over the columns when accessed
+        dataset = cls(labels=labels, tags=tags, name=name, uid=uid)
+        dataset._items = _ColumnarDatasetList(columns, check_uids=check_uids)
+        return dataset
+
+    def save(self, path: str) -> str:
+        from datasmith._storage import save_columns
+        # items are stored as columns, along with the dataset metadata
+        meta = dict(labels=list(self.labels), tags=list(self.tags), name=self._name, uid=self.uid)
+        return save_columns(path, self.to_columns(), meta=meta)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'Dataset':
+        from datasmith._storage import load_columns
+        # saved datasets always have unique item uids, so checking them is deferred until needed
+        columns, meta = load_columns(path, mmap=mmap)
+        return cls.from_columns(columns, labels=meta['labels'], tags=meta['tags'], name=meta['name'], uid=meta['uid'], check_uids=False)
+
+    @property
+    def is_columnar(self) -> bool:
+        from datasmith._columnar import _ColumnarDatasetList
+        return isinstance(self._items, _ColumnarDatasetList)
+
+    def to_columns(self, anno_uids: bool = True) -> 'BboxColumns':
+        from datasmith._columnar import BboxColumns
+        # columnar datasets return their storage directly, without a copy
+        if self.is_columnar:
+            return self._items.columns
+        return BboxColumns.from_items(self, anno_uids=anno_uids)
+
+    def boxes(self, fmt: str = 'xyxy', normalized: bool = True, image_wh: Optional['ImageWH'] = None) -> 'np.ndarray':
+        # get the boxes of all the annotations in the dataset as an (N, 4) array, in item order
+        if normalized and (image_wh is not None):
+            raise ValueError('image_wh should not be given for normalized boxes')
+        if (not normalized) and (image_wh is None):
+            raise ValueError('image_wh must be given for boxes that are not normalized, either as (W, H) or with shape (N, 2)')
+        return self.to_columns(anno_uids=False).get_boxes(fmt, image_wh=image_wh)
+
+    def check_bounds(self, clip: bool = False) -> 'BboxBoundsReport':
+        from datasmith._columnar import check_bbox_bounds
+        return check_bbox_bounds(self, clip=clip)
+
+    def dedupe_boxes(self, iou_threshold: float = 0.9, per_label: bool = True) -> 'Dataset':
+        from datasmith._columnar import dedupe_bboxes
+        # remove boxes that overlap an earlier box of the same item, and with the same labels if `per_label`
+        return dedupe_bboxes(self, iou_threshold=iou_threshold, per_label=per_label)
+
+    # --- spatial queries --- #
+
+    def find_boxes(
+        self,
+        region: Optional[Sequence[float]] = None,
+        mode: str = 'intersects',
+        min_area: Optional[float] = None,
+        max_area: Optional[float] = None,
+    ) -> 'BboxQueryResult':
+        # find the boxes that match the normalised (x0, y0, x1, y1) region, and
+        # that cover between `min_area` and `max_area` of their image
+        index = self._get_root()._get_spatial_index()
+        result = index.get_result(index.query(region=region, mode=mode, min_area=min_area, max_area=max_area))
+        return self._select_box_result(result)
+
+    def filter_boxes(
+        self,
+        region: Optional[Sequence[float]] = None,
+        mode: str = 'intersects',
+        min_area: Optional[float] = None,
+        max_area: Optional[float] = None,
+    ) -> 'DatasetView':
+        # view of the items with at least one box that matches, see `find_boxes`
+        item_idxs = np.unique(self.find_boxes(region=region, mode=mode, min_area=min_area, max_area=max_area).item_idxs)
+        return DatasetView(self, item_idxs, labels=self.labels, tags=self.tags, name=self.name)
+
+    def _get_spatial_index(self) -> '_BboxGridIndex':
+        from datasmith._spatial import _BboxGridIndex
+        # the index is rebuilt if the annotations, labels or tags of its items were modified after being added
+        generation = self._get_generation()
+        if (self._spatial_index is None) or (self._spatial_index.generation != generation):
+            with profile_stage('dataset.spatial_index') as stage:
+                self._spatial_index = _BboxGridIndex(generation=generation).add_columns(0, self.to_columns(anno_uids=False))
+                stage.count('annotations', self._spatial_index.num_boxes)
+        return self._spatial_index
+
+    def _select_box_result(self, result: 'BboxQueryResult') -> 'BboxQueryResult':
+        # results of the root dataset are already relative to this dataset
+        return result
+
+    # --- images --- #
+
+    def probe_images(self, workers: int = 8) -> np.ndarray:
+        from datasmith._images import probe_images
+        # resolve the (width, height) of all the items at once, only
+        # reading the images that are not already known or cached
+        items = list(self)
+        wh = np.zeros((len(items), 2), dtype=np.int64)
+        unknown = []
+        for i, item in enumerate(items):
+            known = item._get_known_image_wh()
+            if known is None:
+                unknown.append(i)
+            else:
+                wh[i] = known
+        for i, meta in zip(unknown, probe_images([items[i].path for i in unknown], workers=workers)):
+            items[i]._set_image_meta(meta)
+            wh[i] = (meta.width, meta.height)
+        return wh
+
+    def find_duplicates(self, workers: int = 8) -> List[List[int]]:
+        from datasmith._dedupe import find_duplicate_items
+        # positions of the items that refer to files with the same contents
+        return find_duplicate_items(self, workers=workers)
+
+    def dedupe(self, workers: int = 8) -> 'Dataset':
+        from datasmith._dedupe import dedupe_dataset
+        # only the first item of each group of duplicates is kept, with
+        # the annotations, labels and tags of the whole group
+        return dedupe_dataset(self, workers=workers)[0]
+
     # --- validate --- #
 
-    def validate(self) -> 'Dataset':
-        # collect all the labels across the dataset
-        labels_items = set()
-        labels_annos = set()
-        for item in self:
-            labels_items.update(item.labels)
-            for annotation in item.annotations:
-                labels_annos.update(annotation.labels)
+    def validate(self, deep: bool = False) -> 'Dataset':
+        # collect all the labels across the dataset, either from the label
+        # statistics that are kept up to date, or by rescanning everything
+        with profile_stage('dataset.validate') as stage:
+            if deep:
+                labels_items = set()
+                labels_annos = set()
+                for item in self:
+                    labels_items.update(item.labels)
+                    for annotation in item.annotations:
+                        labels_annos.update(annotation.labels)
+            else:
+                stats = self._get_stats()
+                labels_items = stats.item_label_counts.keys()
+                labels_annos = stats.anno_label_counts.keys()
+            stage.count('items', len(self))
         # check missing labels obtained from items
         missing_items = set(self._labels) - labels_items
         if missing_items:
@@ -294,6 +819,69 @@ class Dataset(_UidObj):
         # done!
         return self
 
+    # --- labels & tags --- #
+
+    def relabel(self, label_map: Dict[str, Optional[str]], items: bool = True, annotations: bool = True) -> 'Dataset':
+        from datasmith._relabel import relabel_dataset
+        # rename labels in place, eg. `dataset.relabel({'smoke': 'haze'})`, labels mapped to `None` are removed
+        return relabel_dataset(self, label_map, items=items, annotations=annotations)
+
+    def retag(self, tag_map: Dict[str, Optional[str]], items: bool = True, annotations: bool = True) -> 'Dataset':
+        from datasmith._relabel import retag_dataset
+        # rename tags in place, tags mapped to `None` are removed
+        return retag_dataset(self, tag_map, items=items, annotations=annotations)
+
+    def tag_items(self, selection: Union[None, 'Dataset', np.ndarray, Sequence[UidIdx]], tags: Union[str, Iterable[str]]) -> 'Dataset':
+        from datasmith._relabel import tag_dataset_items
+        # add tags to the selected items, either a view of this dataset, a boolean mask, or a list of indices or uids
+        return tag_dataset_items(self, selection, tags, remove=False)
+
+    def untag_items(self, selection: Union[None, 'Dataset', np.ndarray, Sequence[UidIdx]], tags: Union[str, Iterable[str]]) -> 'Dataset':
+        from datasmith._relabel import tag_dataset_items
+        # remove tags from the selected items, see `tag_items`
+        return tag_dataset_items(self, selection, tags, remove=True)
+
+    # --- statistics --- #
+
+    def _get_stats(self) -> _DatasetIndex:
+        return self._get_index()
+
+    def _get_counts(self, kind: str, of: str) -> Dict[str, int]:
+        stats = self._get_stats()
+        if of == 'annotations':
+            counts = stats.anno_label_counts if (kind == 'labels') else stats.anno_tag_counts
+        elif of == 'items':
+            counts = stats.item_label_counts if (kind == 'labels') else stats.item_tag_counts
+        else:
+            raise KeyError(f'unsupported counts of: {repr(of)}, must be one of: {("annotations", "items")}')
+        return {k: v for k, v in counts.items() if v > 0}
+
+    def label_counts(self, of: str = 'annotations') -> Dict[str, int]:
+        # the number of annotations (or items) that each label occurs on
+        return self._get_counts('labels', of=of)
+
+    def tag_counts(self, of: str = 'annotations') -> Dict[str, int]:
+        # the number of annotations (or items) that each tag occurs on
+        return self._get_counts('tags', of=of)
+
+    # --- index --- #
+
+    def _get_generation(self) -> Tuple[int, int]:
+        # the indexes are valid while this is unchanged, views share the generation of their storage
+        return (self._items._generation.value, _SHARED_GENERATION)
+
+    def _get_index(self) -> _DatasetIndex:
+        # the index is rebuilt if the annotations, labels or tags of its items were modified after being added
+        generation = self._get_generation()
+        if (self._index is None) or (self._index.generation != generation):
+            with profile_stage('dataset.index') as stage:
+                if self.is_columnar:
+                    self._index = _DatasetIndex(generation=generation).add_columns(0, self.to_columns())
+                else:
+                    self._index = _DatasetIndex(generation=generation).add_items(0, self._items)
+                stage.count('items', len(self._items))
+        return self._index
+
     # --- filter --- #
 
     def filter_items(
@@ -305,41 +893,194 @@ class Dataset(_UidObj):
         anno_labels: Optional[Iterable[str]] = None,
         anno_tags: Optional[Iterable[str]] = None,
     ):
-        def _make_fn_chain(fn, labels, tags):
-            chain = []
-            if fn:
-                chain.append(fn)
-            if labels:
-                labels = set(labels)
-                chain.append(lambda it: labels.issubset(it.labels))
-            if tags:
-                tags = set(tags)
-                chain.append(lambda it: tags.issubset(it.tags))
-            return chain
-        # keep the specified items
-        item_chain = _make_fn_chain(item_fn, item_labels, item_tags)
-        anno_chain = _make_fn_chain(anno_fn, anno_labels, anno_tags)
+        # label & tag constraints are resolved with the index, so only
+        # the remaining candidates need to be checked by the functions
+        positions = self._get_index().query(item_labels=item_labels, item_tags=item_tags, anno_labels=anno_labels, anno_tags=anno_tags)
+        candidates = self._get_candidates(positions)
         # filter
-        items = []
-        for item in self:
+        keep = []
+        for i in candidates:
+            item = self._items._get_single_item(i)
             # check the item
-            if not all(fn(item) for fn in item_chain):
+            if item_fn and not item_fn(item):
+                continue
+            # check the annotations, skipping the item if an annotation fails
+            if anno_fn and not all(anno_fn(anno) for anno in item.annotations):
                 continue
-            # check the annotations
-            if anno_chain:
-                keep = True
-                for anno in item.annotations:
-                    keep = all(fn(anno) for fn in anno_chain)
-                    if not keep:
-                        break
-                # skip the item if an annotation fails
-                if not keep:
-                    continue
             # keep the item!
-            items.append(item)
-        # make the new datasets
+            keep.append(i)
+        # make the new view over the same storage
         # TODO: this should probably not set the tags/labels/name of the dataset
-        return Dataset(items, labels=self.labels, tags=self.tags, name=self.name)
+        return DatasetView(self._get_root(), keep, labels=self.labels, tags=self.tags, name=self.name)
+
+    # --- split --- #
+
+    def split(
+        self,
+        ratios: Union[Sequence[float], Dict[str, float]],
+        stratify: Optional[str] = 'annotation_labels',
+        seed: Optional[int] = 0,
+    ) -> Union[List['DatasetView'], Dict[str, 'DatasetView']]:
+        from datasmith._split import split_dataset
+        # views with the given proportions of the items, named splits are returned as a dict
+        if isinstance(ratios, dict):
+            return dict(zip(ratios.keys(), split_dataset(self, list(ratios.values()), stratify=stratify, seed=seed)))
+        return split_dataset(self, ratios, stratify=stratify, seed=seed)
+
+    # --- views --- #
+
+    def _get_root(self) -> 'Dataset':
+        # the dataset that owns the item storage
+        return self
+
+    def _get_candidates(self, positions: Optional[List[int]]) -> List[int]:
+        # positions in the item storage of the items in this dataset that are also in `positions`
+        return list(range(len(self))) if (positions is None) else positions
+
+
+# ========================================================================= #
+# Dataset View                                                              #
+# ========================================================================= #
+
+
+class DatasetView(Dataset):
+
+    def __init__(
+        self,
+        parent: Dataset,
+        indices: Union[Sequence[int], np.ndarray],
+        labels: Optional[Sequence[str]] = None,
+        tags: Optional[Sequence[str]] = None,
+        name: Optional[str] = None,
+        uid: Optional[str] = None,
+    ):
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if np.any((indices < 0) | (indices >= len(parent))):
+            raise IndexError(f'view indices out of range for dataset of length: {len(parent)}')
+        # views of views reference the root dataset directly
+        if isinstance(parent, DatasetView):
+            indices, parent = parent._indices[indices], parent._parent
+        # increasing indices are always unique, otherwise check for repeats after sorting
+        if np.any(indices[1:] <= indices[:-1]):
+            ordered = np.sort(indices)
+            if np.any(ordered[1:] == ordered[:-1]):
+                raise KeyError('dataset views cannot contain the same item more than once')
+        # init, defaulting to the properties of the parent
+        _UidObj.__init__(self, labels=parent.labels if (labels is None) else labels, tags=parent.tags if (tags is None) else tags, uid=uid)
+        self._name = parent.name if (name is None) else name
+        # storage is shared with the parent
+        self._parent = parent
+        self._indices = indices
+        self._items = parent._items
+        # statistics for the items in the view, built on first use
+        self._index: Optional[_DatasetIndex] = None
+        # built on first use, from positions in the item storage to positions in the view
+        self._positions: Optional[Dict[int, int]] = None
+
+    @property
+    def parent(self) -> Dataset:
+        return self._parent
+
+    @property
+    def indices(self) -> np.ndarray:
+        return self._indices
+
+    # --- item list --- #
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __iter__(self) -> Iterator[DatasetItem]:
+        for i in self._indices.tolist():
+            yield self._items._get_single_item(i)
+
+    def append(self, item: DatasetItem) -> NoReturn:
+        raise TypeError(f'dataset views are read-only, use `materialize()` to get a copy that can be modified')
+
+    def extend(self, items: Iterable[DatasetItem]) -> NoReturn:
+        raise TypeError(f'dataset views are read-only, use `materialize()` to get a copy that can be modified')
+
+    def _get_positions(self) -> Dict[int, int]:
+        if self._positions is None:
+            self._positions = {p: i for i, p in enumerate(self._indices.tolist())}
+        return self._positions
+
+    def _get_position(self, uid: UidIdx) -> int:
+        if isinstance(uid, int):
+            n = len(self)
+            if not (-n <= uid < n):
+                raise IndexError(f'item index out of range: {uid}')
+            return uid % n
+        # look up the item in the storage, then check that it is part of the view
+        i = self._get_positions().get(self._items._get_position(uid))
+        if i is None:
+            raise KeyError(f'item with id: {uid.uid if isinstance(uid, DatasetItem) else uid} not in dataset view')
+        return i
+
+    def __getitem__(self, uid: Union[UidIdx, UidMultiIdx]) -> Union[DatasetItem, 'DatasetView']:
+        if isinstance(uid, (slice, list)):
+            return super().__getitem__(uid)
+        return self._items._get_single_item(int(self._indices[self._get_position(uid)]))
+
+    def __contains__(self, uid: Union[str, DatasetItem]) -> bool:
+        if not self._items.__contains__(uid):
+            return False
+        return self._items._get_position(uid) in self._get_positions()
+
+    # --- columnar storage --- #
+
+    def to_columns(self, anno_uids: bool = True) -> 'BboxColumns':
+        if self.is_columnar:
+            return self._items.columns.select_items(self._indices)
+        return super().to_columns(anno_uids=anno_uids)
+
+    # --- index --- #
+
+    def _get_index(self) -> _DatasetIndex:
+        return self._parent._get_index()
+
+    def _get_stats(self) -> _DatasetIndex:
+        # statistics only cover the items in the view
+        generation = self._get_generation()
+        if (self._index is None) or (self._index.generation != generation):
+            with profile_stage('dataset.index') as stage:
+                if self.is_columnar:
+                    self._index = _DatasetIndex(generation=generation).add_columns(0, self._items.columns, self._indices, positions=np.arange(len(self._indices)))
+                else:
+                    self._index = _DatasetIndex(generation=generation).add_items(0, self)
+                stage.count('items', len(self))
+        return self._index
+
+    # --- spatial queries --- #
+
+    def _select_box_result(self, result: 'BboxQueryResult') -> 'BboxQueryResult':
+        # only keep the boxes of items in the view, in the order of the view
+        lookup = np.full(len(self._parent), -1, dtype=np.int64)
+        lookup[self._indices] = np.arange(len(self._indices))
+        item_idxs = lookup[result.item_idxs]
+        rows = np.flatnonzero(item_idxs >= 0)
+        rows = rows[np.lexsort((result.anno_idxs[rows], item_idxs[rows]))]
+        return result._replace(item_idxs=item_idxs[rows], anno_idxs=result.anno_idxs[rows], boxes=result.boxes[rows])
+
+    # --- views --- #
+
+    def _get_root(self) -> 'Dataset':
+        return self._parent
+
+    def _get_candidates(self, positions: Optional[List[int]]) -> List[int]:
+        # keep the order of the view
+        if positions is None:
+            return self._indices.tolist()
+        return self._indices[np.isin(self._indices, positions)].tolist()
+
+    def materialize(self) -> Dataset:
+        # copy the selected items into a new independent dataset
+        if self.is_columnar:
+            return Dataset.from_columns(self.to_columns(), labels=self.labels, tags=self.tags, name=self.name)
+        # the copies are new objects of items that are already known to be valid, so they are not checked again
+        dataset = Dataset(labels=self.labels, tags=self.tags, name=self.name)
+        dataset.extend([item._copy() for item in self], trusted=True)
+        return dataset
 
 
 # ========================================================================= #
@@ -0,0 +1,748 @@
+import itertools
+import warnings
+from collections import OrderedDict
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+from datasmith._annotations import Bbox
+from datasmith._annotations import BboxBoundsError
+from datasmith._annotations import ImageWH
+from datasmith._annotations import _claim_bbox_warning
+from datasmith._annotations import _handle_bbox_violation
+from datasmith._annotations import bbox_iou
+from datasmith._annotations import get_bbox_validation
+from datasmith._base import Annotation
+from datasmith._base import Dataset
+from datasmith._base import DatasetItem
+from datasmith._base import UidIdx
+from datasmith._base import UidMultiIdx
+from datasmith._base import _SHARED
+from datasmith._base import _notify_modified
+from datasmith._base import _set_owner
+from datasmith._base import _intern_strs
+from datasmith._images import ImageMeta
+from datasmith._items import DatasetItemPath
+from datasmith._profiling import profile_count
+from datasmith._profiling import profile_stage
+from datasmith._util import isinstance_cached
+from datasmith._util import repr_truelike_kwargs_no_uid
+
+
+# ========================================================================= #
+# Helper                                                                    #
+# ========================================================================= #
+
+
+StrSets = List[Tuple[str, ...]]
+
+
+def _encode_sets(values: Iterable[Tuple[str, ...]], table: Dict[Tuple[str, ...], int]) -> np.ndarray:
+    # each distinct set of strings is stored once in the table and referenced by an integer code
+    return np.fromiter((table.setdefault(v, len(table)) for v in values), dtype=np.int32)
+
+
+def _make_table(sets: Optional[Sequence[Tuple[str, ...]]] = None) -> Dict[Tuple[str, ...], int]:
+    table = {(): 0}
+    for s in (sets or ()):
+        table.setdefault(s, len(table))
+    return table
+
+
+def _get_set_code(sets: StrSets, values: Tuple[str, ...]) -> int:
+    # code of a set in a lookup table, appending the set if it is new
+    try:
+        return sets.index(values)
+    except ValueError:
+        sets.append(values)
+        return len(sets) - 1
+
+
+def _check_item(item: DatasetItem) -> DatasetItemPath:
+    if not isinstance_cached(item, DatasetItemPath):
+        raise TypeError(f'columnar items must be of type: {DatasetItemPath.__name__}, but got type: {type(item)}, for: {repr(item)}')
+    for anno in item.annotations:
+        if not isinstance_cached(anno.value, Bbox):
+            raise TypeError(f'columnar annotation values must be of type: {Bbox.__name__}, but got type: {type(anno.value)}, for: {repr(anno.value)}')
+    return item
+
+
+# ========================================================================= #
+# Columnar Bounding Boxes                                                   #
+# ========================================================================= #
+
+
+class BboxColumns(object):
+
+    def __init__(
+        self,
+        coords: np.ndarray,
+        item_offsets: np.ndarray,
+        item_paths: Sequence[str],
+        item_uids: Sequence[str],
+        anno_label_codes: Optional[np.ndarray] = None,
+        anno_tag_codes: Optional[np.ndarray] = None,
+        item_label_codes: Optional[np.ndarray] = None,
+        item_tag_codes: Optional[np.ndarray] = None,
+        label_sets: Optional[StrSets] = None,
+        tag_sets: Optional[StrSets] = None,
+        anno_uids: Optional[Sequence[str]] = None,
+        item_wh: Optional[np.ndarray] = None,
+    ):
+        # annotations: normalised (x0, y0, x1, y1) of every box, stored contiguously per item
+        self.coords: np.ndarray = np.asarray(coords, dtype=np.float32).reshape(-1, 4)
+        self.anno_label_codes: np.ndarray = self._codes(anno_label_codes, len(self.coords))
+        self.anno_tag_codes: np.ndarray = self._codes(anno_tag_codes, len(self.coords))
+        self.anno_uids: Optional[Sequence[str]] = anno_uids
+        # items: the annotations of item `i` are the rows `item_offsets[i]:item_offsets[i+1]`
+        self.item_offsets: np.ndarray = np.asarray(item_offsets, dtype=np.int64)
+        self.item_paths: Sequence[str] = item_paths
+        self.item_uids: Sequence[str] = item_uids
+        self.item_label_codes: np.ndarray = self._codes(item_label_codes, len(self.item_paths))
+        self.item_tag_codes: np.ndarray = self._codes(item_tag_codes, len(self.item_paths))
+        # optional pixel (width, height) of each item, zero if unknown
+        self.item_wh: Optional[np.ndarray] = None if (item_wh is None) else np.asarray(item_wh, dtype=np.int32)
+        # lookup tables for the label & tag codes, code 0 is always the empty set
+        self.label_sets: StrSets = list(label_sets) if label_sets else [()]
+        self.tag_sets: StrSets = list(tag_sets) if tag_sets else [()]
+        # validate
+        if self.label_sets[0] or self.tag_sets[0]:
+            raise ValueError('the first label set and tag set must be empty')
+        if (self.item_offsets.ndim != 1) or (len(self.item_offsets) != len(self.item_paths) + 1) or (self.item_offsets[0] != 0) or (self.item_offsets[-1] != len(self.coords)) or np.any(np.diff(self.item_offsets) < 0):
+            raise ValueError(f'item_offsets must be non-decreasing, start at 0, end at the number of annotations: {len(self.coords)}, and have length: {len(self.item_paths) + 1}')
+        if len(self.item_uids) != len(self.item_paths):
+            raise ValueError(f'expected {len(self.item_paths)} item uids, got: {len(self.item_uids)}')
+        if (self.anno_uids is not None) and (len(self.anno_uids) != len(self.coords)):
+            raise ValueError(f'expected {len(self.coords)} annotation uids, got: {len(self.anno_uids)}')
+        if (self.item_wh is not None) and (self.item_wh.shape != (len(self.item_paths), 2)):
+            raise ValueError(f'expected item_wh with shape: {(len(self.item_paths), 2)}, got: {self.item_wh.shape}')
+        # the dataset that stores these columns, see `_base._notify_modified`
+        self._owner = None
+
+    @staticmethod
+    def _codes(codes: Optional[np.ndarray], n: int) -> np.ndarray:
+        if codes is None:
+            return np.zeros(n, dtype=np.int32)
+        codes = np.asarray(codes, dtype=np.int32)
+        if codes.shape != (n,):
+            raise ValueError(f'expected codes with shape: {(n,)}, got: {codes.shape}')
+        return codes
+
+    # --- properties --- #
+
+    @property
+    def num_items(self) -> int:
+        return len(self.item_paths)
+
+    @property
+    def num_annotations(self) -> int:
+        return len(self.coords)
+
+    @property
+    def nbytes(self) -> int:
+        # approximate size of the numerical storage, excluding strings
+        arrays = [self.coords, self.anno_label_codes, self.anno_tag_codes, self.item_offsets, self.item_label_codes, self.item_tag_codes, self.item_wh]
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    @property
+    def anno_item_idxs(self) -> np.ndarray:
+        # the index of the item that each annotation belongs to
+        return np.repeat(np.arange(self.num_items), np.diff(self.item_offsets))
+
+    def item_slice(self, idx: int) -> slice:
+        return slice(int(self.item_offsets[idx]), int(self.item_offsets[idx + 1]))
+
+    def get_anno_uids(self, rows: Optional[np.ndarray] = None) -> Sequence[str]:
+        # annotations without explicit uids are identified by their item and position in that item
+        if rows is not None:
+            if self.anno_uids is not None:
+                return [self.anno_uids[j] for j in rows.tolist()]
+            idxs = self.anno_item_idxs[rows]
+            return [f'{self.item_uids[i]}:{k}' for i, k in zip(idxs.tolist(), (rows - self.item_offsets[idxs]).tolist())]
+        if self.anno_uids is not None:
+            return self.anno_uids
+        counts = np.diff(self.item_offsets)
+        return [f'{uid}:{k}' for uid, n in zip(self.item_uids, counts.tolist()) for k in range(n)]
+
+    def get_codes(self, kind: str, of: str) -> Tuple[np.ndarray, StrSets]:
+        # the label or tag codes of the items or annotations, along with their lookup table
+        if kind not in ('labels', 'tags'):
+            raise KeyError(f'unsupported kind: {repr(kind)}, must be one of: {("labels", "tags")}')
+        if of == 'annotations':
+            codes = self.anno_label_codes if (kind == 'labels') else self.anno_tag_codes
+        elif of == 'items':
+            codes = self.item_label_codes if (kind == 'labels') else self.item_tag_codes
+        else:
+            raise KeyError(f'unsupported codes of: {repr(of)}, must be one of: {("annotations", "items")}')
+        return codes, (self.label_sets if (kind == 'labels') else self.tag_sets)
+
+    def get_item_wh(self, idx: int) -> Optional[Tuple[int, int]]:
+        if (self.item_wh is None) or not self.item_wh[idx, 0]:
+            return None
+        return int(self.item_wh[idx, 0]), int(self.item_wh[idx, 1])
+
+    def set_item_wh(self, idx: int, wh: Tuple[int, int]):
+        if self.item_wh is None:
+            self.item_wh = np.zeros((self.num_items, 2), dtype=np.int32)
+        self.item_wh[idx] = wh
+
+    def get_boxes(self, fmt: str = 'xyxy', image_wh: Optional[ImageWH] = None) -> np.ndarray:
+        return Bbox.batch_get(fmt, self.coords, image_wh=image_wh)
+
+    def __repr__(self):
+        return repr_truelike_kwargs_no_uid(self, num_items=self.num_items, num_annotations=self.num_annotations)
+
+    # --- construct --- #
+
+    @classmethod
+    def from_items(cls, items: Iterable[DatasetItem], anno_uids: bool = True) -> 'BboxColumns':
+        labels, tags = _make_table(), _make_table()
+        coords, offsets, paths, uids, item_wh = [], [0], [], [], []
+        item_labels, item_tags, anno_labels, anno_tags, annos_uids = [], [], [], [], []
+        for item in items:
+            item = _check_item(item)
+            paths.append(item.path)
+            uids.append(item.uid)
+            item_wh.append(item._get_known_image_wh() or (0, 0))
+            item_labels.append(item.labels)
+            item_tags.append(item.tags)
+            for anno in item.annotations:
+                bbox = anno.value
+                coords.append((bbox.x0, bbox.y0, bbox.x1, bbox.y1))
+                anno_labels.append(anno.labels)
+                anno_tags.append(anno.tags)
+                annos_uids.append(anno.uid)
+            offsets.append(len(coords))
+        return cls(
+            coords=np.asarray(coords, dtype=np.float32).reshape(-1, 4),
+            item_offsets=np.asarray(offsets, dtype=np.int64),
+            item_paths=paths,
+            item_uids=uids,
+            anno_label_codes=_encode_sets(anno_labels, labels),
+            anno_tag_codes=_encode_sets(anno_tags, tags),
+            item_label_codes=_encode_sets(item_labels, labels),
+            item_tag_codes=_encode_sets(item_tags, tags),
+            label_sets=list(labels),
+            tag_sets=list(tags),
+            anno_uids=annos_uids if anno_uids else None,
+            item_wh=np.asarray(item_wh, dtype=np.int32).reshape(-1, 2) if any(wh[0] for wh in item_wh) else None,
+        )
+
+    @classmethod
+    def concat(cls, columns: Sequence['BboxColumns']) -> 'BboxColumns':
+        # label & tag tables are merged by value, so the codes of each part need to be remapped
+        labels, tags = _make_table(), _make_table()
+        remap = lambda table, sets, codes: np.asarray([table.setdefault(s, len(table)) for s in sets], dtype=np.int32)[codes]
+        keep_anno_uids = any(c.anno_uids is not None for c in columns)
+        keep_item_wh = any(c.item_wh is not None for c in columns)
+        offsets, base = [np.zeros(1, dtype=np.int64)], 0
+        for c in columns:
+            offsets.append(c.item_offsets[1:] + base)
+            base += c.num_annotations
+        return cls(
+            coords=np.concatenate([np.zeros((0, 4), dtype=np.float32)] + [c.coords for c in columns]),
+            item_offsets=np.concatenate(offsets),
+            item_paths=[path for c in columns for path in c.item_paths],
+            item_uids=[uid for c in columns for uid in c.item_uids],
+            anno_label_codes=np.concatenate([np.zeros(0, dtype=np.int32)] + [remap(labels, c.label_sets, c.anno_label_codes) for c in columns]),
+            anno_tag_codes=np.concatenate([np.zeros(0, dtype=np.int32)] + [remap(tags, c.tag_sets, c.anno_tag_codes) for c in columns]),
+            item_label_codes=np.concatenate([np.zeros(0, dtype=np.int32)] + [remap(labels, c.label_sets, c.item_label_codes) for c in columns]),
+            item_tag_codes=np.concatenate([np.zeros(0, dtype=np.int32)] + [remap(tags, c.tag_sets, c.item_tag_codes) for c in columns]),
+            label_sets=list(labels),
+            tag_sets=list(tags),
+            anno_uids=[uid for c in columns for uid in c.get_anno_uids()] if keep_anno_uids else None,
+            item_wh=np.concatenate([np.zeros((0, 2), dtype=np.int32)] + [np.zeros((c.num_items, 2), dtype=np.int32) if (c.item_wh is None) else c.item_wh for c in columns]) if keep_item_wh else None,
+        )
+
+    def select_items(self, idxs: np.ndarray) -> 'BboxColumns':
+        # copy the given items and their annotations into new columns
+        idxs = np.asarray(idxs, dtype=np.int64).reshape(-1)
+        starts = self.item_offsets[idxs]
+        counts = self.item_offsets[idxs + 1] - starts
+        offsets = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(counts)])
+        rows = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+        idxs_list = idxs.tolist()
+        return BboxColumns(
+            coords=self.coords[rows],
+            item_offsets=offsets,
+            item_paths=[self.item_paths[i] for i in idxs_list],
+            item_uids=[self.item_uids[i] for i in idxs_list],
+            anno_label_codes=self.anno_label_codes[rows],
+            anno_tag_codes=self.anno_tag_codes[rows],
+            item_label_codes=self.item_label_codes[idxs],
+            item_tag_codes=self.item_tag_codes[idxs],
+            label_sets=self.label_sets,
+            tag_sets=self.tag_sets,
+            anno_uids=None if (self.anno_uids is None) else [self.anno_uids[j] for j in rows.tolist()],
+            item_wh=None if (self.item_wh is None) else self.item_wh[idxs],
+        )
+
+    def select_annotations(self, rows: np.ndarray) -> 'BboxColumns':
+        # copy all the items, but only the given annotations in increasing order. annotation
+        # uids are kept, since uids derived from the position in an item would change.
+        rows = np.unique(np.asarray(rows, dtype=np.int64).reshape(-1))
+        counts = np.bincount(self.anno_item_idxs[rows], minlength=self.num_items)
+        return BboxColumns(
+            coords=self.coords[rows],
+            item_offsets=np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(counts)]),
+            item_paths=list(self.item_paths),
+            item_uids=list(self.item_uids),
+            anno_label_codes=self.anno_label_codes[rows],
+            anno_tag_codes=self.anno_tag_codes[rows],
+            item_label_codes=self.item_label_codes.copy(),
+            item_tag_codes=self.item_tag_codes.copy(),
+            label_sets=self.label_sets,
+            tag_sets=self.tag_sets,
+            anno_uids=self.get_anno_uids(rows) if (len(rows) < self.num_annotations) else (None if (self.anno_uids is None) else list(self.anno_uids)),
+            item_wh=None if (self.item_wh is None) else self.item_wh.copy(),
+        )
+
+    # --- access --- #
+
+    def get_item(self, idx: int) -> '_ItemView':
+        return _ItemView(self, idx)
+
+    def iter_items(self) -> Iterator['_ItemView']:
+        for i in range(self.num_items):
+            yield _ItemView(self, i)
+
+    def to_items(self) -> List[DatasetItemPath]:
+        # materialize independent copies of all the items
+        anno_uids = self.get_anno_uids()
+        coords = self.coords.tolist()
+        items = []
+        for i in range(self.num_items):
+            s = self.item_slice(i)
+            items.append(DatasetItemPath(
+                path=self.item_paths[i],
+                annotations=[
+                    Annotation(Bbox(*coords[j]), labels=self.label_sets[self.anno_label_codes[j]], tags=self.tag_sets[self.anno_tag_codes[j]], uid=anno_uids[j])
+                    for j in range(s.start, s.stop)
+                ],
+                labels=self.label_sets[self.item_label_codes[i]],
+                tags=self.tag_sets[self.item_tag_codes[i]],
+                uid=self.item_uids[i],
+                image_wh=self.get_item_wh(i),
+            ))
+        return items
+
+
+# ========================================================================= #
+# Bounds Checking                                                           #
+# ========================================================================= #
+
+
+class BboxBoundsReport(NamedTuple):
+    item_uids: List[str]
+    anno_uids: List[str]
+    boxes: np.ndarray
+    num_checked: int
+    clipped: bool
+
+    @property
+    def num_invalid(self) -> int:
+        return len(self.anno_uids)
+
+
+def check_bbox_bounds(dataset: Dataset, clip: bool = False) -> BboxBoundsReport:
+    # check all the boxes at once, instead of one at a time when they are constructed
+    columns = dataset.to_columns(anno_uids=False)
+    return _check_coords_bounds(dataset, columns.coords, columns.item_offsets, clip=clip)
+
+
+def _check_coords_bounds(dataset: Dataset, coords: np.ndarray, item_offsets: np.ndarray, clip: bool = False) -> BboxBoundsReport:
+    # the normalised coords of all the annotations in the dataset, in order, with the annotations
+    # of item `i` at the rows `item_offsets[i]:item_offsets[i+1]`, eg. gathered while importing
+    c = coords
+    valid = (0 <= c[:, 0]) & (c[:, 0] <= c[:, 2]) & (c[:, 2] <= 1) & (0 <= c[:, 1]) & (c[:, 1] <= c[:, 3]) & (c[:, 3] <= 1)
+    rows = np.flatnonzero(~valid)
+    item_idxs = np.searchsorted(item_offsets, rows, side='right') - 1
+    # only the uids of the invalid annotations are looked up
+    if dataset.is_columnar:
+        columns = dataset.to_columns()
+        item_uids = [columns.item_uids[i] for i in item_idxs.tolist()]
+        anno_uids = columns.get_anno_uids(rows)
+    else:
+        items = [dataset[i] for i in item_idxs.tolist()]
+        item_uids = [item.uid for item in items]
+        anno_uids = [item.annotations[k].uid for item, k in zip(items, (rows - item_offsets[item_idxs]).tolist())]
+    report = BboxBoundsReport(
+        item_uids=item_uids,
+        anno_uids=anno_uids,
+        boxes=c[rows].copy(),
+        num_checked=len(c),
+        clipped=clip,
+    )
+    # repair the boxes in-place, boxes with inverted coordinates will still be invalid.
+    # the boxes of columnar datasets are views, so this writes through to the columns.
+    if clip:
+        for item_uid, anno_uid in zip(report.item_uids, report.anno_uids):
+            bbox = dataset[item_uid].annotations[anno_uid].value
+            bbox.x0, bbox.y0, bbox.x1, bbox.y1 = (min(max(v, 0), 1) for v in (bbox.x0, bbox.y0, bbox.x1, bbox.y1))
+        # the spatial index does not track coordinates that are modified in-place
+        if report.num_invalid:
+            dataset._get_root()._spatial_index = None
+    return report
+
+
+def _validate_dataset_bounds(dataset: Dataset, mode: Optional[str] = None, coords: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Dataset:
+    # apply the bbox validation mode to a whole dataset, emitting at most one warning. The
+    # (coords, item_offsets) of the annotations can be given if they are already known.
+    mode = get_bbox_validation() if (mode is None) else mode
+    if mode == 'off':
+        return dataset
+    with profile_stage('validate_bounds') as stage:
+        report = check_bbox_bounds(dataset) if (coords is None) else _check_coords_bounds(dataset, *coords)
+        stage.count('annotations', report.num_checked)
+    if not report.num_invalid:
+        return dataset
+    msg = f'{report.num_invalid} of {report.num_checked} boxes have invalid bounds, eg. annotation: {repr(report.anno_uids[0])} of item: {repr(report.item_uids[0])} with bounds: {report.boxes[0].tolist()}'
+    if mode == 'raise':
+        raise BboxBoundsError(msg)
+    elif mode == 'collect':
+        for item_uid, anno_uid in zip(report.item_uids, report.anno_uids):
+            _handle_bbox_violation(dataset[item_uid].annotations[anno_uid].value, mode=mode)
+    else:
+        profile_count('bbox_violations', report.num_invalid)
+        # 'warn-once' shares its single warning with the boxes checked one by one
+        if (mode == 'warn') or _claim_bbox_warning():
+            profile_count('warnings')
+            warnings.warn(f'{msg}, use `Dataset.check_bounds` to find all invalid boxes')
+    return dataset
+
+
+# ========================================================================= #
+# Duplicate Boxes                                                           #
+# ========================================================================= #
+
+
+def _iter_pair_batches(group_pos: np.ndarray, max_pairs: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # boxes are sorted by group, the box at sorted index `j` is compared against the `group_pos[j]`
+    # boxes before it in its group. Batches contain consecutive boxes, up to `max_pairs` comparisons each.
+    n, start = len(group_pos), 0
+    cum = np.cumsum(group_pos)
+    while start < n:
+        base = cum[start - 1] if start else 0
+        stop = max(int(np.searchsorted(cum, base + max_pairs, side='right')), start + 1)
+        j = np.arange(start, stop)
+        counts = group_pos[start:stop]
+        total = int(counts.sum())
+        if total:
+            js = np.repeat(j, counts)
+            firsts = np.repeat(np.cumsum(counts) - counts, counts)
+            yield js - np.repeat(counts, counts) + (np.arange(total) - firsts), js
+        start = stop
+
+
+def find_duplicate_bboxes(columns: BboxColumns, iou_threshold: float = 0.9, per_label: bool = True, max_pairs: int = 1 << 22) -> np.ndarray:
+    # greedy suppression, in order of the annotations: an annotation is a duplicate if its iou with an
+    # earlier annotation of the same item that is not a duplicate itself is at least the threshold.
+    # returns a mask over the annotation rows, only annotations with the same labels are compared if `per_label`.
+    if not (0 < iou_threshold <= 1):
+        raise ValueError(f'iou_threshold must be in the range (0, 1], got: {repr(iou_threshold)}')
+    n = columns.num_annotations
+    # annotations are only compared within their group
+    groups = columns.anno_item_idxs.astype(np.int64)
+    if per_label:
+        groups = groups * len(columns.label_sets) + columns.anno_label_codes
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.concatenate([[True], sorted_groups[1:] != sorted_groups[:-1]])) if n else np.zeros(0, dtype=np.int64)
+    group_pos = np.arange(n) - np.repeat(starts, np.diff(np.append(starts, n)))
+    coords = columns.coords[order]
+    suppressed = np.zeros(n, dtype=bool)
+    for i, j in _iter_pair_batches(group_pos, max_pairs=max_pairs):
+        overlap = bbox_iou(coords[i], coords[j]) >= iou_threshold
+        i, j = i[overlap], j[overlap]
+        # each annotation is resolved before it can suppress others, since all the annotations that
+        # could suppress it are earlier in its group. Annotations at the same position are independent.
+        pos = group_pos[i]
+        for p in np.unique(pos).tolist():
+            sel = (pos == p)
+            sel[sel] = ~suppressed[i[sel]]
+            suppressed[j[sel]] = True
+    duplicates = np.zeros(n, dtype=bool)
+    duplicates[order] = suppressed
+    return duplicates
+
+
+def dedupe_bboxes(dataset: Dataset, iou_threshold: float = 0.9, per_label: bool = True) -> Dataset:
+    columns = dataset.to_columns()
+    duplicates = find_duplicate_bboxes(columns, iou_threshold=iou_threshold, per_label=per_label)
+    columns = columns.select_annotations(np.flatnonzero(~duplicates))
+    # columnar datasets stay columnar
+    if dataset.is_columnar:
+        return Dataset.from_columns(columns, labels=dataset.labels, tags=dataset.tags, name=dataset.name)
+    deduped = Dataset(labels=dataset.labels, tags=dataset.tags, name=dataset.name)
+    deduped.extend(columns.to_items(), trusted=True)
+    return deduped
+
+
+# ========================================================================= #
+# Views                                                                     #
+# ========================================================================= #
+
+
+def _coord_property(i: int):
+    def fget(self) -> float:
+        return float(self._coords[self._row, i])
+    def fset(self, value: float):
+        self._coords[self._row, i] = value
+    return property(fget, fset)
+
+
+class _BboxView(Bbox):
+
+    __slots__ = ('_coords', '_row')
+
+    # read & write directly from the underlying columns
+    x0 = _coord_property(0)
+    y0 = _coord_property(1)
+    x1 = _coord_property(2)
+    y1 = _coord_property(3)
+
+    def __init__(self, coords: np.ndarray, row: int):
+        self._coords = coords
+        self._row = row
+
+
+def _notify_columns_modified(columns: BboxColumns):
+    # columns that are not the storage of a dataset can share their arrays with columns that are
+    _notify_modified(_SHARED if (columns._owner is None) else columns._owner)
+
+
+class _AnnotationView(Annotation[Bbox]):
+
+    __slots__ = ('_columns', '_row')
+
+    def __init__(self, columns: BboxColumns, row: int, uid: str):
+        self._columns = columns
+        self._row = row
+        self._uid = uid
+        self._owner = None
+
+    @property
+    def value(self) -> Bbox:
+        return _BboxView(self._columns.coords, self._row)
+
+    @property
+    def labels(self) -> Tuple[str, ...]:
+        return self._columns.label_sets[self._columns.anno_label_codes[self._row]]
+
+    @labels.setter
+    def labels(self, labels: Optional[Iterable[str]]):
+        self._set_strs('labels', _intern_strs(labels, 'labels'))
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        return self._columns.tag_sets[self._columns.anno_tag_codes[self._row]]
+
+    @tags.setter
+    def tags(self, tags: Optional[Iterable[str]]):
+        self._set_strs('tags', _intern_strs(tags, 'tags'))
+
+    def _set_strs(self, kind: str, values: Tuple[str, ...]):
+        # labels & tags are written to the columns, so they are shared by all views of the annotation
+        codes, sets = self._columns.get_codes(kind, 'annotations')
+        codes[self._row] = _get_set_code(sets, values)
+        _notify_columns_modified(self._columns)
+
+
+class _ColumnarAnnotationList(DatasetItem._AnnotationList):
+
+    __slots__ = ()
+
+    def __init__(self, annotations: List[_AnnotationView]):
+        # annotations come from valid columns, so there is no need to re-check them
+        super().__init__(None)
+        self._item_objs.extend(annotations)
+        self._uid_idxs.update((anno.uid, i) for i, anno in enumerate(annotations))
+
+    def _append(self, item: Annotation):
+        raise TypeError(f'annotations of columnar items are read-only, cannot append: {repr(item)}')
+
+    def _add_batch(self, items: List[Annotation], uid_idxs: Dict[str, int]):
+        self._append(items[0])
+
+
+class _ItemView(DatasetItemPath):
+
+    __slots__ = ('_columns', '_idx')
+    _COPY_TYPE = DatasetItemPath
+
+    def __init__(self, columns: BboxColumns, idx: int):
+        self._columns = columns
+        self._idx = idx
+        self._uid = columns.item_uids[idx]
+        self._annotations = None
+        self._stat = None
+        self._owner = None
+
+    def _get_known_image_wh(self) -> Optional[Tuple[int, int]]:
+        return self._columns.get_item_wh(self._idx)
+
+    def _set_image_meta(self, meta: ImageMeta):
+        # probed sizes are stored in the columns, so they are shared by all views of the item
+        self._columns.set_item_wh(self._idx, (meta.width, meta.height))
+        self._stat = (meta.size_bytes, meta.mtime)
+
+    @property
+    def path(self) -> str:
+        return self._columns.item_paths[self._idx]
+
+    @property
+    def labels(self) -> Tuple[str, ...]:
+        return self._columns.label_sets[self._columns.item_label_codes[self._idx]]
+
+    @labels.setter
+    def labels(self, labels: Optional[Iterable[str]]):
+        self._set_strs('labels', _intern_strs(labels, 'labels'))
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        return self._columns.tag_sets[self._columns.item_tag_codes[self._idx]]
+
+    @tags.setter
+    def tags(self, tags: Optional[Iterable[str]]):
+        self._set_strs('tags', _intern_strs(tags, 'tags'))
+
+    def _set_strs(self, kind: str, values: Tuple[str, ...]):
+        # labels & tags are written to the columns, so they are shared by all views of the item
+        codes, sets = self._columns.get_codes(kind, 'items')
+        codes[self._idx] = _get_set_code(sets, values)
+        _notify_columns_modified(self._columns)
+
+    @property
+    def annotations(self) -> DatasetItem._AnnotationList:
+        # only create the annotation views once they are needed
+        if self._annotations is None:
+            c, s = self._columns, self._columns.item_slice(self._idx)
+            if c.anno_uids is None:
+                uids = (f'{self._uid}:{k}' for k in range(s.stop - s.start))
+            else:
+                uids = (c.anno_uids[j] for j in range(s.start, s.stop))
+            self._annotations = _ColumnarAnnotationList([_AnnotationView(c, j, uid) for j, uid in zip(range(s.start, s.stop), uids)])
+        return self._annotations
+
+
+# ========================================================================= #
+# Columnar Dataset Storage                                                  #
+# ========================================================================= #
+
+
+class _ColumnarDatasetList(Dataset._DatasetList):
+
+    ITEM_TYPE = DatasetItemPath
+
+    def __init__(self, columns: BboxColumns, check_uids: bool = True, cache_size: int = 1024):
+        super().__init__(None)
+        self._columns = columns
+        _set_owner([columns], self._generation)
+        # items appended since the columns were last rebuilt
+        self._pending: List[DatasetItemPath] = []
+        # items are only created when accessed, recently accessed items are kept so
+        # that accessing them again returns the same item with its annotations
+        self._cache: 'OrderedDict[int, _ItemView]' = OrderedDict()
+        self._cache_size = cache_size
+        # lookup from uid to item index, columns that are known to be valid
+        # can defer this until the first lookup, eg. when loaded from disk
+        self._invalidate_uid_idxs()
+        if check_uids:
+            self._get_uid_idxs()
+
+    def _invalidate_uid_idxs(self):
+        # the lookup is rebuilt from the columns and pending items when next needed
+        self._uid_idxs = None
+
+    def _get_uid_idxs(self) -> Dict[str, int]:
+        if self._uid_idxs is None:
+            uid_idxs = {}
+            for i, uid in enumerate(itertools.chain(self._columns.item_uids, (item.uid for item in self._pending))):
+                if uid_idxs.setdefault(uid, i) != i:
+                    raise KeyError(f'{self.ITEM_NAME} with id: {uid} already in {self.PARENT_NAME}')
+            self._uid_idxs = uid_idxs
+        return self._uid_idxs
+
+    def __len__(self):
+        return self._columns.num_items + len(self._pending)
+
+    @property
+    def columns(self) -> BboxColumns:
+        # appended items are converted in batches when the columns are next needed
+        if self._pending:
+            self._columns = BboxColumns.concat([self._columns, BboxColumns.from_items(self._pending, anno_uids=self._columns.anno_uids is not None)])
+            _set_owner([self._columns], self._generation)
+            self._pending = []
+            # cached items refer to the old columns
+            self._cache.clear()
+        return self._columns
+
+    def _get_item(self, idx: int) -> '_ItemView':
+        columns = self.columns
+        item = self._cache.get(idx)
+        if item is not None:
+            self._cache.move_to_end(idx)
+            return item
+        item = columns.get_item(idx)
+        if self._cache_size > 0:
+            self._cache[idx] = item
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return item
+
+    # --- iterators --- #
+
+    def __iter__(self) -> Iterator[DatasetItemPath]:
+        yield from self.columns.iter_items()
+
+    # --- parent / children --- #
+
+    def _append(self, item: DatasetItemPath):
+        # validate the item, making sure the type is correct and UID does not already exist
+        if not isinstance_cached(item, self.ITEM_TYPE):
+            raise TypeError(f'{self.ITEM_NAME} must be of type: {self.ITEM_TYPE.__name__}, but got type: {type(item)}, for: {repr(item)}')
+        uid_idxs = self._get_uid_idxs()
+        if item.uid in uid_idxs:
+            raise KeyError(f'{self.ITEM_NAME} with id: {item.uid} already in {self.PARENT_NAME}')
+        # add the item to the pending list
+        self._pending.append(_check_item(item))
+        _set_owner([item], self._generation)
+        uid_idxs[item.uid] = len(uid_idxs)
+
+    def _add_batch(self, items: List[DatasetItemPath], uid_idxs: Dict[str, int]):
+        # the annotations of all the items are checked before adding any of them
+        try:
+            items = [_check_item(item) for item in items]
+        except TypeError:
+            return self._append_each(items)
+        # the columns store the uid of every item, so lazy uids are generated
+        if len(uid_idxs) < len(items):
+            start = len(self)
+            uid_idxs = dict(zip([item.uid for item in items], range(start, start + len(items))))
+        known_idxs = self._get_uid_idxs()
+        self._pending.extend(items)
+        _set_owner(items, self._generation)
+        known_idxs.update(uid_idxs)
+        assert len(known_idxs) == len(self), f'{self.PARENT_NAME} has {len(known_idxs)} uids for {len(self)} {self.ITEM_NAME}s'
+
+    def _get_single_item(self, uid: UidIdx):
+        return self._get_item(self._get_position(uid))
+
+    def __getitem__(self, uid: Union[UidIdx, UidMultiIdx]):
+        if isinstance(uid, slice):
+            columns = self.columns
+            return [columns.get_item(i) for i in range(*uid.indices(len(self)))]
+        return super().__getitem__(uid)
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
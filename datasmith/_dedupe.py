@@ -0,0 +1,154 @@
+import hashlib
+import os
+from collections import defaultdict
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from datasmith._base import Dataset
+from datasmith._base import DatasetItem
+from datasmith._images import _map
+from datasmith._images import _stat
+from datasmith._images import get_image_cache
+from datasmith._items import DatasetItemPath
+from datasmith._util import isinstance_cached
+
+
+# ========================================================================= #
+# File Hashing                                                              #
+# ========================================================================= #
+
+
+# number of bytes read from the start and end of a file for the partial hash,
+# files that are at most twice this size are read completely
+_PARTIAL_HASH_SIZE = 1 << 16
+_FULL_HASH_CHUNK_SIZE = 1 << 20
+
+
+def _hash_partial(path: str, size_bytes: int) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        h.update(fp.read(_PARTIAL_HASH_SIZE))
+        if size_bytes > 2 * _PARTIAL_HASH_SIZE:
+            fp.seek(-_PARTIAL_HASH_SIZE, os.SEEK_END)
+        h.update(fp.read())
+    return h.hexdigest()
+
+
+def _hash_full(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(_FULL_HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _group(keys: Sequence, values: Sequence) -> List[list]:
+    groups = defaultdict(list)
+    for k, v in zip(keys, values):
+        groups[k].append(v)
+    return list(groups.values())
+
+
+def find_duplicate_files(paths: Sequence[str], workers: int = 8) -> List[List[str]]:
+    # groups of files with the same contents, each more expensive step is
+    # only applied to the files that could still be duplicates:
+    # 1. files with a unique size cannot be duplicates
+    # 2. files that share a size are compared by a hash of their start and end
+    # 3. files that share a partial hash are compared by a hash of everything
+    paths = list(dict.fromkeys(os.path.abspath(p) for p in paths))
+    stats = dict(zip(paths, _map(_stat, paths, workers=workers)))
+    candidates = [p for group in _group([stats[p][0] for p in paths], paths) if len(group) > 1 for p in group]
+    if not candidates:
+        return []
+    # hashes of unchanged files are reused from previous runs
+    cache = get_image_cache()
+    keys = [(p, stats[p][1], stats[p][0]) for p in candidates]
+    cached = dict(zip(candidates, cache.get_hashes(keys) if (cache is not None) else [None] * len(keys)))
+    hashes: Dict[str, List[Optional[str]]] = {p: list(cached[p] or (None, None)) for p in candidates}
+    changed = set()
+    # partial hashes
+    missing = [p for p in candidates if hashes[p][0] is None]
+    for p, partial in zip(missing, _map(lambda p: _hash_partial(p, stats[p][0]), missing, workers=workers)):
+        hashes[p][0] = partial
+        changed.add(p)
+    # full hashes, the partial hash of small files is already a hash of everything
+    candidates = [p for group in _group([(stats[p][0], hashes[p][0]) for p in candidates], candidates) if len(group) > 1 for p in group]
+    for p in candidates:
+        if (hashes[p][1] is None) and (stats[p][0] <= 2 * _PARTIAL_HASH_SIZE):
+            hashes[p][1] = hashes[p][0]
+            changed.add(p)
+    missing = [p for p in candidates if hashes[p][1] is None]
+    for p, full in zip(missing, _map(_hash_full, missing, workers=workers)):
+        hashes[p][1] = full
+        changed.add(p)
+    if (cache is not None) and changed:
+        cache.put_hashes((p, stats[p][1], stats[p][0], *hashes[p]) for p in changed)
+    return [group for group in _group([(stats[p][0], hashes[p][1]) for p in candidates], candidates) if len(group) > 1]
+
+
+# ========================================================================= #
+# Dataset Deduplication                                                     #
+# ========================================================================= #
+
+
+def find_duplicate_items(dataset: Dataset, workers: int = 8) -> List[List[int]]:
+    # groups of positions of items whose files have the same contents,
+    # including items that refer to the same file more than once
+    positions: Dict[str, List[int]] = defaultdict(list)
+    for i, item in enumerate(dataset):
+        if not isinstance_cached(item, DatasetItemPath):
+            raise TypeError(f'only items of type: {DatasetItemPath.__name__} can be deduplicated, got type: {type(item)}, for: {repr(item)}')
+        positions[os.path.abspath(item.path)].append(i)
+    # files with the same contents share the key of the first file in their group
+    keys = {p: p for p in positions}
+    for group in find_duplicate_files(list(positions), workers=workers):
+        keys.update((p, group[0]) for p in group)
+    groups = _group([keys[p] for p in positions], list(positions.values()))
+    return sorted(sorted(i for idxs in group for i in idxs) for group in groups if sum(map(len, group)) > 1)
+
+
+def _merge_items(items: Sequence[DatasetItemPath]) -> DatasetItemPath:
+    # keep the first item, with the union of all the annotations, labels and tags
+    keep = items[0]
+    annotations, uids = [], set()
+    for item in items:
+        for anno in item.annotations:
+            if anno.uid not in uids:
+                uids.add(anno.uid)
+                annotations.append(anno._copy())
+    return DatasetItemPath(
+        path=keep.path,
+        annotations=annotations,
+        labels=dict.fromkeys(label for item in items for label in item.labels),
+        tags=dict.fromkeys(tag for item in items for tag in item.tags),
+        uid=keep.uid,
+        image_wh=keep._get_known_image_wh(),
+    )
+
+
+def dedupe_dataset(dataset: Dataset, workers: int = 8) -> Tuple[Dataset, List[List[int]]]:
+    groups = find_duplicate_items(dataset, workers=workers)
+    items: List[DatasetItem] = list(dataset)
+    merged, dropped = {}, set()
+    for group in groups:
+        merged[group[0]] = _merge_items([items[i] for i in group])
+        dropped.update(group[1:])
+    kept = [i for i in range(len(items)) if i not in dropped]
+    items = [merged.get(i, items[i]) for i in kept]
+    # columnar datasets stay columnar
+    if dataset.is_columnar:
+        from datasmith._columnar import BboxColumns
+        deduped = Dataset.from_columns(BboxColumns.from_items(items, anno_uids=dataset.to_columns().anno_uids is not None), labels=dataset.labels, tags=dataset.tags, name=dataset.name)
+    else:
+        # the items that were not merged are copied, so that the datasets do not share any objects
+        deduped = Dataset(labels=dataset.labels, tags=dataset.tags, name=dataset.name)
+        deduped.extend([item if (i in merged) else item._copy() for i, item in zip(kept, items)], trusted=True)
+    return deduped, groups
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
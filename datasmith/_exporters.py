@@ -0,0 +1,296 @@
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from xml.sax.saxutils import escape as xml_escape
+
+import numpy as np
+
+from datasmith._annotations import Bbox
+from datasmith._annotations import ImageWH
+from datasmith._base import Dataset
+from datasmith._columnar import BboxColumns
+
+
+# ========================================================================= #
+# Helper                                                                    #
+# ========================================================================= #
+
+
+def _get_items_wh(dataset: Dataset, image_wh: Optional[ImageWH] = None) -> np.ndarray:
+    # the pixel size of every item, either shared by all items, given per item, or read from the items
+    if image_wh is None:
+        return dataset.probe_images().astype(np.float64)
+    wh = np.asarray(image_wh, dtype=np.float64)
+    if wh.shape == (2,):
+        return np.broadcast_to(wh, (len(dataset), 2))
+    if wh.shape != (len(dataset), 2):
+        raise ValueError(f'image_wh must have shape (2,) or {(len(dataset), 2)}, got: {wh.shape}')
+    return wh
+
+
+def _iter_column_chunks(dataset: Dataset, chunk_size: int) -> Iterator[Tuple[int, BboxColumns]]:
+    # only a chunk of the dataset is ever converted to columns at once, so memory stays bounded
+    for start in range(0, len(dataset), chunk_size):
+        yield start, dataset[start:start + chunk_size].to_columns(anno_uids=False)
+
+
+def _make_get_rel_path(base_dir: str):
+    # paths inside the base directory only need their prefix removed, which is much faster than `os.path.relpath`
+    prefix = os.path.join(base_dir, '')
+    return lambda p: p[len(prefix):] if p.startswith(prefix) else os.path.relpath(p, base_dir)
+
+
+def _num(value: float) -> str:
+    # whole numbers are written as integers, nan and inf are not valid numbers in json or xml
+    if value.is_integer():
+        return str(int(value))
+    if not math.isfinite(value):
+        raise ValueError(f'cannot export a number that is not finite, got: {repr(value)}')
+    return repr(value)
+
+
+def _check_finite(values: np.ndarray, item_uids: Sequence[str], kind: str):
+    # the same check as `_num`, but for a whole chunk at once so that the item can be named
+    invalid = np.flatnonzero(~np.isfinite(values).all(axis=1))
+    if len(invalid):
+        raise ValueError(f'cannot export {kind} that are not finite, got: {values[invalid[0]].tolist()} for item: {repr(item_uids[invalid[0]])}')
+
+
+# ========================================================================= #
+# COCO                                                                      #
+# ========================================================================= #
+
+
+def export_coco(
+    dataset: Dataset,
+    path: str,
+    image_wh: Optional[ImageWH] = None,
+    images_dir: Optional[str] = None,
+    precision: Optional[int] = 3,
+    chunk_size: int = 2048,
+    info: Optional[Dict[str, Any]] = None,
+) -> str:
+    if chunk_size <= 0:
+        raise ValueError(f'chunk_size must be > 0, got: {repr(chunk_size)}')
+    # file names are relative to the images directory, otherwise the item paths are used as is
+    items_wh = _get_items_wh(dataset, image_wh)
+    if not np.isfinite(items_wh).all():
+        _check_finite(items_wh, [item.uid for item in dataset], 'image sizes')
+    get_file_name = (lambda p: p) if (images_dir is None) else _make_get_rel_path(images_dir)
+    # category ids start from 1, labels that are not on the dataset are added as they are found
+    categories: Dict[str, int] = {label: i for i, label in enumerate(dataset.labels, start=1)}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fp:
+        fp.write(f'{{"info": {json.dumps(info or {}, ensure_ascii=False)}, "licenses": [], "images": [')
+        # images, one chunk at a time
+        items, sep = iter(dataset), '\n'
+        for start in range(0, len(dataset), chunk_size):
+            lines = [
+                f'{{"id": {i}, "width": {_num(w)}, "height": {_num(h)}, "file_name": {json.dumps(get_file_name(item.path), ensure_ascii=False)}}}'
+                for i, item, (w, h) in zip(range(start + 1, len(dataset) + 1), itertools.islice(items, chunk_size), items_wh[start:start + chunk_size].tolist())
+            ]
+            fp.write(sep + ',\n'.join(lines))
+            sep = ',\n'
+        fp.write('\n], "annotations": [')
+        # annotations, with all the boxes in a chunk converted at once
+        sep, anno_id = '\n', 1
+        for start, columns in _iter_column_chunks(dataset, chunk_size):
+            if not columns.num_annotations:
+                continue
+            item_idxs = columns.anno_item_idxs
+            xywh = Bbox.batch_get('xywh', columns.coords, image_wh=items_wh[start:start + columns.num_items][item_idxs])
+            _check_finite(xywh, [columns.item_uids[i] for i in item_idxs.tolist()], 'boxes')
+            area = xywh[:, 2] * xywh[:, 3]
+            if precision is not None:
+                xywh, area = np.round(xywh, precision), np.round(area, precision)
+            # each annotation needs exactly one label, label sets are mapped to categories once per chunk
+            set_cats = np.asarray([categories.setdefault(s[0], len(categories) + 1) if (len(s) == 1) else 0 for s in columns.label_sets], dtype=np.int64)
+            anno_cats = set_cats[columns.anno_label_codes]
+            invalid = np.flatnonzero(anno_cats == 0)
+            if len(invalid):
+                labels = columns.label_sets[columns.anno_label_codes[invalid[0]]]
+                raise ValueError(f'coco annotations must have exactly one label, got: {repr(labels)} for an annotation of item: {repr(columns.item_uids[item_idxs[invalid[0]]])}')
+            lines = [
+                f'{{"id": {i}, "image_id": {image_id}, "category_id": {cat}, "bbox": [{_num(x)}, {_num(y)}, {_num(w)}, {_num(h)}], "area": {_num(a)}, "iscrowd": 0}}'
+                for i, image_id, cat, (x, y, w, h), a in zip(range(anno_id, anno_id + len(xywh)), (item_idxs + start + 1).tolist(), anno_cats.tolist(), xywh.tolist(), area.tolist())
+            ]
+            fp.write(sep + ',\n'.join(lines))
+            sep, anno_id = ',\n', anno_id + len(lines)
+        # categories are written last, once all the labels are known
+        cats = ',\n'.join(f'{{"id": {i}, "name": {json.dumps(label, ensure_ascii=False)}, "supercategory": ""}}' for label, i in categories.items())
+        fp.write(f'\n], "categories": [\n{cats}\n]}}\n')
+    return path
+
+
+# ========================================================================= #
+# YOLO                                                                      #
+# ========================================================================= #
+
+
+def _write_text(path: str, text: str):
+    with open(path, 'w', encoding='utf-8') as fp:
+        fp.write(text)
+
+
+def _write_texts(paths_texts: Sequence[Tuple[str, str]]):
+    for path, text in paths_texts:
+        _write_text(path, text)
+
+
+def export_yolo(
+    dataset: Dataset,
+    root: str,
+    rel_labels_dir: str = 'labels',
+    images_dir: Optional[str] = None,
+    labels: Optional[Sequence[str]] = None,
+    precision: int = 6,
+    workers: int = 8,
+    chunk_size: int = 2048,
+) -> str:
+    if chunk_size <= 0:
+        raise ValueError(f'chunk_size must be > 0, got: {repr(chunk_size)}')
+    # the label file of `<images_dir>/a/b.jpg` is `labels/a/b.txt`, otherwise only the file name of the item is used
+    get_rel_path = os.path.basename if (images_dir is None) else _make_get_rel_path(images_dir)
+    labels_dir = os.path.join(root, rel_labels_dir)
+    # class ids are the positions of the labels, labels that are not on the dataset are added as they are found
+    classes: Dict[str, int] = {label: i for i, label in enumerate(dataset.labels if (labels is None) else labels)}
+    line_fmt = f'{{}} {{:.{precision}f}} {{:.{precision}f}} {{:.{precision}f}} {{:.{precision}f}}'
+    made_dirs = set()
+    # the uid of the item written to each label file, items with the same file name would overwrite each other
+    path_uids: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start, columns in _iter_column_chunks(dataset, chunk_size):
+            # convert all the boxes in the chunk at once
+            cxywh = Bbox.batch_get('cxywh', columns.coords).tolist()
+            set_ids = [(classes.setdefault(s[0], len(classes)) if (labels is None) else classes.get(s[0], -1)) if (len(s) == 1) else -1 for s in columns.label_sets]
+            anno_ids = np.asarray(set_ids, dtype=np.int64)[columns.anno_label_codes]
+            invalid = np.flatnonzero(anno_ids < 0)
+            if len(invalid):
+                anno_labels = columns.label_sets[columns.anno_label_codes[invalid[0]]]
+                raise ValueError(f'yolo annotations must have exactly one known label, got: {repr(anno_labels)} for an annotation of item: {repr(columns.item_uids[columns.anno_item_idxs[invalid[0]]])}')
+            lines = [line_fmt.format(i, *box) for i, box in zip(anno_ids.tolist(), cxywh)]
+            offsets = columns.item_offsets.tolist()
+            texts = ['\n'.join(lines[offsets[i]:offsets[i + 1]]) + ('\n' if offsets[i] < offsets[i + 1] else '') for i in range(columns.num_items)]
+            paths = [os.path.join(labels_dir, os.path.splitext(get_rel_path(p))[0] + '.txt') for p in columns.item_paths]
+            for path, uid in zip(paths, columns.item_uids):
+                if path_uids.setdefault(path, uid) != uid:
+                    raise ValueError(f'yolo label file: {repr(path)} would be written for both item: {repr(path_uids[path])} and item: {repr(uid)}, pass `images_dir` to keep the directory structure of the images')
+            # create the directories once, then write the files concurrently
+            for d in set(map(os.path.dirname, paths)) - made_dirs:
+                os.makedirs(d, exist_ok=True)
+                made_dirs.add(d)
+            # thread pool tasks handle many small files each, so that the overhead per task is amortised
+            paths_texts = list(zip(paths, texts))
+            list(pool.map(_write_texts, [paths_texts[i:i + 64] for i in range(0, len(paths_texts), 64)]))
+    # class names, one per line
+    os.makedirs(root, exist_ok=True)
+    _write_text(os.path.join(root, 'classes.txt'), ''.join(f'{label}\n' for label in classes))
+    return root
+
+
+# ========================================================================= #
+# VOC                                                                       #
+# ========================================================================= #
+
+
+_VOC_OBJECT_FMT = (
+    '\t<object>\n'
+    '\t\t<name>{}</name>\n'
+    '\t\t<pose>Unspecified</pose>\n'
+    '\t\t<truncated>{}</truncated>\n'
+    '\t\t<difficult>{}</difficult>\n'
+    '\t\t<occluded>{}</occluded>\n'
+    '\t\t<bndbox>\n'
+    '\t\t\t<xmin>{}</xmin>\n'
+    '\t\t\t<ymin>{}</ymin>\n'
+    '\t\t\t<xmax>{}</xmax>\n'
+    '\t\t\t<ymax>{}</ymax>\n'
+    '\t\t</bndbox>\n'
+    '\t</object>\n'
+)
+
+
+def _voc_header(folder: str, file_name: str, width: float, height: float) -> str:
+    return (
+        f'<annotation>\n'
+        f'\t<folder>{xml_escape(folder)}</folder>\n'
+        f'\t<filename>{xml_escape(file_name)}</filename>\n'
+        f'\t<size>\n'
+        f'\t\t<width>{_num(width)}</width>\n'
+        f'\t\t<height>{_num(height)}</height>\n'
+        f'\t\t<depth>3</depth>\n'
+        f'\t</size>\n'
+        f'\t<segmented>0</segmented>\n'
+    )
+
+
+def export_voc(
+    dataset: Dataset,
+    root: str,
+    rel_annotations_dir: str = 'Annotations',
+    images_dir: Optional[str] = None,
+    image_wh: Optional[ImageWH] = None,
+    precision: Optional[int] = 0,
+    workers: int = 8,
+    chunk_size: int = 2048,
+) -> str:
+    if chunk_size <= 0:
+        raise ValueError(f'chunk_size must be > 0, got: {repr(chunk_size)}')
+    # the annotation file of `<images_dir>/a/b.jpg` is `Annotations/a/b.xml`, otherwise only the file name of the item is used
+    get_rel_path = os.path.basename if (images_dir is None) else _make_get_rel_path(images_dir)
+    annotations_dir = os.path.join(root, rel_annotations_dir)
+    items_wh = _get_items_wh(dataset, image_wh)
+    made_dirs = set()
+    # the uid of the item written to each annotation file, items with the same file name would overwrite each other
+    path_uids: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start, columns in _iter_column_chunks(dataset, chunk_size):
+            chunk_wh = items_wh[start:start + columns.num_items]
+            # convert all the boxes in the chunk at once, boxes are in pixels
+            xyxy = Bbox.batch_get('xyxy', columns.coords, image_wh=chunk_wh[columns.anno_item_idxs])
+            if precision is not None:
+                xyxy = np.round(xyxy, precision)
+            # each annotation needs exactly one label, the label & tag sets are converted once per chunk
+            set_names = [xml_escape(s[0]) if (len(s) == 1) else None for s in columns.label_sets]
+            set_flags = [tuple(int(t in s) for t in ('truncated', 'difficult', 'occluded')) for s in columns.tag_sets]
+            anno_codes = columns.anno_label_codes.tolist()
+            invalid = [j for j, code in enumerate(anno_codes) if set_names[code] is None]
+            if invalid:
+                anno_labels = columns.label_sets[anno_codes[invalid[0]]]
+                raise ValueError(f'voc annotations must have exactly one label, got: {repr(anno_labels)} for an annotation of item: {repr(columns.item_uids[columns.anno_item_idxs[invalid[0]]])}')
+            objects = [
+                _VOC_OBJECT_FMT.format(set_names[code], *set_flags[tag_code], *map(_num, box))
+                for code, tag_code, box in zip(anno_codes, columns.anno_tag_codes.tolist(), xyxy.tolist())
+            ]
+            # one file per item, each written with a single call
+            rel_paths = [get_rel_path(p) for p in columns.item_paths]
+            offsets = columns.item_offsets.tolist()
+            texts = [
+                _voc_header(os.path.dirname(rel_path), os.path.basename(rel_path), w, h) + ''.join(objects[offsets[i]:offsets[i + 1]]) + '</annotation>\n'
+                for i, (rel_path, (w, h)) in enumerate(zip(rel_paths, chunk_wh.tolist()))
+            ]
+            paths = [os.path.join(annotations_dir, os.path.splitext(rel_path)[0] + '.xml') for rel_path in rel_paths]
+            for path, uid in zip(paths, columns.item_uids):
+                if path_uids.setdefault(path, uid) != uid:
+                    raise ValueError(f'voc annotation file: {repr(path)} would be written for both item: {repr(path_uids[path])} and item: {repr(uid)}, pass `images_dir` to keep the directory structure of the images')
+            # create the directories once, then write the files concurrently
+            for d in set(map(os.path.dirname, paths)) - made_dirs:
+                os.makedirs(d, exist_ok=True)
+                made_dirs.add(d)
+            # thread pool tasks handle many small files each, so that the overhead per task is amortised
+            paths_texts = list(zip(paths, texts))
+            list(pool.map(_write_texts, [paths_texts[i:i + 64] for i in range(0, len(paths_texts), 64)]))
+    return root
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,245 @@
+import os
+import sqlite3
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import BinaryIO
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+
+# ========================================================================= #
+# Image Headers                                                             #
+# ========================================================================= #
+
+
+class ImageFormatError(ValueError):
+    pass
+
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# start of frame markers contain the image size, excluding DHT (0xC4), JPG (0xC8) and DAC (0xCC)
+_JPEG_SOF_MARKERS = frozenset({0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF})
+# markers without a length or payload
+_JPEG_STANDALONE_MARKERS = frozenset({0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8})
+
+
+def _read_exact(fp: BinaryIO, n: int) -> bytes:
+    data = fp.read(n)
+    if len(data) != n:
+        raise ImageFormatError('unexpected end of file while reading the image header')
+    return data
+
+
+def _read_jpeg_wh(fp: BinaryIO) -> Tuple[int, int]:
+    # walk the segments until the frame header is found, skipping everything else
+    fp.seek(2)
+    while True:
+        if _read_exact(fp, 1) != b'\xff':
+            raise ImageFormatError('invalid jpeg, expected a segment marker')
+        # markers can be padded with any number of fill bytes
+        marker = 0xFF
+        while marker == 0xFF:
+            marker = _read_exact(fp, 1)[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            raise ImageFormatError('invalid jpeg, reached the image data before the frame header')
+        (length,) = struct.unpack('>H', _read_exact(fp, 2))
+        if marker in _JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack('>BHH', _read_exact(fp, 5))
+            return width, height
+        fp.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_wh(path: str) -> Tuple[int, int]:
+    # get the (width, height) of an image by only parsing its header, without decoding it
+    with open(path, 'rb') as fp:
+        head = fp.read(26)
+        if head.startswith(_PNG_SIGNATURE):
+            if head[12:16] != b'IHDR':
+                raise ImageFormatError(f'invalid png, the first chunk must be IHDR: {repr(path)}')
+            return struct.unpack('>II', head[16:24])
+        if head.startswith(b'BM') and len(head) >= 26:
+            # the older core header stores the size as 16 bit values, negative heights are top-down images
+            (dib_size,) = struct.unpack('<I', head[14:18])
+            if dib_size == 12:
+                return struct.unpack('<HH', head[18:22])
+            width, height = struct.unpack('<ii', head[18:26])
+            return width, abs(height)
+        if head.startswith(b'\xff\xd8'):
+            try:
+                return _read_jpeg_wh(fp)
+            except ImageFormatError as e:
+                raise ImageFormatError(f'{e}: {repr(path)}') from e
+    raise ImageFormatError(f'unsupported image format, only png, jpeg & bmp headers can be read: {repr(path)}')
+
+
+# ========================================================================= #
+# Image Metadata Cache                                                      #
+# ========================================================================= #
+
+
+class ImageMeta(NamedTuple):
+    width: int
+    height: int
+    size_bytes: int
+    mtime: float
+
+
+class ImageMetaCache(object):
+
+    # sqlite database of image sizes and content hashes, entries are only
+    # valid while the modification time and size of the file are the same as when cached
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS image_meta (path TEXT PRIMARY KEY, mtime_ns INTEGER, size_bytes INTEGER, width INTEGER, height INTEGER)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS file_hash (path TEXT PRIMARY KEY, mtime_ns INTEGER, size_bytes INTEGER, partial_hash TEXT, full_hash TEXT)')
+        return self._conn
+
+    def _get_rows(self, table: str, columns: str, keys: Sequence[Tuple[str, int, int]]) -> List[Optional[tuple]]:
+        rows = {}
+        with self._lock:
+            conn = self._connect()
+            # query in batches, sqlite limits the number of parameters per statement
+            for i in range(0, len(keys), 500):
+                paths = [k[0] for k in keys[i:i + 500]]
+                query = f'SELECT path, mtime_ns, size_bytes, {columns} FROM {table} WHERE path IN ({",".join("?" * len(paths))})'
+                rows.update((row[0], row[1:]) for row in conn.execute(query, paths))
+        results = []
+        for path, mtime_ns, size_bytes in keys:
+            row = rows.get(path)
+            results.append(row[2:] if (row is not None) and (row[0] == mtime_ns) and (row[1] == size_bytes) else None)
+        return results
+
+    def _put_rows(self, table: str, rows: Iterable[tuple]):
+        # store rows in a single transaction
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(f'INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?, ?)', rows)
+
+    def get_many(self, keys: Sequence[Tuple[str, int, int]]) -> List[Optional[Tuple[int, int]]]:
+        # look up the (width, height) of each (path, mtime_ns, size_bytes), or `None` if not cached
+        return self._get_rows('image_meta', 'width, height', keys)
+
+    def put_many(self, rows: Iterable[Tuple[str, int, int, int, int]]):
+        # store (path, mtime_ns, size_bytes, width, height) rows
+        self._put_rows('image_meta', rows)
+
+    def get_hashes(self, keys: Sequence[Tuple[str, int, int]]) -> List[Optional[Tuple[str, Optional[str]]]]:
+        # look up the (partial_hash, full_hash) of each (path, mtime_ns, size_bytes), or `None` if not cached
+        return self._get_rows('file_hash', 'partial_hash, full_hash', keys)
+
+    def put_hashes(self, rows: Iterable[Tuple[str, int, int, str, Optional[str]]]):
+        # store (path, mtime_ns, size_bytes, partial_hash, full_hash) rows
+        self._put_rows('file_hash', rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(path={repr(self._path)})'
+
+
+def _get_default_cache() -> Optional[ImageMetaCache]:
+    # the cache is opt-in, nothing is written to disk unless a cache directory is set
+    cache_dir = os.environ.get('DATASMITH_CACHE_DIR')
+    return ImageMetaCache(os.path.join(cache_dir, 'image_meta.sqlite')) if cache_dir else None
+
+
+# where probed image sizes and file hashes are persisted, or `None` if the cache is disabled,
+# enabled with `set_image_cache(path)`, `image_cache(path)` or the `DATASMITH_CACHE_DIR` env var
+_IMAGE_CACHE: Optional[ImageMetaCache] = _get_default_cache()
+
+
+def get_image_cache() -> Optional[ImageMetaCache]:
+    return _IMAGE_CACHE
+
+
+def set_image_cache(path: Optional[str]) -> Optional[str]:
+    global _IMAGE_CACHE
+    if (path is not None) and not isinstance(path, str):
+        raise TypeError(f'image cache path must be a str or None, got type: {type(path)}, for: {repr(path)}')
+    # returns the previous path
+    prev = None if (_IMAGE_CACHE is None) else _IMAGE_CACHE.path
+    if _IMAGE_CACHE is not None:
+        _IMAGE_CACHE.close()
+    _IMAGE_CACHE = None if (path is None) else ImageMetaCache(path)
+    return prev
+
+
+@contextmanager
+def image_cache(path: Optional[str]) -> Iterator[Optional[str]]:
+    prev = set_image_cache(path)
+    try:
+        yield path
+    finally:
+        set_image_cache(prev)
+
+
+# ========================================================================= #
+# Probing                                                                   #
+# ========================================================================= #
+
+
+def _stat(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _map(fn, values: Sequence, workers: int, batch_size: int = 64) -> List:
+    # thread pool tasks handle a batch of files each, so that the overhead per task is amortised
+    if (workers <= 1) or (len(values) <= 1):
+        return [fn(v) for v in values]
+    batches = [values[i:i + batch_size] for i in range(0, len(values), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [r for batch in pool.map(lambda vs: [fn(v) for v in vs], batches) for r in batch]
+
+
+def probe_images(paths: Sequence[str], workers: int = 8) -> List[ImageMeta]:
+    # stat every file, then only read the headers of images that are not in the cache
+    paths = [os.path.abspath(p) for p in paths]
+    stats = _map(_stat, paths, workers=workers)
+    cache = _IMAGE_CACHE
+    if cache is None:
+        cached = [None] * len(paths)
+    else:
+        cached = cache.get_many([(p, mtime_ns, size) for p, (size, mtime_ns) in zip(paths, stats)])
+    misses = [i for i, wh in enumerate(cached) if wh is None]
+    for i, wh in zip(misses, _map(read_image_wh, [paths[i] for i in misses], workers=workers)):
+        cached[i] = wh
+    if (cache is not None) and misses:
+        cache.put_many((paths[i], stats[i][1], stats[i][0], *cached[i]) for i in misses)
+    return [ImageMeta(w, h, size, mtime_ns / 1e9) for (w, h), (size, mtime_ns) in zip(cached, stats)]
+
+
+def probe_image(path: str) -> ImageMeta:
+    return probe_images([path], workers=0)[0]
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -1,20 +1,186 @@
 import json
 import os
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+from xml.etree import ElementTree
+
+import numpy as np
 
 from datasmith._base import Annotation
 from datasmith._annotations import Bbox
+from datasmith._annotations import get_bbox_validation
+from datasmith._columnar import BboxColumns
+from datasmith._columnar import _make_table
+from datasmith._columnar import _validate_dataset_bounds
 from datasmith._base import Dataset
+from datasmith._base import _generate_uid
+from datasmith._base import make_source_uid
 from datasmith._items import DatasetItemPath
+from datasmith._merge import UID_CONFLICT_MODES
+from datasmith._merge import _replace_columns
+from datasmith._merge import _resolve_uid_conflicts
+from datasmith._profiling import profile_stage
+from datasmith._streaming import JsonStreamReader
+
+
+# ========================================================================= #
+# Profiling                                                                 #
+# ========================================================================= #
+
+
+def _count_dataset(stage, dataset: Dataset):
+    # only counted when profiling, since counting the annotations of objects needs a pass over the items
+    if stage.enabled:
+        stage.count('items', len(dataset))
+        stage.count('annotations', dataset.to_columns(anno_uids=False).num_annotations if dataset.is_columnar else sum(len(item.annotations) for item in dataset))
+
+
+def _generate_uids(n: int) -> List[str]:
+    with profile_stage('generate_uids') as stage:
+        stage.count('uids', n)
+        return [_generate_uid() for _ in range(n)]
+
+
+# ========================================================================= #
+# COCO                                                                      #
+# ========================================================================= #
+
+
+class _CocoBoxes(object):
+
+    # the boxes of the items in the order that they are built, so that their bounds
+    # can be checked all at once without converting the dataset back into columns
+
+    def __init__(self):
+        self.xywh = array('d')
+        self.image_wh = array('d')
+        self.counts = array('q')
+
+    def add_item(self, image_wh: Tuple[float, float], xywhs: Iterable[Sequence[float]]):
+        n = len(self.xywh)
+        for xywh in xywhs:
+            self.xywh.extend(xywh)
+        self.image_wh.extend(image_wh)
+        self.counts.append((len(self.xywh) - n) // 4)
+
+    def get_coords(self) -> Tuple[np.ndarray, np.ndarray]:
+        # the normalised coords and item offsets, the same as `BboxColumns` would store them
+        counts = np.frombuffer(self.counts, dtype=np.int64)
+        image_wh = np.repeat(np.frombuffer(self.image_wh, dtype=np.float64).reshape(-1, 2), counts, axis=0)
+        coords = Bbox.batch_from_xywh(np.frombuffer(self.xywh, dtype=np.float64).reshape(-1, 4), image_wh=image_wh).astype(np.float32)
+        return coords, np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(counts)])
+
+
+def _make_coco_item(
+    root: str,
+    rel_images_dir: str,
+    image_id: int,
+    file_name: str,
+    image_wh: Tuple[float, float],
+    annotations: Sequence[Tuple[int, str, Tuple[float, float, float, float]]],
+    uid_namespace: Optional[str] = None,
+    boxes: Optional[_CocoBoxes] = None,
+    check_boxes: bool = True,
+) -> DatasetItemPath:
+    if boxes is not None:
+        boxes.add_item(image_wh, (xywh for _, _, xywh in annotations))
+    # uids are either derived from the source ids, or generated using the current uid strategy
+    if uid_namespace is None:
+        make_uid = lambda kind, id: None
+    else:
+        make_uid = lambda kind, id: make_source_uid(uid_namespace, kind, id)
+    # boxes that are checked all at once by the caller are not checked one by one
+    from_xywh = Bbox.from_xywh if check_boxes else Bbox._from_xywh_unchecked
+    return DatasetItemPath(
+        path=os.path.join(root, rel_images_dir, file_name),
+        annotations=[
+            Annotation(value=from_xywh(*xywh, image_wh=image_wh), labels=[label], uid=make_uid('annotation', anno_id))
+            for anno_id, label, xywh in annotations
+        ],
+        uid=make_uid('image', image_id),
+        image_wh=image_wh,
+    )
 
 
 def import_coco(
     root: str,
     rel_instance_file: str ='annotations/instances_default.json',
     rel_images_dir: str = 'images',
+    streaming: bool = False,
+    validation: Optional[str] = None,
+    uid_namespace: Optional[str] = None,
+    lazy: bool = False,
+):
+    # boxes are checked all at once after importing, their coords are gathered while the items
+    # are built. Lazy datasets already store their coords as columns.
+    validation = get_bbox_validation() if (validation is None) else validation
+    boxes = None if (lazy or validation == 'off') else _CocoBoxes()
+    with profile_stage('import_coco') as stage:
+        dataset = _import_coco(root=root, rel_instance_file=rel_instance_file, rel_images_dir=rel_images_dir, streaming=streaming, uid_namespace=uid_namespace, lazy=lazy, boxes=boxes, check_boxes=False)
+        dataset = _validate_dataset_bounds(dataset, mode=validation, coords=None if (boxes is None) else boxes.get_coords())
+        _count_dataset(stage, dataset)
+    return dataset
+
+
+def _import_coco(
+    root: str,
+    rel_instance_file: str,
+    rel_images_dir: str,
+    streaming: bool,
+    uid_namespace: Optional[str],
+    lazy: bool = False,
+    boxes: Optional[_CocoBoxes] = None,
+    check_boxes: bool = True,
 ):
-    with open(os.path.join(root, rel_instance_file), 'r') as fp:
-        dat = json.load(fp)
+    path = os.path.join(root, rel_instance_file)
+    # lazy datasets keep the records as columns, items are only created when accessed
+    # and uids are only checked when first looked up, see `_ColumnarDatasetList`
+    if lazy:
+        with profile_stage('import_coco.read') as stage:
+            stage.count('bytes_read', os.path.getsize(path))
+            if streaming:
+                index = _CocoStreamIndex(path)
+            else:
+                with open(path, 'r') as fp:
+                    index = _CocoStreamIndex.from_data(json.load(fp))
+        with profile_stage('import_coco.build'):
+            return Dataset.from_columns(
+                index.to_columns(root=root, rel_images_dir=rel_images_dir, uid_namespace=uid_namespace),
+                labels=list(index.categories.values()),
+                name=path,
+                check_uids=False,
+            )
+    # stream the file instead of loading it all into memory
+    if streaming:
+        with profile_stage('import_coco.read') as stage:
+            stage.count('bytes_read', os.path.getsize(path))
+            # annotations are read again by a second pass, as their items are built
+            index = _CocoStreamIndex(path, load_annotations=False)
+        with profile_stage('import_coco.build'):
+            dataset = Dataset(labels=list(index.categories.values()), name=path)
+            # the items are new objects built from the file, so only their uids need to be checked
+            dataset.extend(index.iter_items(root=root, rel_images_dir=rel_images_dir, uid_namespace=uid_namespace, boxes=boxes, check_boxes=check_boxes), trusted=True)
+            return dataset
+    # load everything
+    with profile_stage('import_coco.read') as stage:
+        stage.count('bytes_read', os.path.getsize(path))
+        with open(path, 'r') as fp:
+            dat = json.load(fp)
+    with profile_stage('import_coco.build'):
+        return _make_coco_dataset(dat, root=root, rel_images_dir=rel_images_dir, uid_namespace=uid_namespace, name=path, boxes=boxes, check_boxes=check_boxes)
+
+
+def _make_coco_dataset(dat: dict, root: str, rel_images_dir: str, uid_namespace: Optional[str], name: str, boxes: Optional[_CocoBoxes] = None, check_boxes: bool = True) -> Dataset:
     # checks
     dat_images      = {item['id']: item for item in dat['images']}
     dat_categories  = {item['id']: item for item in dat['categories']}
@@ -30,24 +196,511 @@ def import_coco(
         annotations = []
         for anno_id in image_anno_ids[dat_image['id']]:
             dat_anno = dat_annotations[anno_id]
-            anno_cat_name = dat_categories[dat_anno['category_id']]['name']
-            # append annotation
-            annotations.append(Annotation(
-                value=Bbox.from_xywh(*dat_anno['bbox'], image_wh=(dat_image['width'], dat_image['height'])),
-                labels=[anno_cat_name],
-            ))
+            annotations.append((anno_id, dat_categories[dat_anno['category_id']]['name'], dat_anno['bbox']))
         # append item
-        items.append(DatasetItemPath(
-            path=os.path.join(root, rel_images_dir, dat_image['file_name']),
+        items.append(_make_coco_item(
+            root=root,
+            rel_images_dir=rel_images_dir,
+            image_id=dat_image['id'],
+            file_name=dat_image['file_name'],
+            image_wh=(dat_image['width'], dat_image['height']),
             annotations=annotations,
+            uid_namespace=uid_namespace,
+            boxes=boxes,
+            check_boxes=check_boxes,
         ))
-    # done
-    return Dataset(
-        items,
-        labels=[item['name'] for item in dat_categories.values()],
-        name=os.path.join(root, rel_instance_file)
+    # done, the items were just built, so only their uids need to be checked
+    dataset = Dataset(labels=[item['name'] for item in dat_categories.values()], name=name)
+    dataset.extend(items, trusted=True)
+    return dataset
+
+
+def iter_coco_items(
+    root: str,
+    rel_instance_file: str ='annotations/instances_default.json',
+    rel_images_dir: str = 'images',
+    uid_namespace: Optional[str] = None,
+) -> Iterator[DatasetItemPath]:
+    # items are yielded as soon as all their annotations are read, see `_CocoStreamIndex._iter_image_records`
+    index = _CocoStreamIndex(os.path.join(root, rel_instance_file), load_annotations=False)
+    yield from index.iter_items(root=root, rel_images_dir=rel_images_dir, uid_namespace=uid_namespace)
+
+
+# ========================================================================= #
+# COCO - Parallel                                                           #
+# ========================================================================= #
+
+
+CocoSource = Union[str, Tuple[str, str]]
+
+COCO_CONFLICT_MODES = UID_CONFLICT_MODES
+
+
+def _import_coco_columns(args) -> Tuple[BboxColumns, List[str]]:
+    # runs in a worker process, only the compact columns are sent back. Uids that are not
+    # derived from the source ids are left empty, and are generated by the parent process.
+    root, rel_instance_file, rel_images_dir, uid_namespace, label_map = args
+    index = _CocoStreamIndex(os.path.join(root, rel_instance_file))
+    return index.to_columns(root=root, rel_images_dir=rel_images_dir, uid_namespace=uid_namespace, label_map=label_map, generate_uids=False), index.get_labels(label_map=label_map)
+
+
+def import_coco_many(
+    paths: Sequence[CocoSource],
+    rel_images_dir: str = 'images',
+    workers: Optional[int] = None,
+    validation: Optional[str] = None,
+    uid_namespace: Union[None, str, Sequence[Optional[str]]] = None,
+    label_map: Optional[Dict[str, str]] = None,
+    on_conflict: str = 'rename',
+    name: Optional[str] = None,
+) -> Dataset:
+    # each source is either a root directory containing the default instance file, or a (root, rel_instance_file) pair
+    sources = [(p, 'annotations/instances_default.json') if isinstance(p, str) else tuple(p) for p in paths]
+    if (uid_namespace is None) or isinstance(uid_namespace, str):
+        uid_namespace = [uid_namespace] * len(sources)
+    elif len(uid_namespace) != len(sources):
+        raise ValueError(f'expected {len(sources)} uid namespaces, got: {len(uid_namespace)}')
+    args = [(root, rel_file, rel_images_dir, ns, label_map) for (root, rel_file), ns in zip(sources, uid_namespace)]
+    workers = os.cpu_count() if (workers is None) else workers
+    with profile_stage('import_coco_many') as stage:
+        with profile_stage('import_coco_many.read') as read_stage:
+            read_stage.count('files', len(args))
+            read_stage.count('bytes_read', sum(os.path.getsize(os.path.join(root, rel_file)) for root, rel_file in sources))
+            if (workers <= 1) or (len(args) <= 1):
+                results = [_import_coco_columns(a) for a in args]
+            else:
+                with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+                    results = list(pool.map(_import_coco_columns, args))
+        # labels are reconciled by name when the columns are merged
+        # uids are generated here with the uid strategy of this process, in the same order as a sequential import
+        with profile_stage('import_coco_many.merge'):
+            parts = [columns if (ns is not None) else _replace_columns(columns, item_uids=_generate_uids(columns.num_items)) for (columns, _), ns in zip(results, uid_namespace)]
+            parts = _resolve_uid_conflicts(parts, on_conflict=on_conflict)
+            labels = list(dict.fromkeys(label for _, part_labels in results for label in part_labels))
+            dataset = Dataset.from_columns(BboxColumns.concat(parts), labels=labels, name=name)
+        dataset = _validate_dataset_bounds(dataset, mode=validation)
+        _count_dataset(stage, dataset)
+    return dataset
+
+
+# ========================================================================= #
+# COCO - Streaming                                                          #
+# ========================================================================= #
+
+
+class _CocoStreamIndex(object):
+
+    # number of values stored per annotation record: id, category_id, x, y, w, h
+    _RECORD_SIZE = 6
+
+    def __init__(self, path: Optional[str] = None, chunk_size: int = 1 << 20, load_annotations: bool = True):
+        # the index only keeps a compact record of each
+        # image and annotation, never the decoded json document
+        self.categories: Dict[int, str] = {}
+        self.images: List[Tuple[int, str, float, float]] = []
+        self.annotations: Dict[int, array] = defaultdict(lambda: array('d'))
+        # if the annotations are not loaded, only their byte offset and the number of annotations of
+        # each image are kept, and the annotations are read again by a second pass in `iter_items`
+        self._path = path
+        self._chunk_size = chunk_size
+        self._annotations_offset: Optional[int] = None
+        self._annotation_counts: Dict[int, int] = defaultdict(int)
+        if path is None:
+            return
+        # single streaming pass over the file, the order of the sections does not matter
+        with open(path, 'rb') as fp:
+            reader = JsonStreamReader(fp, chunk_size=chunk_size)
+            for key in reader.iter_object_keys():
+                if key == 'categories':
+                    for dat_cat in reader.iter_array_values():
+                        self._add_category(dat_cat)
+                elif key == 'images':
+                    for dat_image in reader.iter_array_values():
+                        self._add_image(dat_image)
+                elif key == 'annotations' and load_annotations:
+                    for dat_anno in reader.iter_array_values():
+                        self._add_annotation(dat_anno)
+                elif key == 'annotations':
+                    self._annotations_offset = reader.offset
+                    for dat_anno in reader.iter_array_values():
+                        self._annotation_counts[dat_anno['image_id']] += 1
+                else:
+                    reader.read_value()
+
+    @classmethod
+    def from_data(cls, dat: dict) -> '_CocoStreamIndex':
+        # the same records from an already decoded json document
+        index = cls()
+        for dat_cat in dat['categories']:
+            index._add_category(dat_cat)
+        for dat_image in dat['images']:
+            index._add_image(dat_image)
+        for dat_anno in dat['annotations']:
+            index._add_annotation(dat_anno)
+        return index
+
+    def _add_category(self, dat_cat: dict):
+        self.categories[dat_cat['id']] = dat_cat['name']
+
+    def _add_image(self, dat_image: dict):
+        self.images.append((dat_image['id'], dat_image['file_name'], dat_image['width'], dat_image['height']))
+
+    def _add_annotation(self, dat_anno: dict):
+        self.annotations[dat_anno['image_id']].extend((dat_anno['id'], dat_anno['category_id'], *dat_anno['bbox']))
+
+    def _iter_image_records(self) -> Iterator[Sequence[float]]:
+        # the annotation records of each image, in the order of the images
+        if self._annotations_offset is None:
+            for image_id, _, _, _ in self.images:
+                yield self.annotations.pop(image_id, ())
+            return
+        # second pass over the annotations. Records are only kept until all the annotations of their image have
+        # been read and it is the next image, so if the annotations are grouped by image in the same order as
+        # the images, as most tools write them, only the annotations of a single image are ever in memory.
+        # Otherwise, at most the annotations of the images that are waiting for an earlier image are kept.
+        image_ids = {image_id for image_id, _, _, _ in self.images}
+        with open(self._path, 'rb') as fp:
+            fp.seek(self._annotations_offset)
+            dat_annos = JsonStreamReader(fp, chunk_size=self._chunk_size).iter_array_values()
+            for image_id, _, _, _ in self.images:
+                size = self._annotation_counts.pop(image_id, 0) * self._RECORD_SIZE
+                while len(self.annotations.get(image_id, ())) < size:
+                    try:
+                        dat_anno = next(dat_annos)
+                    except StopIteration:
+                        raise ValueError(f'coco file changed while it was being read: {repr(self._path)}')
+                    # annotations of unknown images are skipped, the same as when loading everything
+                    if dat_anno['image_id'] in image_ids:
+                        self._add_annotation(dat_anno)
+                yield self.annotations.pop(image_id, ())
+
+    def iter_items(self, root: str, rel_images_dir: str, uid_namespace: Optional[str] = None, boxes: Optional[_CocoBoxes] = None, check_boxes: bool = True) -> Iterator[DatasetItemPath]:
+        n = self._RECORD_SIZE
+        # records are released once the item has been created
+        for (image_id, file_name, width, height), records in zip(self.images, self._iter_image_records()):
+            yield _make_coco_item(
+                root=root,
+                rel_images_dir=rel_images_dir,
+                image_id=image_id,
+                file_name=file_name,
+                image_wh=(width, height),
+                annotations=[
+                    (int(records[i]), self.categories[int(records[i+1])], records[i+2:i+n])
+                    for i in range(0, len(records), n)
+                ],
+                uid_namespace=uid_namespace,
+                boxes=boxes,
+                check_boxes=check_boxes,
+            )
+
+
+    def get_labels(self, label_map: Optional[Dict[str, str]] = None) -> List[str]:
+        label_map = label_map or {}
+        return list(dict.fromkeys(label_map.get(name, name) for name in self.categories.values()))
+
+    def to_columns(self, root: str, rel_images_dir: str, uid_namespace: Optional[str] = None, label_map: Optional[Dict[str, str]] = None, generate_uids: bool = True) -> BboxColumns:
+        # build the columns directly from the records, without creating any objects
+        label_map = label_map or {}
+        label_table = _make_table()
+        cat_codes = {cat_id: label_table.setdefault((label_map.get(name, name),), len(label_table)) for cat_id, name in self.categories.items()}
+        records, counts = array('d'), []
+        for image_id, _, _, _ in self.images:
+            image_records = self.annotations.pop(image_id, ())
+            records.extend(image_records)
+            counts.append(len(image_records) // self._RECORD_SIZE)
+        records = np.frombuffer(records, dtype=np.float64).reshape(-1, self._RECORD_SIZE)
+        # convert all the boxes at once
+        image_wh = np.repeat(np.asarray([(w, h) for _, _, w, h in self.images], dtype=np.float64).reshape(-1, 2), counts, axis=0)
+        anno_ids = records[:, 0].astype(np.int64)
+        # uids are either derived from the source ids, or generated using the current uid strategy
+        if uid_namespace is None:
+            item_uids = _generate_uids(len(self.images)) if generate_uids else [''] * len(self.images)
+            anno_uids = None
+        else:
+            item_uids = [make_source_uid(uid_namespace, 'image', image_id) for image_id, _, _, _ in self.images]
+            anno_uids = [make_source_uid(uid_namespace, 'annotation', anno_id) for anno_id in anno_ids.tolist()]
+        return BboxColumns(
+            coords=Bbox.batch_from_xywh(records[:, 2:], image_wh=image_wh),
+            item_offsets=np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(counts, dtype=np.int64)]),
+            item_paths=[os.path.join(root, rel_images_dir, file_name) for _, file_name, _, _ in self.images],
+            item_uids=item_uids,
+            anno_label_codes=np.asarray([cat_codes[int(cat_id)] for cat_id in records[:, 1].tolist()], dtype=np.int32),
+            label_sets=list(label_table),
+            anno_uids=anno_uids,
+            item_wh=np.asarray([(w, h) for _, _, w, h in self.images], dtype=np.int32).reshape(-1, 2),
+        )
+
+
+# ========================================================================= #
+# YOLO                                                                      #
+# ========================================================================= #
+
+
+IMAGE_EXTENSIONS = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp')
+
+# files that list the class names, one per line
+YOLO_CLASS_FILES = ('classes.txt', 'obj.names')
+
+
+def _scan_files(root: str, extensions: Sequence[str]) -> List[str]:
+    # sorted relative paths of all the files under the root with the given
+    # extensions, scandir avoids a separate stat call for every entry
+    found, dirs = [], ['']
+    while dirs:
+        rel_dir = dirs.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as it:
+            for entry in it:
+                if entry.is_dir():
+                    dirs.append(os.path.join(rel_dir, entry.name))
+                elif os.path.splitext(entry.name)[1].lower() in extensions:
+                    found.append(os.path.join(rel_dir, entry.name))
+    return sorted(found)
+
+
+def _read_text(path: str) -> str:
+    # images without a label file have no annotations
+    try:
+        with open(path, 'r', encoding='utf-8') as fp:
+            return fp.read()
+    except FileNotFoundError:
+        return ''
+
+
+def _read_texts(paths: Sequence[str]) -> List[str]:
+    return [_read_text(path) for path in paths]
+
+
+def _batched(values: Sequence, size: int) -> List[Sequence]:
+    # thread pool tasks handle many small files each, so that the overhead per task is amortised
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def _read_yolo_classes(root: str) -> Optional[List[str]]:
+    for file_name in YOLO_CLASS_FILES:
+        path = os.path.join(root, file_name)
+        if os.path.exists(path):
+            return [line.strip() for line in _read_text(path).splitlines() if line.strip()]
+    return None
+
+
+def _parse_yolo_texts(texts: Sequence[str], paths: Sequence[str]) -> Tuple[np.ndarray, List[int]]:
+    # parse the numbers of many label files at once, each non-empty line is: class cx cy w h
+    tokens, counts = [], []
+    for text, path in zip(texts, paths):
+        start = len(tokens)
+        for lineno, line in enumerate(text.splitlines(), 1):
+            toks = line.split()
+            if toks and (len(toks) != 5):
+                raise ValueError(f'yolo label file must have 5 values per line, got {len(toks)} values on line {lineno} of: {repr(path)}')
+            tokens.extend(toks)
+        counts.append((len(tokens) - start) // 5)
+    return np.array(tokens, dtype=np.float64).reshape(-1, 5), counts
+
+
+def import_yolo(
+    root: str,
+    rel_images_dir: str = 'images',
+    rel_labels_dir: str = 'labels',
+    labels: Optional[Sequence[str]] = None,
+    workers: int = 8,
+    chunk_size: int = 4096,
+    validation: Optional[str] = None,
+    uid_namespace: Optional[str] = None,
+    name: Optional[str] = None,
+) -> Dataset:
+    with profile_stage('import_yolo') as stage:
+        dataset = _import_yolo(root, rel_images_dir=rel_images_dir, rel_labels_dir=rel_labels_dir, labels=labels, workers=workers, chunk_size=chunk_size, validation=validation, uid_namespace=uid_namespace, name=name)
+        _count_dataset(stage, dataset)
+    return dataset
+
+
+def _import_yolo(
+    root: str,
+    rel_images_dir: str,
+    rel_labels_dir: str,
+    labels: Optional[Sequence[str]],
+    workers: int,
+    chunk_size: int,
+    validation: Optional[str],
+    uid_namespace: Optional[str],
+    name: Optional[str],
+) -> Dataset:
+    # the label file of `images/a/b.jpg` is `labels/a/b.txt`, class names are
+    # either given or read from the classes file, otherwise the class ids are used
+    images_dir, labels_dir = os.path.join(root, rel_images_dir), os.path.join(root, rel_labels_dir)
+    rel_paths = _scan_files(images_dir, IMAGE_EXTENSIONS)
+    label_paths = [os.path.join(labels_dir, os.path.splitext(p)[0] + '.txt') for p in rel_paths]
+    names = list(labels) if (labels is not None) else _read_yolo_classes(root)
+    # many small files are read concurrently, and parsed one chunk at a time
+    parts, counts = [], []
+    with profile_stage('import_yolo.read') as stage, ThreadPoolExecutor(max_workers=workers) as pool:
+        stage.count('files', len(label_paths))
+        for start in range(0, len(label_paths), chunk_size):
+            chunk = label_paths[start:start + chunk_size]
+            texts = [text for batch in pool.map(_read_texts, _batched(chunk, 64)) for text in batch]
+            stage.count('bytes_read', sum(map(len, texts)))
+            values, chunk_counts = _parse_yolo_texts(texts, chunk)
+            parts.append(values)
+            counts.extend(chunk_counts)
+    values = np.concatenate([np.zeros((0, 5))] + parts)
+    # map the class ids to labels
+    class_ids = values[:, 0].astype(np.int64)
+    if np.any(class_ids != values[:, 0]) or np.any(class_ids < 0):
+        raise ValueError('yolo class ids must be non-negative integers')
+    if names is None:
+        names = [str(i) for i in range(int(class_ids.max(initial=-1)) + 1)]
+    elif np.any(class_ids >= len(names)):
+        raise ValueError(f'yolo class id: {int(class_ids.max())} is out of range for {len(names)} class names')
+    label_table = _make_table()
+    class_codes = np.asarray([label_table.setdefault((n,), len(label_table)) for n in names], dtype=np.int32)
+    # uids are either derived from the relative image paths, or generated using the current uid strategy
+    if uid_namespace is None:
+        item_uids = _generate_uids(len(rel_paths))
+    else:
+        item_uids = [make_source_uid(uid_namespace, 'image', p) for p in rel_paths]
+    columns = BboxColumns(
+        coords=Bbox.batch_from_cxywh(values[:, 1:]),
+        item_offsets=np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(counts, dtype=np.int64)]),
+        item_paths=[os.path.join(images_dir, p) for p in rel_paths],
+        item_uids=item_uids,
+        anno_label_codes=class_codes[class_ids],
+        label_sets=list(label_table),
     )
+    dataset = Dataset.from_columns(columns, labels=list(dict.fromkeys(names)), name=name)
+    return _validate_dataset_bounds(dataset, mode=validation)
+
+
+# ========================================================================= #
+# VOC                                                                       #
+# ========================================================================= #
+
+
+# flags of VOC objects that are imported as annotation tags when set, in the order of their bits
+VOC_FLAG_TAGS = ('difficult', 'occluded', 'truncated')
+
+
+def _parse_voc_flag(value: Optional[str]) -> int:
+    return int((value is not None) and (value.strip() not in ('', '0', 'false', 'False')))
+
+
+def _parse_voc_files(paths: Sequence[str]) -> Tuple[List[str], List[Tuple[int, int]], List[int], List[str], np.ndarray, np.ndarray]:
+    # runs in a worker process, returns the file name and size of each file, and the names, pixel boxes and
+    # flags of all the objects. Each file is small, so its tree is built by the C parser directly from its bytes,
+    # which is much faster than `iterparse` handling every element in python, and is released immediately.
+    file_names, sizes, counts, names, boxes, flags = [], [], [], [], [], []
+    for path in paths:
+        try:
+            with open(path, 'rb') as fp:
+                root = ElementTree.fromstring(fp.read())
+            objects = root.findall('object')
+            for obj in objects:
+                bndbox = obj.find('bndbox')
+                if bndbox is None:
+                    raise ValueError('object is missing a bndbox')
+                names.append((obj.findtext('name') or '').strip())
+                boxes.extend([float(bndbox.findtext('xmin')), float(bndbox.findtext('ymin')), float(bndbox.findtext('xmax')), float(bndbox.findtext('ymax'))])
+                flags.append(_parse_voc_flag(obj.findtext('difficult')) | (_parse_voc_flag(obj.findtext('occluded')) << 1) | (_parse_voc_flag(obj.findtext('truncated')) << 2))
+            size = root.find('size')
+            sizes.append((0, 0) if (size is None) else (int(float(size.findtext('width') or 0)), int(float(size.findtext('height') or 0))))
+        except (ElementTree.ParseError, TypeError, ValueError) as e:
+            raise ValueError(f'invalid voc annotation file: {repr(path)}, {e}') from e
+        file_names.append((root.findtext('filename') or '').strip())
+        counts.append(len(objects))
+    return file_names, sizes, counts, names, np.asarray(boxes, dtype=np.float64).reshape(-1, 4), np.asarray(flags, dtype=np.int64)
+
+
+def import_voc(
+    root: str,
+    rel_annotations_dir: str = 'Annotations',
+    rel_images_dir: str = 'JPEGImages',
+    labels: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 1024,
+    validation: Optional[str] = None,
+    uid_namespace: Optional[str] = None,
+    name: Optional[str] = None,
+) -> Dataset:
+    with profile_stage('import_voc') as stage:
+        dataset = _import_voc(root, rel_annotations_dir=rel_annotations_dir, rel_images_dir=rel_images_dir, labels=labels, workers=workers, chunk_size=chunk_size, validation=validation, uid_namespace=uid_namespace, name=name)
+        _count_dataset(stage, dataset)
+    return dataset
+
+
+def _import_voc(
+    root: str,
+    rel_annotations_dir: str,
+    rel_images_dir: str,
+    labels: Optional[Sequence[str]],
+    workers: Optional[int],
+    chunk_size: int,
+    validation: Optional[str],
+    uid_namespace: Optional[str],
+    name: Optional[str],
+) -> Dataset:
+    # the image of `Annotations/a/b.xml` is `JPEGImages/a/<filename>`, boxes are in pixels and are
+    # normalised with the image size from the file, only images without a size are probed
+    annotations_dir, images_dir = os.path.join(root, rel_annotations_dir), os.path.join(root, rel_images_dir)
+    rel_paths = _scan_files(annotations_dir, ('.xml',))
+    chunks = _batched([os.path.join(annotations_dir, p) for p in rel_paths], chunk_size)
+    # files are parsed in separate processes, each chunk of files is returned in a compact form
+    workers = os.cpu_count() if (workers is None) else workers
+    with profile_stage('import_voc.parse') as stage:
+        stage.count('files', len(rel_paths))
+        if (workers <= 1) or (len(chunks) <= 1):
+            results = [_parse_voc_files(chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+                results = list(pool.map(_parse_voc_files, chunks))
+    file_names = [f for r in results for f in r[0]]
+    counts = np.asarray([c for r in results for c in r[2]], dtype=np.int64)
+    names = [n for r in results for n in r[3]]
+    boxes = np.concatenate([np.zeros((0, 4))] + [r[4] for r in results])
+    flags = np.concatenate([np.zeros(0, dtype=np.int64)] + [r[5] for r in results])
+    # images are next to the annotation file in the same relative directory, defaulting to the name of the annotation file
+    item_paths = [
+        os.path.join(images_dir, os.path.dirname(p), f if f else os.path.splitext(os.path.basename(p))[0] + '.jpg')
+        for p, f in zip(rel_paths, file_names)
+    ]
+    item_wh = np.asarray([wh for r in results for wh in r[1]], dtype=np.int64).reshape(-1, 2)
+    unknown = np.flatnonzero(np.any(item_wh <= 0, axis=1))
+    if len(unknown):
+        from datasmith._images import probe_images
+        item_wh[unknown] = [(meta.width, meta.height) for meta in probe_images([item_paths[i] for i in unknown.tolist()])]
+    # labels are either given, or in order of first occurrence
+    label_names = list(dict.fromkeys(names)) if (labels is None) else list(labels)
+    label_table = _make_table()
+    label_codes = {n: label_table.setdefault((n,), len(label_table)) for n in label_names}
+    unknown_names = set(names) - label_codes.keys()
+    if unknown_names:
+        raise ValueError(f'voc objects have labels that are not in the given labels: {sorted(unknown_names)}')
+    # flags are mapped to tag sets
+    tag_table = _make_table()
+    flag_codes = np.asarray([tag_table.setdefault(tuple(sorted(t for i, t in enumerate(VOC_FLAG_TAGS) if (f >> i) & 1)), len(tag_table)) for f in range(1 << len(VOC_FLAG_TAGS))], dtype=np.int32)
+    # uids are either derived from the relative annotation paths, or generated using the current uid strategy
+    if uid_namespace is None:
+        item_uids, anno_uids = _generate_uids(len(rel_paths)), None
+    else:
+        item_uids = [make_source_uid(uid_namespace, 'image', p) for p in rel_paths]
+        anno_uids = [make_source_uid(uid_namespace, 'annotation', p, k) for p, count in zip(rel_paths, counts.tolist()) for k in range(count)]
+    columns = BboxColumns(
+        coords=Bbox.batch_from_xyxy(boxes, image_wh=np.repeat(item_wh, counts, axis=0).astype(np.float64)),
+        item_offsets=np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(counts)]),
+        item_paths=item_paths,
+        item_uids=item_uids,
+        anno_label_codes=np.asarray([label_codes[n] for n in names], dtype=np.int32),
+        anno_tag_codes=flag_codes[flags],
+        label_sets=list(label_table),
+        tag_sets=list(tag_table),
+        anno_uids=anno_uids,
+        item_wh=item_wh,
+    )
+    dataset = Dataset.from_columns(columns, labels=label_names, name=name)
+    return _validate_dataset_bounds(dataset, mode=validation)
+
 
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
 
 
 if __name__ == '__main__':
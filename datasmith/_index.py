@@ -0,0 +1,206 @@
+from collections import Counter
+from collections import defaultdict
+from typing import Counter as TypingCounter
+from typing import DefaultDict
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import numpy as np
+
+
+# ========================================================================= #
+# Helper                                                                    #
+# ========================================================================= #
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    # concatenated `arange(start, stop)` of every range
+    counts = stops - starts
+    firsts = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + (np.arange(counts.sum()) - firsts)
+
+
+def _group_codes(codes: np.ndarray, num_codes: int) -> Tuple[np.ndarray, np.ndarray]:
+    # order that groups equal codes while keeping the original order within each
+    # group, and the bounds of each group. Stable sorts of small integers use radix sort.
+    order = np.argsort(codes.astype(np.uint16) if (num_codes <= (1 << 16)) else codes, kind='stable')
+    return order, np.searchsorted(codes[order], np.arange(num_codes + 1))
+
+
+# ========================================================================= #
+# Inverted Label & Tag Index                                                #
+# ========================================================================= #
+
+
+class _DatasetIndex(object):
+
+    def __init__(self, generation: Optional[Tuple[int, int]] = None):
+        # the generation of the dataset that the index was built at, see `Dataset._get_generation`
+        self.generation = generation
+        self.size = 0
+        # label/tag -> positions of items that have that label/tag
+        self.item_labels: DefaultDict[str, Set[int]] = defaultdict(set)
+        self.item_tags: DefaultDict[str, Set[int]] = defaultdict(set)
+        # label/tag -> positions of items where ALL the annotations have that label/tag
+        self.anno_labels: DefaultDict[str, Set[int]] = defaultdict(set)
+        self.anno_tags: DefaultDict[str, Set[int]] = defaultdict(set)
+        # positions of items without annotations, these always pass annotation filters
+        self.unannotated: Set[int] = set()
+        # number of items, and number of annotations, that each label/tag occurs on
+        self.item_label_counts: TypingCounter[str] = Counter()
+        self.item_tag_counts: TypingCounter[str] = Counter()
+        self.anno_label_counts: TypingCounter[str] = Counter()
+        self.anno_tag_counts: TypingCounter[str] = Counter()
+
+    def add(self, pos: int, item) -> '_DatasetIndex':
+        for label in item.labels:
+            self.item_labels[label].add(pos)
+            self.item_label_counts[label] += 1
+        for tag in item.tags:
+            self.item_tags[tag].add(pos)
+            self.item_tag_counts[tag] += 1
+        # count the annotations that each label/tag occurs on
+        annotations = item.annotations
+        n = len(annotations)
+        if n == 0:
+            self.unannotated.add(pos)
+        else:
+            # annotations mostly share a few interned sets, so the sets are counted before their values,
+            # `Counter.update` is avoided as it is slow for many small updates
+            label_sets, tag_sets = {}, {}
+            for anno in annotations:
+                labels, tags = anno.labels, anno.tags
+                label_sets[labels] = label_sets.get(labels, 0) + 1
+                tag_sets[tags] = tag_sets.get(tags, 0) + 1
+            for sets, index, counts in [(label_sets, self.anno_labels, self.anno_label_counts), (tag_sets, self.anno_tags, self.anno_tag_counts)]:
+                values = {}
+                for s, count in sets.items():
+                    for v in s:
+                        values[v] = values.get(v, 0) + count
+                for v, count in values.items():
+                    if count == n:
+                        index[v].add(pos)
+                    counts[v] += count
+        if pos >= self.size:
+            self.size = pos + 1
+        return self
+
+    def add_items(self, start: int, items: Iterable) -> '_DatasetIndex':
+        for pos, item in enumerate(items, start=start):
+            self.add(pos, item)
+        return self
+
+    def add_columns(self, start: int, columns, idxs: Optional[np.ndarray] = None, positions: Optional[np.ndarray] = None) -> '_DatasetIndex':
+        # same as `add_items` for the items `idxs` of `BboxColumns`, at `positions` which default to `start + idxs`,
+        # the items and annotations are grouped by their label & tag sets instead of visited one by one
+        idxs = np.arange(columns.num_items) if (idxs is None) else np.asarray(idxs, dtype=np.int64).reshape(-1)
+        starts, stops = columns.item_offsets[idxs], columns.item_offsets[idxs + 1]
+        counts = stops - starts
+        positions = (idxs + start) if (positions is None) else np.asarray(positions, dtype=np.int64).reshape(-1)
+        rows = _ranges(starts, stops)
+        owners = np.repeat(np.arange(len(idxs)), counts)
+        for sets, item_codes, anno_codes, item_index, anno_index, item_counts, anno_counts in [
+            (columns.label_sets, columns.item_label_codes, columns.anno_label_codes, self.item_labels, self.anno_labels, self.item_label_counts, self.anno_label_counts),
+            (columns.tag_sets, columns.item_tag_codes, columns.anno_tag_codes, self.item_tags, self.anno_tags, self.item_tag_counts, self.anno_tag_counts),
+        ]:
+            # items, all the items with the same set are added at once
+            order, bounds = _group_codes(item_codes[idxs], len(sets))
+            for code in np.flatnonzero(bounds[1:] > bounds[:-1]).tolist():
+                group = positions[order[bounds[code]:bounds[code + 1]]].tolist()
+                for v in sets[code]:
+                    item_index[v].update(group)
+                    item_counts[v] += len(group)
+            # annotations, the rows of the annotations with each label/tag are collected from all the sets
+            order, bounds = _group_codes(anno_codes[rows], len(sets))
+            value_groups: Dict[str, List[np.ndarray]] = defaultdict(list)
+            for code in np.flatnonzero(bounds[1:] > bounds[:-1]).tolist():
+                for v in sets[code]:
+                    value_groups[v].append(order[bounds[code]:bounds[code + 1]])
+            for v, groups in value_groups.items():
+                # rows are sorted by item, so each item is a run of rows, and all the
+                # annotations of an item have the label/tag if the run covers the item
+                v_owners = owners[np.sort(np.concatenate(groups)) if (len(groups) > 1) else groups[0]]
+                run_starts = np.flatnonzero(np.diff(v_owners, prepend=-1))
+                run_owners = v_owners[run_starts]
+                run_counts = np.diff(run_starts, append=len(v_owners))
+                full = run_owners[run_counts == counts[run_owners]]
+                if len(full):
+                    anno_index[v].update(positions[full].tolist())
+                anno_counts[v] += len(v_owners)
+        self.unannotated.update(positions[counts == 0].tolist())
+        if len(positions):
+            self.size = max(self.size, int(positions.max()) + 1)
+        return self
+
+    # --- incremental updates --- #
+
+    def _combine(self, other: '_DatasetIndex', remove: bool) -> '_DatasetIndex':
+        for name in ('item_labels', 'item_tags', 'anno_labels', 'anno_tags'):
+            index = getattr(self, name)
+            for k, positions in getattr(other, name).items():
+                if not remove:
+                    index[k].update(positions)
+                elif k in index:
+                    index[k].difference_update(positions)
+                    if not index[k]:
+                        del index[k]
+        for name in ('item_label_counts', 'item_tag_counts', 'anno_label_counts', 'anno_tag_counts'):
+            counts = getattr(self, name)
+            for k, count in getattr(other, name).items():
+                counts[k] += -count if remove else count
+                # labels & tags that no longer occur are removed, see `Dataset.validate`
+                if counts[k] <= 0:
+                    del counts[k]
+        if remove:
+            self.unannotated.difference_update(other.unannotated)
+        else:
+            self.unannotated.update(other.unannotated)
+            self.size = max(self.size, other.size)
+        return self
+
+    def merge(self, other: '_DatasetIndex') -> '_DatasetIndex':
+        # add the entries of an index of other items
+        return self._combine(other, remove=False)
+
+    def subtract(self, other: '_DatasetIndex') -> '_DatasetIndex':
+        # remove the entries of an index built from some of the same items, so that items
+        # can be updated with `index.subtract(old).merge(new)` instead of rebuilding the index
+        return self._combine(other, remove=True)
+
+    # --- query --- #
+
+    def query(
+        self,
+        item_labels: Optional[Iterable[str]] = None,
+        item_tags: Optional[Iterable[str]] = None,
+        anno_labels: Optional[Iterable[str]] = None,
+        anno_tags: Optional[Iterable[str]] = None,
+    ) -> Optional[List[int]]:
+        # get the sorted positions of the items that satisfy all the
+        # constraints, or `None` if there are no constraints
+        groups = []
+        for index, values in [(self.item_labels, item_labels), (self.item_tags, item_tags)]:
+            for v in (values or ()):
+                groups.append(index.get(v, set()))
+        for index, values in [(self.anno_labels, anno_labels), (self.anno_tags, anno_tags)]:
+            for v in (values or ()):
+                groups.append(index.get(v, set()) | self.unannotated)
+        if not groups:
+            return None
+        # intersect starting from the smallest set
+        groups.sort(key=len)
+        result = set(groups[0])
+        for group in groups[1:]:
+            result.intersection_update(group)
+            if not result:
+                break
+        return sorted(result)
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
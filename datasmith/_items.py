@@ -1,8 +1,12 @@
+import os
 from typing import Iterable
 from typing import Optional
+from typing import Tuple
 
 from datasmith._base import Annotation
 from datasmith._base import DatasetItem
+from datasmith._images import ImageMeta
+from datasmith._images import probe_image
 from datasmith._util import repr_truelike_kwargs_no_uid
 
 
@@ -13,6 +17,8 @@ from datasmith._util import repr_truelike_kwargs_no_uid
 
 class DatasetItemPath(DatasetItem):
 
+    __slots__ = ('path', '_image_wh', '_stat')
+
     def __init__(
         self,
         path: str,
@@ -20,6 +26,7 @@ class DatasetItemPath(DatasetItem):
         labels: Optional[Iterable[str]] = None,
         tags: Optional[Iterable[str]] = None,
         uid: Optional[str] = None,
+        image_wh: Optional[Tuple[int, int]] = None,
     ):
         super().__init__(
             annotations=annotations,
@@ -28,6 +35,54 @@ class DatasetItemPath(DatasetItem):
             uid=uid,
         )
         self.path = path
+        # image metadata is resolved from the file when first accessed, unless already known
+        self._image_wh: Optional[Tuple[int, int]] = None if (image_wh is None) else (int(image_wh[0]), int(image_wh[1]))
+        self._stat: Optional[Tuple[int, float]] = None
+
+    def _copy(self) -> 'DatasetItemPath':
+        item = super()._copy()
+        item.path = self.path
+        item._image_wh = self._get_known_image_wh()
+        item._stat = self._stat
+        return item
+
+    # --- image metadata --- #
+
+    def _get_known_image_wh(self) -> Optional[Tuple[int, int]]:
+        return self._image_wh
+
+    def _set_image_meta(self, meta: ImageMeta):
+        self._image_wh = (meta.width, meta.height)
+        self._stat = (meta.size_bytes, meta.mtime)
+
+    @property
+    def image_wh(self) -> Tuple[int, int]:
+        # only the header of the image is read, and the result is cached on disk
+        if self._get_known_image_wh() is None:
+            self._set_image_meta(probe_image(self.path))
+        return self._get_known_image_wh()
+
+    @property
+    def width(self) -> int:
+        return self.image_wh[0]
+
+    @property
+    def height(self) -> int:
+        return self.image_wh[1]
+
+    def _get_stat(self) -> Tuple[int, float]:
+        if self._stat is None:
+            st = os.stat(self.path)
+            self._stat = (st.st_size, st.st_mtime)
+        return self._stat
+
+    @property
+    def size_bytes(self) -> int:
+        return self._get_stat()[0]
+
+    @property
+    def mtime(self) -> float:
+        return self._get_stat()[1]
 
     def __repr__(self):
         return repr_truelike_kwargs_no_uid(self, path=self.path, annotations=list(self.annotations), labels=self.labels, tags=self.tags, uid=self.uid)
@@ -0,0 +1,116 @@
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Union
+
+import numpy as np
+
+from datasmith._base import Dataset
+from datasmith._columnar import BboxColumns
+
+
+# ========================================================================= #
+# Helper                                                                    #
+# ========================================================================= #
+
+
+_COLUMN_FIELDS = (
+    'coords', 'item_offsets', 'item_paths', 'item_uids', 'anno_label_codes', 'anno_tag_codes',
+    'item_label_codes', 'item_tag_codes', 'label_sets', 'tag_sets', 'anno_uids', 'item_wh',
+)
+
+
+def _replace_columns(columns: BboxColumns, **changes) -> BboxColumns:
+    # shallow copy of the columns, so that the columns of the source datasets are never modified
+    return BboxColumns(**{k: changes[k] if (k in changes) else getattr(columns, k) for k in _COLUMN_FIELDS})
+
+
+# ========================================================================= #
+# Uid Conflicts                                                             #
+# ========================================================================= #
+
+
+# how items with a uid that is already used by an earlier part are handled:
+# - rename: the uid is suffixed with the index of the part, so that merges are repeatable
+# - skip:   the item is dropped, keeping the earlier item
+# - raise:  a `KeyError` is raised
+UID_CONFLICT_MODES = ('rename', 'skip', 'raise')
+
+
+def _resolve_uid_conflicts(parts: Sequence[BboxColumns], on_conflict: str) -> List[BboxColumns]:
+    # the uids within each part are already unique, so parts without any conflicts
+    # are added to the set of seen uids at once, and only conflicting uids are handled
+    if on_conflict not in UID_CONFLICT_MODES:
+        raise KeyError(f'unsupported on_conflict mode: {repr(on_conflict)}, must be one of: {UID_CONFLICT_MODES}')
+    seen, resolved = set(), []
+    for i, part in enumerate(parts):
+        conflicts = seen.intersection(part.item_uids)
+        if not conflicts:
+            seen.update(part.item_uids)
+        elif on_conflict == 'raise':
+            raise KeyError(f'item with id: {next(iter(conflicts))} from part: {i} already in an earlier part')
+        elif on_conflict == 'skip':
+            seen.update(part.item_uids)
+            part = part.select_items(np.asarray([j for j, uid in enumerate(part.item_uids) if uid not in conflicts], dtype=np.int64))
+        else:
+            uids = list(part.item_uids)
+            seen.update(uid for uid in uids if uid not in conflicts)
+            for j, uid in enumerate(uids):
+                if uid in conflicts:
+                    k = 0
+                    while uid in seen:
+                        uid, k = f'{uids[j]}.{i}' + (f'.{k}' if k else ''), k + 1
+                    uids[j] = uid
+                    seen.add(uid)
+            part = _replace_columns(part, item_uids=uids)
+        resolved.append(part)
+    return resolved
+
+
+# ========================================================================= #
+# Label Remapping                                                           #
+# ========================================================================= #
+
+
+LabelMap = Dict[str, str]
+
+
+def _remap_labels(columns: BboxColumns, label_map: Optional[LabelMap]) -> BboxColumns:
+    # only the table of distinct label sets is rewritten, the codes of the items and
+    # annotations stay the same. Sets that become equal are merged when concatenated.
+    if not label_map:
+        return columns
+    label_sets = [tuple(sorted({label_map.get(label, label) for label in labels})) for labels in columns.label_sets]
+    return _replace_columns(columns, label_sets=label_sets)
+
+
+# ========================================================================= #
+# Merge                                                                     #
+# ========================================================================= #
+
+
+def merge_datasets(
+    datasets: Sequence[Dataset],
+    on_conflict: str = 'rename',
+    label_map: Union[None, LabelMap, Sequence[Optional[LabelMap]]] = None,
+    name: Optional[str] = None,
+) -> Dataset:
+    # a single label map is used for all the datasets, otherwise there is one for each dataset
+    if (label_map is None) or isinstance(label_map, dict):
+        label_map = [label_map] * len(datasets)
+    elif len(label_map) != len(datasets):
+        raise ValueError(f'expected {len(datasets)} label maps, got: {len(label_map)}')
+    # columnar datasets are used as is, without converting their items
+    parts = [_remap_labels(dataset.to_columns(), m) for dataset, m in zip(datasets, label_map)]
+    parts = _resolve_uid_conflicts(parts, on_conflict=on_conflict)
+    # the labels and tags of the datasets, in order of first occurrence
+    labels = dict.fromkeys((m or {}).get(label, label) for dataset, m in zip(datasets, label_map) for label in dataset.labels)
+    tags = dict.fromkeys(tag for dataset in datasets for tag in dataset.tags)
+    # uids are unique after resolving the conflicts, so they do not need to be checked again
+    return Dataset.from_columns(BboxColumns.concat(parts), labels=list(labels), tags=list(tags), name=name, check_uids=False)
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
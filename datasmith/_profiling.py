@@ -0,0 +1,295 @@
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import IO
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Union
+
+
+# ========================================================================= #
+# Stages                                                                    #
+# ========================================================================= #
+
+
+ProfileReport = Dict[str, Any]
+ProfileSink = Callable[[ProfileReport], None]
+
+
+class StageStats(object):
+
+    # accumulated over every run of the stages with the same name
+
+    __slots__ = ('name', 'calls', 'seconds', 'counts', 'peak_bytes')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.counts: Dict[str, int] = {}
+        # peak traced memory above the memory at the start of the stage, only if memory is traced
+        self.peak_bytes: Optional[int] = None
+
+    @property
+    def rates(self) -> Dict[str, float]:
+        # eg. items per second
+        return {k: v / self.seconds for k, v in self.counts.items()} if (self.seconds > 0) else {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'seconds': self.seconds, 'counts': dict(self.counts), 'rates': self.rates, 'peak_bytes': self.peak_bytes}
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(name={repr(self.name)}, calls={self.calls}, seconds={self.seconds:.6f}, counts={self.counts})'
+
+
+class _Stage(object):
+
+    # a running stage, counts are added to the innermost running stage
+
+    __slots__ = ('_profiler', '_stats', '_t', '_start_bytes', '_peak')
+    enabled = True
+
+    def __init__(self, profiler: 'Profiler', stats: StageStats):
+        self._profiler = profiler
+        self._stats = stats
+        self._t = 0.0
+        self._start_bytes = 0
+        self._peak = 0
+
+    def __enter__(self) -> '_Stage':
+        self._profiler._enter(self)
+        self._t = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        t = time.perf_counter() - self._t
+        self._stats.calls += 1
+        self._stats.seconds += t
+        self._profiler._exit(self)
+
+    def count(self, name: str, n: int = 1):
+        counts = self._stats.counts
+        counts[name] = counts.get(name, 0) + n
+        self._profiler.counters[name] = self._profiler.counters.get(name, 0) + n
+
+
+class _NullStage(object):
+
+    # returned when profiling is disabled, so that instrumented code costs a single function call
+
+    __slots__ = ()
+    enabled = False
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+# ========================================================================= #
+# Profiler                                                                  #
+# ========================================================================= #
+
+
+class Profiler(object):
+
+    def __init__(self, sinks: Optional[Sequence[ProfileSink]] = None, trace_memory: bool = False):
+        self.sinks: List[ProfileSink] = list(sinks) if (sinks is not None) else []
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.seconds = 0.0
+        self.peak_bytes: Optional[int] = None
+        # running stages, innermost last
+        self._stack: List[_Stage] = []
+        self._t: Optional[float] = None
+        self._owns_tracemalloc = False
+        self._peak = 0
+
+    # --- stages --- #
+
+    def stage(self, name: str) -> _Stage:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        return _Stage(self, stats)
+
+    def count(self, name: str, n: int = 1):
+        if self._stack:
+            self._stack[-1].count(name, n)
+        else:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def _enter(self, stage: _Stage):
+        # the traced peak is reset for every stage, so the peak seen so far is kept by the outer stage
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self._add_peak(peak)
+            tracemalloc.reset_peak()
+            stage._start_bytes, stage._peak = current, current
+        self._stack.append(stage)
+
+    def _exit(self, stage: _Stage):
+        self._stack.pop()
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], stage._peak)
+            stats = stage._stats
+            stats.peak_bytes = max(stats.peak_bytes or 0, peak - stage._start_bytes)
+            self._add_peak(peak)
+
+    def _add_peak(self, peak: int):
+        if self._stack:
+            self._stack[-1]._peak = max(self._stack[-1]._peak, peak)
+        else:
+            self._peak = max(self._peak, peak)
+
+    # --- start & stop --- #
+
+    def start(self) -> 'Profiler':
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._t = time.perf_counter()
+        return self
+
+    def stop(self) -> 'Profiler':
+        if self._t is not None:
+            self.seconds += time.perf_counter() - self._t
+            self._t = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_bytes = max(self._peak, tracemalloc.get_traced_memory()[1])
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+        return self
+
+    # --- report --- #
+
+    def report(self) -> ProfileReport:
+        return {
+            'seconds': self.seconds,
+            'peak_bytes': self.peak_bytes,
+            'counters': dict(self.counters),
+            'stages': {name: stats.to_dict() for name, stats in self.stages.items()},
+        }
+
+    def format(self) -> str:
+        lines = [f'profile: {self.seconds:.3f}s' + ('' if (self.peak_bytes is None) else f', peak: {self.peak_bytes / 1024**2:.1f} MiB')]
+        for name, stats in self.stages.items():
+            line = f'  {name:<28s} {stats.calls:6d} calls {stats.seconds:10.4f}s'
+            if stats.peak_bytes is not None:
+                line += f' {stats.peak_bytes / 1024**2:9.1f} MiB'
+            line += ''.join(f', {k}: {v} ({stats.rates.get(k, 0):.0f}/s)' for k, v in stats.counts.items())
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def emit(self) -> ProfileReport:
+        report = self.report()
+        for sink in self.sinks:
+            sink(report)
+        return report
+
+
+# ========================================================================= #
+# Global Profiler                                                           #
+# ========================================================================= #
+
+
+# profiling is disabled unless a profiler is set
+_PROFILER: Optional[Profiler] = None
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _PROFILER
+
+
+def set_profiler(profiler: Optional[Profiler]) -> Optional[Profiler]:
+    global _PROFILER
+    if (profiler is not None) and not isinstance(profiler, Profiler):
+        raise TypeError(f'profiler must be of type: {Profiler.__name__} or None, got type: {type(profiler)}, for: {repr(profiler)}')
+    # returns the previous profiler
+    prev, _PROFILER = _PROFILER, profiler
+    return prev
+
+
+@contextmanager
+def profiling(sinks: Optional[Sequence[ProfileSink]] = None, trace_memory: bool = False) -> Iterator[Profiler]:
+    # eg. `with profiling([LoggingSink()]) as profiler: import_coco(...)`, the report is sent to the sinks on exit
+    profiler = Profiler(sinks=sinks, trace_memory=trace_memory)
+    prev = set_profiler(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        set_profiler(prev)
+        profiler.emit()
+
+
+def profile_stage(name: str) -> Union[_Stage, _NullStage]:
+    # eg. `with profile_stage('import_coco.read') as stage: stage.count('bytes_read', n)`
+    return _NULL_STAGE if (_PROFILER is None) else _PROFILER.stage(name)
+
+
+def profile_count(name: str, n: int = 1):
+    if _PROFILER is not None:
+        _PROFILER.count(name, n)
+
+
+# ========================================================================= #
+# Sinks                                                                     #
+# ========================================================================= #
+
+
+class LoggingSink(object):
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logging.getLogger('datasmith') if (logger is None) else logger
+        self.level = level
+
+    def __call__(self, report: ProfileReport):
+        self.logger.log(self.level, _format_report(report))
+
+
+class JsonSink(object):
+
+    # each report is written as a single line of json, appended to the file
+
+    def __init__(self, file: Union[str, IO[str]]):
+        self.file = file
+
+    def __call__(self, report: ProfileReport):
+        if isinstance(self.file, str):
+            with open(self.file, 'a') as fp:
+                fp.write(json.dumps(report) + '\n')
+        else:
+            self.file.write(json.dumps(report) + '\n')
+
+
+def _format_report(report: ProfileReport) -> str:
+    # same as `Profiler.format`, but from a report
+    profiler = Profiler()
+    profiler.seconds, profiler.peak_bytes = report['seconds'], report['peak_bytes']
+    for name, dat in report['stages'].items():
+        stats = profiler.stages[name] = StageStats(name)
+        stats.calls, stats.seconds, stats.counts, stats.peak_bytes = dat['calls'], dat['seconds'], dat['counts'], dat['peak_bytes']
+    return profiler.format()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
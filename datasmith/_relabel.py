@@ -0,0 +1,255 @@
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+from datasmith._base import Dataset
+from datasmith._base import DatasetView
+from datasmith._base import UidIdx
+from datasmith._base import _intern_strs
+from datasmith._columnar import BboxColumns
+from datasmith._columnar import _notify_columns_modified
+from datasmith._index import _DatasetIndex
+from datasmith._index import _ranges
+
+
+# ========================================================================= #
+# Label & Tag Functions                                                     #
+# ========================================================================= #
+
+
+StrMap = Dict[str, Optional[str]]
+SetFn = Callable[[Tuple[str, ...]], Tuple[str, ...]]
+Selection = Union[None, Dataset, np.ndarray, Sequence[UidIdx]]
+
+
+def _check_map(mapping: StrMap, kind: str) -> StrMap:
+    if not isinstance(mapping, dict):
+        raise TypeError(f'{kind} map must be a dict, got type: {type(mapping)}, for: {repr(mapping)}')
+    for k, v in mapping.items():
+        if (not isinstance(k, str)) or not ((v is None) or isinstance(v, str)):
+            raise TypeError(f'{kind} map must be from str to str or None, got: {repr(k)}: {repr(v)}')
+    return mapping
+
+
+def _cached(fn: SetFn) -> SetFn:
+    # many items and annotations share the same set, so each distinct set is only mapped once
+    cache = {}
+    def wrapped(values: Tuple[str, ...]) -> Tuple[str, ...]:
+        result = cache.get(values)
+        if result is None:
+            result = cache[values] = fn(values)
+        return result
+    return wrapped
+
+
+def _map_fn(mapping: StrMap, kind: str) -> SetFn:
+    # sets without any mapped values are returned as is
+    def fn(values: Tuple[str, ...]) -> Tuple[str, ...]:
+        if not any(v in mapping for v in values):
+            return values
+        return _intern_strs([m for m in (mapping.get(v, v) for v in values) if m is not None], kind)
+    return _cached(fn)
+
+
+def _add_fn(added: Tuple[str, ...], kind: str) -> SetFn:
+    def fn(values: Tuple[str, ...]) -> Tuple[str, ...]:
+        return _intern_strs(values + added, kind)
+    return _cached(fn)
+
+
+def _remove_fn(removed: Tuple[str, ...], kind: str) -> SetFn:
+    def fn(values: Tuple[str, ...]) -> Tuple[str, ...]:
+        return _intern_strs([v for v in values if v not in removed], kind)
+    return _cached(fn)
+
+
+# ========================================================================= #
+# Selection                                                                 #
+# ========================================================================= #
+
+
+def _select(dataset: Dataset, selection: Selection) -> np.ndarray:
+    # sorted unique positions in the dataset of the selected items
+    n = len(dataset)
+    if selection is None:
+        return np.arange(n)
+    if isinstance(selection, Dataset):
+        # views of the same storage are resolved from their positions, without accessing the items
+        if (selection._get_root() is dataset._get_root()) and isinstance(selection, DatasetView):
+            positions = dataset._get_positions() if isinstance(dataset, DatasetView) else None
+            idxs = selection.indices if (positions is None) else [positions.get(p, -1) for p in selection.indices.tolist()]
+            idxs = np.asarray(idxs, dtype=np.int64)
+            if np.any(idxs < 0):
+                raise KeyError('selected items are not all in the dataset')
+            return np.unique(idxs)
+        return np.unique(np.asarray([dataset._get_position(item.uid) for item in selection], dtype=np.int64))
+    if isinstance(selection, np.ndarray) and (selection.dtype == bool):
+        if selection.shape != (n,):
+            raise ValueError(f'boolean selection must have shape: {(n,)}, got: {selection.shape}')
+        return np.flatnonzero(selection)
+    if isinstance(selection, np.ndarray) and np.issubdtype(selection.dtype, np.integer):
+        idxs = selection.astype(np.int64).reshape(-1)
+        if np.any((idxs < -n) | (idxs >= n)):
+            raise IndexError(f'item index out of range for dataset of length: {n}')
+        return np.unique(idxs % max(n, 1))
+    return np.unique(np.asarray([dataset._get_position(i) for i in selection], dtype=np.int64))
+
+
+# ========================================================================= #
+# In-Place Updates                                                          #
+# ========================================================================= #
+
+
+def _map_codes(sets: List[Tuple[str, ...]], fn: SetFn) -> np.ndarray:
+    # the code of the mapped set of every set in the table, new sets are appended to the table
+    table = {}
+    for i, s in enumerate(sets):
+        table.setdefault(s, i)
+    codes = []
+    for s in list(sets):
+        mapped = fn(s)
+        code = table.get(mapped)
+        if code is None:
+            code = table[mapped] = len(sets)
+            sets.append(mapped)
+        codes.append(code)
+    return np.asarray(codes, dtype=np.int32)
+
+
+class _ColumnsUpdate(object):
+
+    # the new label or tag codes of the selected items of columns, only applied with `apply`
+
+    def __init__(self, columns: BboxColumns, item_idxs: np.ndarray, kind: str, item_fn: Optional[SetFn], anno_fn: Optional[SetFn]):
+        self.columns = columns
+        self.changed = np.zeros(len(item_idxs), dtype=bool)
+        self._updates = []
+        if item_fn is not None:
+            codes, sets = columns.get_codes(kind, 'items')
+            old = codes[item_idxs]
+            new = _map_codes(sets, item_fn)[old]
+            self.changed |= (new != old)
+            self._updates.append((codes, item_idxs, new))
+        if anno_fn is not None:
+            codes, sets = columns.get_codes(kind, 'annotations')
+            starts, stops = columns.item_offsets[item_idxs], columns.item_offsets[item_idxs + 1]
+            rows = _ranges(starts, stops)
+            old = codes[rows]
+            new = _map_codes(sets, anno_fn)[old]
+            self.changed[np.repeat(np.arange(len(item_idxs)), stops - starts)[new != old]] = True
+            self._updates.append((codes, rows, new))
+
+    def build_index(self, item_idxs: np.ndarray, positions: np.ndarray) -> _DatasetIndex:
+        return _DatasetIndex().add_columns(0, self.columns, item_idxs, positions=positions)
+
+    def apply(self):
+        for codes, rows, new in self._updates:
+            codes[rows] = new
+        if self.changed.any():
+            _notify_columns_modified(self.columns)
+
+
+class _ObjectsUpdate(object):
+
+    # the new labels or tags of the selected items of a list of objects, only applied with `apply`
+
+    def __init__(self, items: List, item_idxs: np.ndarray, kind: str, item_fn: Optional[SetFn], anno_fn: Optional[SetFn]):
+        self.items = items
+        self.changed = np.zeros(len(item_idxs), dtype=bool)
+        self._updates = []
+        for i, idx in enumerate(item_idxs.tolist()):
+            item = items[idx]
+            if item_fn is not None:
+                old = getattr(item, kind)
+                new = item_fn(old)
+                if new != old:
+                    self._updates.append((item, new))
+                    self.changed[i] = True
+            if anno_fn is not None:
+                for anno in item.annotations:
+                    old = getattr(anno, kind)
+                    new = anno_fn(old)
+                    if new != old:
+                        self._updates.append((anno, new))
+                        self.changed[i] = True
+        self._kind = kind
+
+    def build_index(self, item_idxs: np.ndarray, positions: np.ndarray) -> _DatasetIndex:
+        index = _DatasetIndex()
+        for idx, pos in zip(item_idxs.tolist(), positions.tolist()):
+            index.add(pos, self.items[idx])
+        return index
+
+    def apply(self):
+        for obj, values in self._updates:
+            obj._set_strs(self._kind, values)
+
+
+def _update_dataset(dataset: Dataset, idxs: np.ndarray, kind: str, item_fn: Optional[SetFn], anno_fn: Optional[SetFn]) -> Dataset:
+    # labels & tags are changed in place. Indexes that are up to date remove the old entries of the
+    # changed items and add their new entries, all other indexes are rebuilt when next needed.
+    root = dataset._get_root()
+    root_idxs = dataset.indices[idxs] if isinstance(dataset, DatasetView) else idxs
+    if root.is_columnar:
+        update = _ColumnsUpdate(root.to_columns(), root_idxs, kind, item_fn, anno_fn)
+    else:
+        update = _ObjectsUpdate(root._items._item_objs, root_idxs, kind, item_fn, anno_fn)
+    # the root index uses positions in the storage, and the statistics of a view use positions in the view
+    generation = root._get_generation()
+    changed = np.flatnonzero(update.changed)
+    targets = [(root._index, root_idxs[changed])]
+    if dataset is not root:
+        targets.append((dataset._index, idxs[changed]))
+    targets = [(index, positions) for index, positions in targets if (index is not None) and (index.generation == generation)]
+    befores = [update.build_index(root_idxs[changed], positions) for _, positions in targets]
+    spatial = root._spatial_index if ((root._spatial_index is not None) and (root._spatial_index.generation == generation)) else None
+    update.apply()
+    # datasets that share the items, and the indexes that were already out of date, are rebuilt when next needed
+    generation = root._get_generation()
+    for (index, positions), before in zip(targets, befores):
+        index.subtract(before).merge(update.build_index(root_idxs[changed], positions))
+        index.generation = generation
+    # boxes are not affected by labels & tags
+    if spatial is not None:
+        spatial.generation = generation
+    return dataset
+
+
+# ========================================================================= #
+# Relabel & Retag                                                           #
+# ========================================================================= #
+
+
+def relabel_dataset(dataset: Dataset, label_map: StrMap, items: bool = True, annotations: bool = True) -> Dataset:
+    fn = _map_fn(_check_map(label_map, 'label'), 'labels')
+    _update_dataset(dataset, np.arange(len(dataset)), 'labels', fn if items else None, fn if annotations else None)
+    # the labels of the dataset are renamed too, the root of a view only gains the new labels
+    # since its other items can still have the old labels
+    root = dataset._get_root()
+    if root is not dataset:
+        root.labels = root.labels + tuple(label_map[v] for v in dataset.labels if label_map.get(v) is not None)
+    dataset.labels = fn(dataset.labels)
+    return dataset
+
+
+def retag_dataset(dataset: Dataset, tag_map: StrMap, items: bool = True, annotations: bool = True) -> Dataset:
+    fn = _map_fn(_check_map(tag_map, 'tag'), 'tags')
+    return _update_dataset(dataset, np.arange(len(dataset)), 'tags', fn if items else None, fn if annotations else None)
+
+
+def tag_dataset_items(dataset: Dataset, selection: Selection, tags: Union[str, Iterable[str]], remove: bool = False) -> Dataset:
+    tags = _intern_strs([tags] if isinstance(tags, str) else tags, 'tags')
+    fn = _remove_fn(tags, 'tags') if remove else _add_fn(tags, 'tags')
+    return _update_dataset(dataset, _select(dataset, selection), 'tags', fn, None)
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,236 @@
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from datasmith._annotations import Bbox
+from datasmith._annotations import bbox_area
+from datasmith._util import isinstance_cached
+
+
+# ========================================================================= #
+# Query Results                                                             #
+# ========================================================================= #
+
+
+# how boxes are matched against a query region:
+# - intersects: the box and the region overlap, including touching edges
+# - within:     the box is completely inside the region
+# - contains:   the box completely covers the region
+REGION_MODES = ('intersects', 'within', 'contains')
+
+
+class BboxQueryResult(NamedTuple):
+    # positions of the items in the queried dataset, and of the annotations in those items
+    item_idxs: np.ndarray
+    anno_idxs: np.ndarray
+    boxes: np.ndarray
+
+    @property
+    def num_matches(self) -> int:
+        return len(self.item_idxs)
+
+
+def _check_region(region: Sequence[float]) -> Tuple[float, float, float, float]:
+    try:
+        x0, y0, x1, y1 = (float(v) for v in region)
+    except (TypeError, ValueError):
+        raise TypeError(f'region must be a normalised (x0, y0, x1, y1), got type: {type(region)}, for: {repr(region)}')
+    if (x0 > x1) or (y0 > y1):
+        raise ValueError(f'region must have x0 <= x1 and y0 <= y1, got: {repr(region)}')
+    return x0, y0, x1, y1
+
+
+# ========================================================================= #
+# Hierarchical Grid Index                                                   #
+# ========================================================================= #
+
+
+class _GrowableArray(object):
+
+    # numpy array with amortised appends, only `data[:size]` is valid
+
+    def __init__(self, shape: Tuple[int, ...], dtype):
+        self._data = np.zeros((1024, *shape), dtype=dtype)
+        self.size = 0
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data[:self.size]
+
+    def extend(self, values: np.ndarray):
+        n = self.size + len(values)
+        if n > len(self._data):
+            data = np.zeros((max(n, 2 * len(self._data)), *self._data.shape[1:]), dtype=self._data.dtype)
+            data[:self.size] = self._data[:self.size]
+            self._data = data
+        self._data[self.size:n] = values
+        self.size = n
+
+
+class _BboxGridIndex(object):
+
+    # boxes are stored in a hierarchy of grids over the normalised image, level `L` has 2^L x 2^L cells.
+    # each box is placed in the cell that contains its (x0, y0) corner at the finest level where the
+    # cells are at least as large as the box, so a box can only reach into the neighbouring cells, and
+    # a query only needs to check the cells that overlap the region, and those just before them.
+    #
+    # within each level, boxes are sorted by cell so that each row of cells in a query region is a
+    # single contiguous slice. Boxes that were added since the levels were last sorted are checked
+    # directly, and are merged in once there are enough of them.
+
+    def __init__(self, generation: Optional[Tuple[int, int]] = None, max_level: int = 8):
+        # the generation of the dataset that the index was built at, see `Dataset._get_generation`
+        self.generation = generation
+        self.max_level = max_level
+        self.size = 0
+        # every box that was added, in order of the items and the annotations within them
+        self._coords = _GrowableArray((4,), np.float32)
+        self._item_idxs = _GrowableArray((), np.int64)
+        self._anno_idxs = _GrowableArray((), np.int32)
+        # the boxes `[0, num_sorted)` are in the sorted levels, the remaining boxes are pending
+        self._num_sorted = 0
+        self._levels: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._area_order: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._sorted_areas: np.ndarray = np.zeros(0, dtype=np.float32)
+
+    @property
+    def num_boxes(self) -> int:
+        return self._coords.size
+
+    # --- add --- #
+
+    def add_boxes(self, coords: np.ndarray, item_idxs: np.ndarray, anno_idxs: np.ndarray) -> '_BboxGridIndex':
+        self._coords.extend(np.asarray(coords, dtype=np.float32).reshape(-1, 4))
+        self._item_idxs.extend(np.asarray(item_idxs, dtype=np.int64))
+        self._anno_idxs.extend(np.asarray(anno_idxs, dtype=np.int32))
+        if len(item_idxs):
+            self.size = max(self.size, int(np.max(item_idxs)) + 1)
+        # sorting again is amortised over many appends
+        if self.num_boxes - self._num_sorted > max(4096, self._num_sorted // 8):
+            self._sort()
+        return self
+
+    def add(self, pos: int, item) -> '_BboxGridIndex':
+        coords, anno_idxs = [], []
+        for i, anno in enumerate(item.annotations):
+            bbox = anno.value
+            if isinstance_cached(bbox, Bbox):
+                coords.append((bbox.x0, bbox.y0, bbox.x1, bbox.y1))
+                anno_idxs.append(i)
+        self.size = max(self.size, pos + 1)
+        return self.add_boxes(np.asarray(coords, dtype=np.float32).reshape(-1, 4), np.full(len(coords), pos), anno_idxs)
+
+    def add_items(self, start: int, items: Iterable) -> '_BboxGridIndex':
+        for pos, item in enumerate(items, start=start):
+            self.add(pos, item)
+        return self
+
+    def add_columns(self, start: int, columns) -> '_BboxGridIndex':
+        item_idxs = columns.anno_item_idxs
+        self.size = max(self.size, start + columns.num_items)
+        return self.add_boxes(columns.coords, item_idxs + start, np.arange(columns.num_annotations) - columns.item_offsets[item_idxs])
+
+    # --- levels --- #
+
+    def _get_cells(self, coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # the level and cell of each box, the cell is the flat index `cy * 2^L + cx` within the level
+        size = np.maximum(coords[:, 2] - coords[:, 0], coords[:, 3] - coords[:, 1]).astype(np.float64)
+        with np.errstate(divide='ignore'):
+            levels = np.floor(-np.log2(np.maximum(size, 0))).clip(0, self.max_level).astype(np.int64)
+        # rounding errors could place a box at a level with cells that are slightly too small
+        levels -= (levels > 0) & (size > np.ldexp(1.0, -levels))
+        n = np.left_shift(1, levels)
+        cx = np.floor(coords[:, 0] * n).clip(0, n - 1).astype(np.int64)
+        cy = np.floor(coords[:, 1] * n).clip(0, n - 1).astype(np.int64)
+        return levels, cy * n + cx
+
+    def _sort(self):
+        coords = self._coords.data
+        levels, cells = self._get_cells(coords)
+        # sort by level, then by cell, then by row
+        order = np.lexsort((cells, levels))
+        bounds = np.searchsorted(levels[order], np.arange(self.max_level + 2))
+        self._levels = [(cells[order[a:b]], order[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        areas = bbox_area(coords)
+        self._area_order = np.argsort(areas, kind='stable')
+        self._sorted_areas = areas[self._area_order]
+        self._num_sorted = len(coords)
+
+    # --- query --- #
+
+    def _get_region_candidates(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        candidates = []
+        for level, (cells, rows) in enumerate(self._levels):
+            if not len(cells):
+                continue
+            n = 1 << level
+            # boxes are at most one cell wide, so boxes starting one cell before the region can reach into it
+            cx0, cx1 = (int(np.clip(np.floor(v * n), 0, n - 1)) for v in (x0 - 1 / n, x1))
+            cy0, cy1 = (int(np.clip(np.floor(v * n), 0, n - 1)) for v in (y0 - 1 / n, y1))
+            cys = np.arange(cy0, cy1 + 1) * n
+            starts = np.searchsorted(cells, cys + cx0, side='left')
+            stops = np.searchsorted(cells, cys + cx1, side='right')
+            candidates.extend(rows[a:b] for a, b in zip(starts.tolist(), stops.tolist()) if a < b)
+        # boxes that are not sorted yet are all candidates
+        candidates.append(np.arange(self._num_sorted, self.num_boxes))
+        return np.concatenate(candidates)
+
+    def _get_area_candidates(self, min_area: Optional[float], max_area: Optional[float]) -> np.ndarray:
+        a = 0 if (min_area is None) else np.searchsorted(self._sorted_areas, min_area, side='left')
+        b = len(self._sorted_areas) if (max_area is None) else np.searchsorted(self._sorted_areas, max_area, side='right')
+        return np.concatenate([self._area_order[a:b], np.arange(self._num_sorted, self.num_boxes)])
+
+    def query(
+        self,
+        region: Optional[Sequence[float]] = None,
+        mode: str = 'intersects',
+        min_area: Optional[float] = None,
+        max_area: Optional[float] = None,
+    ) -> np.ndarray:
+        # get the sorted rows of the boxes that satisfy all the constraints
+        if mode not in REGION_MODES:
+            raise KeyError(f'unsupported region mode: {repr(mode)}, must be one of: {REGION_MODES}')
+        coords = self._coords.data
+        # only the candidates need to be checked exactly, areas are used as
+        # candidates if there is no region, otherwise all the boxes are checked
+        if region is not None:
+            x0, y0, x1, y1 = _check_region(region)
+            rows = self._get_region_candidates(x0, y0, x1, y1)
+        elif (min_area is not None) or (max_area is not None):
+            rows = self._get_area_candidates(min_area, max_area)
+        else:
+            rows = np.arange(self.num_boxes)
+        # `np.take` is much faster than fancy indexing for gathering rows
+        c = np.take(coords, rows, axis=0)
+        keep = np.ones(len(rows), dtype=bool)
+        if region is not None:
+            if mode == 'intersects':
+                keep &= (c[:, 0] <= x1) & (c[:, 2] >= x0) & (c[:, 1] <= y1) & (c[:, 3] >= y0)
+            elif mode == 'within':
+                keep &= (c[:, 0] >= x0) & (c[:, 2] <= x1) & (c[:, 1] >= y0) & (c[:, 3] <= y1)
+            else:
+                keep &= (c[:, 0] <= x0) & (c[:, 2] >= x1) & (c[:, 1] <= y0) & (c[:, 3] >= y1)
+        if (min_area is not None) or (max_area is not None):
+            areas = bbox_area(c)
+            if min_area is not None:
+                keep &= areas >= np.float32(min_area)
+            if max_area is not None:
+                keep &= areas <= np.float32(max_area)
+        return np.sort(rows[keep])
+
+    def get_result(self, rows: np.ndarray) -> BboxQueryResult:
+        return BboxQueryResult(
+            item_idxs=self._item_idxs.data[rows],
+            anno_idxs=self._anno_idxs.data[rows].astype(np.int64),
+            boxes=np.take(self._coords.data, rows, axis=0),
+        )
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,176 @@
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from datasmith._base import Dataset
+from datasmith._base import DatasetItem
+from datasmith._base import DatasetView
+from datasmith._columnar import BboxColumns
+from datasmith._index import _ranges
+
+
+# ========================================================================= #
+# Label Matrix                                                              #
+# ========================================================================= #
+
+
+# what the splits are balanced by:
+# - annotation_labels: the number of annotations with each label
+# - item_labels:       the number of items with each label
+# - None:              only the number of items
+STRATIFY_MODES = ('annotation_labels', 'item_labels', None)
+
+
+def _expand_sets(codes: np.ndarray, sets: Sequence[Tuple[str, ...]], labels: dict) -> Tuple[np.ndarray, np.ndarray]:
+    # expand each label set code to the ids of its labels, returning the position of the code for each label
+    set_ids = [[labels.setdefault(label, len(labels)) for label in s] for s in sets]
+    sizes = np.asarray([len(ids) for ids in set_ids], dtype=np.int64)
+    offsets = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(sizes)])
+    flat = np.asarray([i for ids in set_ids for i in ids], dtype=np.int64)
+    counts = sizes[codes]
+    positions = np.repeat(np.arange(len(codes)), counts)
+    firsts = np.repeat(np.cumsum(counts) - counts, counts)
+    return positions, flat[np.repeat(offsets[codes], counts) + (np.arange(len(positions)) - firsts)]
+
+
+def _count_pairs(item_ids: np.ndarray, label_ids: np.ndarray, labels: dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    # labels are numbered in sorted order, so that the splits do not depend on how the dataset is stored
+    remap = np.zeros(max(len(labels), 1), dtype=np.int64)
+    remap[[labels[label] for label in sorted(labels)]] = np.arange(len(labels))
+    label_ids = remap[label_ids]
+    num_labels = max(len(labels), 1)
+    keys, counts = np.unique(item_ids * num_labels + label_ids, return_counts=True)
+    return keys // num_labels, keys % num_labels, counts, num_labels
+
+
+def _get_label_matrix(columns: BboxColumns, stratify: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    # sparse item x label count matrix as (item, label, count) triples sorted by item, and the number of labels
+    labels = {}
+    if stratify == 'annotation_labels':
+        rows, label_ids = _expand_sets(columns.anno_label_codes, columns.label_sets, labels)
+        item_ids = columns.anno_item_idxs[rows]
+    else:
+        item_ids, label_ids = _expand_sets(columns.item_label_codes, columns.label_sets, labels)
+    return _count_pairs(item_ids, label_ids, labels)
+
+
+def _get_items_label_matrix(items: Iterable[DatasetItem], stratify: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    # same as `_get_label_matrix`, for items of any type, which do not need to be converted to columns
+    labels, item_ids, label_ids = {}, [], []
+    for i, item in enumerate(items):
+        for label_set in ((anno.labels for anno in item.annotations) if (stratify == 'annotation_labels') else [item.labels]):
+            for label in label_set:
+                item_ids.append(i)
+                label_ids.append(labels.setdefault(label, len(labels)))
+    return _count_pairs(np.asarray(item_ids, dtype=np.int64), np.asarray(label_ids, dtype=np.int64), labels)
+
+
+# ========================================================================= #
+# Iterative Stratification                                                  #
+# ========================================================================= #
+
+
+def _get_ratios(ratios: Sequence[float]) -> np.ndarray:
+    r = np.asarray(ratios, dtype=np.float64).reshape(-1)
+    if (len(r) == 0) or np.any(~np.isfinite(r)) or np.any(r < 0) or (r.sum() <= 0):
+        raise ValueError(f'ratios must be non-negative with a positive sum, got: {repr(ratios)}')
+    return r / r.sum()
+
+
+def _allocate(weights: np.ndarray, quotas: np.ndarray) -> np.ndarray:
+    # split a sequence of weighted elements into consecutive runs with total weights matching
+    # the quotas, each element belongs to the run that contains the middle of its weight
+    bounds = np.cumsum(quotas) / quotas.sum() * weights.sum()
+    mids = np.cumsum(weights) - weights / 2
+    return np.minimum(np.searchsorted(bounds, mids, side='right'), len(quotas) - 1)
+
+
+def _check_stratify(stratify: Optional[str]):
+    if stratify not in STRATIFY_MODES:
+        raise KeyError(f'unsupported stratify mode: {repr(stratify)}, must be one of: {STRATIFY_MODES}')
+
+
+def split_positions(
+    columns: BboxColumns,
+    ratios: Sequence[float],
+    stratify: Optional[str] = 'annotation_labels',
+    seed: Optional[int] = 0,
+) -> List[np.ndarray]:
+    _check_stratify(stratify)
+    matrix = None if (stratify is None) else _get_label_matrix(columns, stratify)
+    return _split_matrix(columns.num_items, matrix, ratios, seed=seed)
+
+
+def _split_matrix(
+    n: int,
+    matrix: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, int]],
+    ratios: Sequence[float],
+    seed: Optional[int] = 0,
+) -> List[np.ndarray]:
+    # iterative stratification, Sechidis et al. 2011: the rarest remaining label is distributed first, so
+    # that rare labels are balanced before common labels fill the splits. Instead of assigning one item
+    # at a time, all the remaining items of a label are shuffled and split at once according to how many
+    # more of that label each split needs, then the needs of all the labels of those items are updated.
+    # Without a label matrix, only the number of items in each split is balanced.
+    ratios = _get_ratios(ratios)
+    rng = np.random.default_rng(seed)
+    assigned = np.full(n, -1, dtype=np.int64)
+    if matrix is not None:
+        item_ids, label_ids, counts, num_labels = matrix
+        item_ptr = np.searchsorted(item_ids, np.arange(n + 1))
+        # stable sorts of small integers use radix sort
+        by_label = np.argsort(label_ids.astype(np.uint16) if (num_labels <= (1 << 16)) else label_ids, kind='stable')
+        label_ptr = np.searchsorted(label_ids[by_label], np.arange(num_labels + 1))
+        # how many more of each label each split needs, and how many items with each label are not assigned
+        needed = ratios[:, None] * np.bincount(label_ids, weights=counts, minlength=num_labels)[None, :]
+        remaining = np.bincount(label_ids, minlength=num_labels)
+        while np.any(remaining > 0):
+            label = int(np.argmin(np.where(remaining > 0, remaining, np.iinfo(remaining.dtype).max)))
+            pairs = by_label[label_ptr[label]:label_ptr[label + 1]]
+            pairs = pairs[assigned[item_ids[pairs]] < 0]
+            pairs = pairs[rng.permutation(len(pairs))]
+            quotas = np.maximum(needed[:, label], 0)
+            splits = _allocate(counts[pairs].astype(np.float64), quotas if (quotas.sum() > 0) else ratios)
+            items = item_ids[pairs]
+            assigned[items] = splits
+            # update the needs of every label of the newly assigned items
+            rows = _ranges(item_ptr[items], item_ptr[items + 1])
+            row_splits, row_labels = np.repeat(splits, item_ptr[items + 1] - item_ptr[items]), label_ids[rows]
+            needed -= np.bincount(row_splits * num_labels + row_labels, weights=counts[rows], minlength=needed.size).reshape(needed.shape)
+            remaining -= np.bincount(row_labels, minlength=num_labels)
+    # items without labels fill up the number of items of each split
+    unassigned = np.flatnonzero(assigned < 0)
+    if len(unassigned):
+        quotas = np.maximum(ratios * n - np.bincount(assigned[assigned >= 0], minlength=len(ratios)), 0)
+        unassigned = unassigned[rng.permutation(len(unassigned))]
+        assigned[unassigned] = _allocate(np.ones(len(unassigned)), quotas if (quotas.sum() > 0) else ratios)
+    # positions of each split, in the order of the dataset
+    order = np.argsort(assigned.astype(np.uint16) if (len(ratios) <= (1 << 16)) else assigned, kind='stable')
+    bounds = np.searchsorted(assigned[order], np.arange(len(ratios) + 1))
+    return [order[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def split_dataset(
+    dataset: Dataset,
+    ratios: Sequence[float],
+    stratify: Optional[str] = 'annotation_labels',
+    seed: Optional[int] = 0,
+) -> List[DatasetView]:
+    # views share the storage of the dataset, nothing is copied. Only columnar datasets
+    # use their columns, other datasets may contain items that cannot be converted
+    if dataset.is_columnar:
+        positions = split_positions(dataset.to_columns(anno_uids=False), ratios, stratify=stratify, seed=seed)
+    else:
+        _check_stratify(stratify)
+        matrix = None if (stratify is None) else _get_items_label_matrix(dataset, stratify)
+        positions = _split_matrix(len(dataset), matrix, ratios, seed=seed)
+    return [DatasetView(dataset, idxs) for idxs in positions]
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
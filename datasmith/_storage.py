@@ -0,0 +1,179 @@
+import json
+import os
+import struct
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+from datasmith._columnar import BboxColumns
+
+
+# ========================================================================= #
+# Packed Strings                                                            #
+# ========================================================================= #
+
+
+class _PackedStrings(Sequence[str]):
+
+    # many strings stored as a single utf-8 blob, string `i` is the bytes `data[offsets[i]:offsets[i+1]]`
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+        if (offsets.ndim != 1) or (len(offsets) < 1) or (offsets[0] != 0) or (offsets[-1] != len(data)):
+            raise ValueError(f'offsets must start at 0 and end at the length of the data: {len(data)}')
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> '_PackedStrings':
+        if isinstance(strings, _PackedStrings):
+            return strings
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        n = len(self)
+        if not (-n <= idx < n):
+            raise IndexError(f'string index out of range: {idx}')
+        idx %= n
+        return self._data[self._offsets[idx]:self._offsets[idx + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        # decode everything at once instead of string by string
+        data, offsets = self._data.tobytes(), self._offsets.tolist()
+        for i in range(len(offsets) - 1):
+            yield data[offsets[i]:offsets[i + 1]].decode('utf-8')
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(num_strings={len(self)})'
+
+
+# ========================================================================= #
+# Dataset File Format                                                       #
+# ========================================================================= #
+
+
+# file layout:
+# - magic bytes
+# - header length as a little endian uint64
+# - utf-8 json header, with the dataset metadata and the dtype, shape and offset of each array
+# - raw arrays, each aligned to `_ALIGNMENT` bytes from the start of the file so that they can be memory mapped
+_MAGIC = b'DSMITH\x00\x00'
+_VERSION = 1
+_ALIGNMENT = 64
+
+_COLUMN_ARRAYS = ('coords', 'item_offsets', 'anno_label_codes', 'anno_tag_codes', 'item_label_codes', 'item_tag_codes')
+_COLUMN_STRINGS = ('item_paths', 'item_uids', 'anno_uids')
+_COLUMN_OPTIONAL_ARRAYS = ('item_wh',)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def save_columns(path: str, columns: BboxColumns, meta: Optional[Dict[str, Any]] = None) -> str:
+    # collect the arrays, strings are stored as a blob of bytes and their offsets
+    arrays: Dict[str, np.ndarray] = {k: getattr(columns, k) for k in _COLUMN_ARRAYS}
+    arrays.update({k: getattr(columns, k) for k in _COLUMN_OPTIONAL_ARRAYS if getattr(columns, k) is not None})
+    for k in _COLUMN_STRINGS:
+        strings = getattr(columns, k)
+        if strings is not None:
+            packed = _PackedStrings.from_strings(strings)
+            arrays[f'{k}.data'], arrays[f'{k}.offsets'] = packed.data, packed.offsets
+    # the header contains the position of each array, relative to the end of the header
+    specs, offset = {}, 0
+    for k, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        arrays[k] = arr
+        specs[k] = dict(dtype=arr.dtype.str, shape=list(arr.shape), offset=offset)
+        offset = _align(offset + arr.nbytes)
+    header = json.dumps(dict(
+        version=_VERSION,
+        meta=meta or {},
+        label_sets=[list(s) for s in columns.label_sets],
+        tag_sets=[list(s) for s in columns.tag_sets],
+        arrays=specs,
+    ), ensure_ascii=False).encode('utf-8')
+    # pad the header so that the arrays start aligned
+    start = _align(len(_MAGIC) + 8 + len(header))
+    header += b' ' * (start - len(_MAGIC) - 8 - len(header))
+    # write to a temporary file first, so that existing memory mapped copies are never modified
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    try:
+        with open(tmp_path, 'wb') as fp:
+            fp.write(_MAGIC)
+            fp.write(struct.pack('<Q', len(header)))
+            fp.write(header)
+            for k, arr in arrays.items():
+                fp.seek(start + specs[k]['offset'])
+                fp.write(arr.data)
+            fp.truncate(start + offset)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def load_columns(path: str, mmap: bool = True) -> Tuple[BboxColumns, Dict[str, Any]]:
+    # read the header
+    with open(path, 'rb') as fp:
+        magic = fp.read(len(_MAGIC))
+        if magic != _MAGIC:
+            raise ValueError(f'not a dataset file, invalid magic bytes: {repr(magic)}, for: {repr(path)}')
+        (header_len,) = struct.unpack('<Q', fp.read(8))
+        header = json.loads(fp.read(header_len).decode('utf-8'))
+    if header['version'] != _VERSION:
+        raise ValueError(f'unsupported dataset file version: {repr(header["version"])}, expected: {_VERSION}, for: {repr(path)}')
+    start = len(_MAGIC) + 8 + header_len
+    # memory mapped arrays are copy-on-write, so modifications are never written back to the file,
+    # and pages are shared between processes until they are modified
+    if mmap:
+        buf = np.memmap(path, dtype=np.uint8, mode='c')
+    else:
+        buf = np.fromfile(path, dtype=np.uint8)
+    arrays = {}
+    for k, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        offset = start + spec['offset']
+        size = int(np.prod(spec['shape'], dtype=np.int64)) * dtype.itemsize
+        arrays[k] = buf[offset:offset + size].view(dtype).reshape(spec['shape'])
+    strings = {
+        k: _PackedStrings(arrays[f'{k}.data'], arrays[f'{k}.offsets']) if (f'{k}.data' in arrays) else None
+        for k in _COLUMN_STRINGS
+    }
+    columns = BboxColumns(
+        label_sets=[tuple(s) for s in header['label_sets']],
+        tag_sets=[tuple(s) for s in header['tag_sets']],
+        **{k: arrays[k] for k in _COLUMN_ARRAYS},
+        **{k: arrays.get(k) for k in _COLUMN_OPTIONAL_ARRAYS},
+        **strings,
+    )
+    return columns, header['meta']
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
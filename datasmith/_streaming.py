@@ -0,0 +1,166 @@
+import codecs
+import json
+import re
+from typing import Any
+from typing import BinaryIO
+from typing import Iterator
+from typing import Tuple
+
+
+# ========================================================================= #
+# Incremental JSON Reader                                                   #
+# ========================================================================= #
+
+
+_RGX_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_RGX_SEPARATOR = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+
+
+def _byte_len(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+class JsonStreamReader(object):
+
+    def __init__(self, fp: BinaryIO, chunk_size: int = 1 << 20):
+        if chunk_size <= 0:
+            raise ValueError(f'chunk_size must be > 0, got: {repr(chunk_size)}')
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        # the text buffer, and the position of the read head in the buffer
+        self._buf: str = ''
+        self._pos: int = 0
+        # the byte offset in the underlying file of the position `_offset_pos` in the buffer,
+        # which is only moved up to the read head when the offset is needed
+        self._offset: int = 0
+        self._offset_pos: int = 0
+        self._eof: bool = False
+
+    @property
+    def offset(self) -> int:
+        self._sync_offset()
+        return self._offset
+
+    def _sync_offset(self):
+        if self._offset_pos != self._pos:
+            self._offset += _byte_len(self._buf[self._offset_pos:self._pos])
+            self._offset_pos = self._pos
+
+    # --- buffer --- #
+
+    def _read_more(self, min_size: int = 0) -> bool:
+        if self._eof:
+            return False
+        # drop the consumed part of the buffer
+        if self._pos:
+            self._sync_offset()
+            self._buf = self._buf[self._pos:]
+            self._pos = self._offset_pos = 0
+        # read the next chunk, decoding any partial utf-8 sequences once complete
+        chunk = self._fp.read(max(self._chunk_size, min_size))
+        self._eof = not chunk
+        self._buf += self._decoder.decode(chunk, final=self._eof)
+        return True
+
+    def _peek(self) -> str:
+        # skip whitespace and return the next character, or an empty string at the end of the file
+        while True:
+            self._pos = _RGX_WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read_more():
+                return ''
+
+    def _expect(self, chars: str) -> str:
+        c = self._peek()
+        if (not c) or (c not in chars):
+            raise ValueError(f'expected one of: {repr(chars)} at byte offset: {self.offset}, got: {repr(c)}')
+        self._pos += 1
+        return c
+
+    # --- values --- #
+
+    def _decode_value(self) -> Any:
+        # decode the next complete value, moving the read head to its end
+        self._peek()
+        while True:
+            try:
+                obj, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # the value may be incomplete, grow the buffer geometrically so that large values stay linear
+                if self._read_more(min_size=len(self._buf) - self._pos):
+                    continue
+                raise
+            # values ending exactly at the end of the buffer may be truncated, eg. numbers
+            if (end >= len(self._buf)) and self._read_more(min_size=len(self._buf) - self._pos):
+                continue
+            self._pos = end
+            return obj
+
+    def read_value(self) -> Tuple[Any, int, int]:
+        # decode the next complete value, returning it along with its byte offset and byte length
+        self._peek()
+        start = self.offset
+        obj = self._decode_value()
+        return obj, start, self.offset - start
+
+    def iter_array(self) -> Iterator[Tuple[Any, int, int]]:
+        # yield each element of the array at the read head, without decoding the whole array
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self._expect(',]') == ']':
+                return
+
+    def iter_array_values(self) -> Iterator[Any]:
+        # the same as `iter_array` without the byte offsets of the elements, which is faster since
+        # each element and the separator after it are matched directly in the buffer. Elements that
+        # are not followed by the start of the next element in the buffer are read the usual way.
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        decode = self._json.raw_decode
+        while True:
+            try:
+                obj, end = decode(self._buf, self._pos)
+                m = _RGX_SEPARATOR.match(self._buf, end)
+            except json.JSONDecodeError:
+                m = None
+            if (m is None) or (m.end() >= len(self._buf)):
+                yield self._decode_value()
+                if self._expect(',]') == ']':
+                    return
+                # decoding errors are slow to create, so the next element must not start with whitespace
+                self._peek()
+                continue
+            self._pos = m.end()
+            yield obj
+            if m.group(1) == ']':
+                return
+
+    def iter_object_keys(self) -> Iterator[str]:
+        # yield each key of the object at the read head, the caller
+        # MUST consume the corresponding value before continuing iteration
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key, _, _ = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f'object keys must be strings, got type: {type(key)}, for: {repr(key)}')
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -1,3 +1,7 @@
+from abc import get_cache_token
+from typing import Dict
+from typing import Tuple
+
 
 
 # ========================================================================= #
@@ -5,6 +9,30 @@
 # ========================================================================= #
 
 
+# the results are only valid until a class is registered with `ABCMeta.register`,
+# which changes the abc cache token, and the number of cached types is bounded
+_ISINSTANCE_CACHE: Dict[Tuple[type, type], bool] = {}
+_ISINSTANCE_CACHE_TOKEN = get_cache_token()
+_ISINSTANCE_CACHE_SIZE = 1024
+
+
+def isinstance_cached(obj, cls: type) -> bool:
+    # `isinstance` checks against classes that use `ABCMeta` are much slower than
+    # for normal classes, so cache the result per type.
+    global _ISINSTANCE_CACHE_TOKEN
+    key = (type(obj), cls)
+    token = get_cache_token()
+    if token == _ISINSTANCE_CACHE_TOKEN:
+        result = _ISINSTANCE_CACHE.get(key)
+        if result is not None:
+            return result
+    if (token != _ISINSTANCE_CACHE_TOKEN) or (len(_ISINSTANCE_CACHE) >= _ISINSTANCE_CACHE_SIZE):
+        _ISINSTANCE_CACHE.clear()
+        _ISINSTANCE_CACHE_TOKEN = token
+    result = _ISINSTANCE_CACHE[key] = isinstance(obj, cls)
+    return result
+
+
 def repr_truelike_kwargs_no_uid(_obj_, **kwargs):
     kwargs.pop('uid', None)
     return f'{_obj_.__class__.__name__}({", ".join(f"{k}={repr(v)}" for k, v in kwargs.items() if v)})'
@@ -0,0 +1,237 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+import warnings
+
+import numpy as np
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import BboxBoundsError
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+from datasmith import bbox_area
+from datasmith import bbox_intersection
+from datasmith import bbox_iou
+from datasmith import bbox_pairwise_intersection
+from datasmith import bbox_pairwise_iou
+from datasmith import bbox_validation
+from datasmith import find_duplicate_bboxes
+from datasmith import get_bbox_validation
+from datasmith import pop_bbox_violations
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+BOXES_XYWH = np.array([
+    [10, 20, 30, 40],
+    [0, 0, 100, 50],
+    [50.5, 25.25, 10, 5],
+])
+
+IMAGES_WH = np.array([
+    [100, 100],
+    [100, 50],
+    [200, 100],
+])
+
+
+@pytest.mark.filterwarnings(r'ignore:not \(0 <=')
+@pytest.mark.parametrize('fmt', ['xyxy', 'xywh', 'cxywh'])
+@pytest.mark.parametrize('image_wh', [None, (100, 50), IMAGES_WH])
+def test_bbox_batch_conversions(fmt, image_wh):
+    # compare against the single box conversions
+    rows_wh = [None] * 3 if image_wh is None else ([image_wh] * 3 if isinstance(image_wh, tuple) else [tuple(wh) for wh in image_wh])
+    boxes = [getattr(Bbox, f'from_{fmt}')(*box, image_wh=wh) for box, wh in zip(BOXES_XYWH.tolist(), rows_wh)]
+    xyxy = Bbox.batch_from(fmt, BOXES_XYWH, image_wh=image_wh)
+    assert xyxy.shape == (3, 4)
+    assert np.allclose(xyxy, [bbox.get_xyxy() for bbox in boxes])
+    # convert back
+    for get_fmt in ['xyxy', 'xywh', 'cxywh']:
+        expected = [getattr(bbox, f'get_{get_fmt}')(image_wh=wh) for bbox, wh in zip(boxes, rows_wh)]
+        assert np.allclose(Bbox.batch_get(get_fmt, xyxy, image_wh=image_wh), expected)
+    assert np.allclose(Bbox.batch_get(fmt, xyxy, image_wh=image_wh), BOXES_XYWH)
+
+
+def test_bbox_batch_invalid():
+    with pytest.raises(KeyError):
+        Bbox.batch_from('yolo', BOXES_XYWH)
+    with pytest.raises(ValueError):
+        Bbox.batch_from_xywh(BOXES_XYWH[:, :3])
+    with pytest.raises(ValueError):
+        Bbox.batch_get_xywh(BOXES_XYWH, image_wh=IMAGES_WH[:, :1])
+
+
+def test_dataset_boxes():
+    items = [
+        DatasetItemPath('a.jpg', annotations=[Annotation(Bbox(0.0, 0.0, 0.5, 0.5)), Annotation(Bbox(0.5, 0.5, 1.0, 1.0))]),
+        DatasetItemPath('b.jpg'),
+        DatasetItemPath('c.jpg', annotations=[Annotation(Bbox(0.25, 0.25, 0.75, 0.75))]),
+    ]
+    for dataset in [Dataset(items), Dataset.from_columns(Dataset(items).to_columns())]:
+        assert dataset.boxes().tolist() == [[0.0, 0.0, 0.5, 0.5], [0.5, 0.5, 1.0, 1.0], [0.25, 0.25, 0.75, 0.75]]
+        assert dataset.boxes('cxywh').tolist() == [[0.25, 0.25, 0.5, 0.5], [0.75, 0.75, 0.5, 0.5], [0.5, 0.5, 0.5, 0.5]]
+        assert dataset.boxes('xywh', normalized=False, image_wh=[[10, 20], [10, 20], [100, 100]]).tolist() == [[0, 0, 5, 10], [5, 10, 5, 10], [25, 25, 50, 50]]
+        with pytest.raises(ValueError):
+            dataset.boxes(normalized=False)
+    # per item sizes can be expanded to per box sizes
+    columns = Dataset(items).to_columns()
+    assert columns.anno_item_idxs.tolist() == [0, 0, 2]
+
+
+def test_bbox_validation_modes():
+    assert get_bbox_validation() == 'warn'
+    with pytest.warns(UserWarning):
+        Bbox(0.5, 0.0, 0.25, 1.0)
+    with bbox_validation('off'), warnings.catch_warnings():
+        warnings.simplefilter('error')
+        Bbox(0.5, 0.0, 0.25, 1.0)
+    with bbox_validation('raise'):
+        Bbox(0.0, 0.0, 1.0, 1.0)
+        with pytest.raises(BboxBoundsError):
+            Bbox(0.0, 0.0, 1.0, 1.5)
+    with bbox_validation('collect'):
+        bbox = Bbox(-1, 0, 1, 1)
+        Bbox(0, 0, 1, 1)
+        assert pop_bbox_violations() == [bbox]
+        assert pop_bbox_violations() == []
+    with bbox_validation('warn-once'):
+        with pytest.warns(UserWarning) as record:
+            Bbox(-1, 0, 1, 1)
+            Bbox(-1, 0, 1, 1)
+        assert len(record) == 1
+    assert get_bbox_validation() == 'warn'
+    with pytest.raises(KeyError):
+        bbox_validation('maybe').__enter__()
+
+
+def _make_invalid_items():
+    with bbox_validation('off'):
+        return [
+            DatasetItemPath('a.jpg', uid='a', annotations=[Annotation(Bbox(0.0, 0.0, 0.5, 0.5), uid='a0'), Annotation(Bbox(-0.5, 0.0, 1.5, 0.5), uid='a1')]),
+            DatasetItemPath('b.jpg', uid='b', annotations=[Annotation(Bbox(0.75, 0.0, 0.25, 0.5), uid='b0')]),
+        ]
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+@pytest.mark.parametrize('view', [False, True])
+def test_dataset_check_bounds(columnar, view):
+    dataset = Dataset(_make_invalid_items())
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns(anno_uids=False))
+    if view:
+        dataset = dataset[:]
+    report = dataset.check_bounds()
+    assert report.num_checked == 3
+    assert report.num_invalid == 2
+    assert report.item_uids == ['a', 'b']
+    assert report.anno_uids == (['a:1', 'b:0'] if columnar else ['a1', 'b0'])
+    assert report.boxes.tolist() == [[-0.5, 0.0, 1.5, 0.5], [0.75, 0.0, 0.25, 0.5]]
+    # clipping repairs out of range boxes, but not inverted boxes
+    dataset.check_bounds(clip=True)
+    assert dataset['a'].annotations[1].value.get_xyxy() == (0.0, 0.0, 1.0, 0.5)
+    assert dataset.check_bounds().item_uids == ['b']
+
+
+def test_bbox_geometry():
+    a = np.array([[0.0, 0.0, 0.5, 0.5], [0.5, 0.5, 1.0, 1.0], [0.2, 0.2, 0.1, 0.1]])
+    b = np.array([[0.25, 0.25, 0.75, 0.75], [0.0, 0.0, 0.5, 0.5]])
+    assert np.allclose(bbox_area(a), [0.25, 0.25, 0])
+    assert np.allclose(bbox_intersection(a[:2], b), [0.0625, 0])
+    assert np.allclose(bbox_pairwise_intersection(a, b), [[0.0625, 0.25], [0.0625, 0], [0, 0]])
+    assert np.allclose(bbox_pairwise_iou(a, b), [[1/7, 1], [1/7, 0], [0, 0]])
+    # broadcasting, and empty boxes have an iou of 0
+    assert np.allclose(bbox_iou(a, b[1]), [1, 0, 0])
+    assert bbox_iou(a[2], a[2]) == 0
+    assert bbox_pairwise_iou(np.zeros((0, 4)), b).shape == (0, 2)
+    with pytest.raises(ValueError):
+        bbox_iou(a[:, :3], b)
+
+
+def _naive_duplicate_bboxes(columns, iou_threshold, per_label):
+    duplicates = np.zeros(columns.num_annotations, dtype=bool)
+    for i in range(columns.num_items):
+        s = columns.item_slice(i)
+        kept = []
+        for j in range(s.start, s.stop):
+            for k in kept:
+                if (not per_label or columns.anno_label_codes[j] == columns.anno_label_codes[k]) and (bbox_iou(columns.coords[j], columns.coords[k]) >= iou_threshold):
+                    duplicates[j] = True
+                    break
+            else:
+                kept.append(j)
+    return duplicates
+
+
+@pytest.mark.parametrize('per_label', [False, True])
+@pytest.mark.parametrize('max_pairs', [1, 7, 1 << 22])
+def test_find_duplicate_bboxes(per_label, max_pairs):
+    rng = np.random.default_rng(42)
+    # clusters of overlapping boxes, so that suppressed boxes do not suppress others
+    items = []
+    for i in range(50):
+        annotations = []
+        for _ in range(rng.integers(0, 20)):
+            x, y = rng.choice([0.1, 0.4, 0.6]) + rng.uniform(0, 0.1, size=2)
+            annotations.append(Annotation(Bbox(x, y, x + 0.2, y + 0.2), labels=[str(rng.integers(0, 2))]))
+        items.append(DatasetItemPath(f'{i}.jpg', annotations=annotations))
+    columns = Dataset(items).to_columns()
+    duplicates = find_duplicate_bboxes(columns, iou_threshold=0.5, per_label=per_label, max_pairs=max_pairs)
+    assert 0 < duplicates.sum() < columns.num_annotations
+    assert duplicates.tolist() == _naive_duplicate_bboxes(columns, 0.5, per_label).tolist()
+    with pytest.raises(ValueError):
+        find_duplicate_bboxes(columns, iou_threshold=0)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_dataset_dedupe_boxes(columnar):
+    dataset = Dataset([
+        DatasetItemPath('a.jpg', uid='a', annotations=[
+            Annotation(Bbox(0.0, 0.0, 0.5, 0.5), labels=['cat'], uid='a0'),
+            Annotation(Bbox(0.0, 0.0, 0.5, 0.49), labels=['dog'], uid='a1'),
+            Annotation(Bbox(0.01, 0.0, 0.5, 0.5), labels=['cat'], uid='a2'),
+            Annotation(Bbox(0.5, 0.5, 1.0, 1.0), labels=['cat'], uid='a3'),
+        ], image_wh=(10, 10)),
+        DatasetItemPath('b.jpg', uid='b', annotations=[Annotation(Bbox(0.0, 0.0, 0.5, 0.5), labels=['cat'], uid='b0')]),
+    ], labels=['cat', 'dog'], name='boxes')
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns(anno_uids=False), labels=dataset.labels, name=dataset.name)
+    deduped = dataset.dedupe_boxes(iou_threshold=0.9)
+    assert (deduped.is_columnar, deduped.name, deduped.labels) == (columnar, 'boxes', ('cat', 'dog'))
+    # uids are kept, even if derived from the position of the annotation
+    assert [anno.uid for anno in deduped['a'].annotations] == (['a:0', 'a:1', 'a:3'] if columnar else ['a0', 'a1', 'a3'])
+    assert [anno.uid for anno in deduped['b'].annotations] == (['b:0'] if columnar else ['b0'])
+    assert deduped['a'].image_wh == (10, 10)
+    assert [anno.uid for anno in dataset.dedupe_boxes(iou_threshold=0.9, per_label=False)['a'].annotations] == (['a:0', 'a:3'] if columnar else ['a0', 'a3'])
+    assert len(dataset.to_columns().coords) == 5
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,410 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+import random
+from abc import ABCMeta
+from collections import Counter
+
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import Dataset
+from datasmith import DatasetItem
+from datasmith import DatasetItemPath
+from datasmith import DatasetLabelNotFoundError
+from datasmith import DatasetView
+from datasmith import get_uid_strategy
+from datasmith import make_source_uid
+from datasmith import uid_strategy
+from datasmith._util import isinstance_cached
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+def test_uid_strategies():
+    assert get_uid_strategy() == 'uuid4'
+    assert len(DatasetItemPath('a.jpg').uid) == 36
+    # counters
+    with uid_strategy('counter'):
+        a, b = DatasetItemPath('a.jpg'), DatasetItemPath('b.jpg')
+        assert a.uid.startswith('#') and b.uid.startswith('#')
+        assert int(b.uid[1:]) == int(a.uid[1:]) + 1
+    # lazy uids are only generated on access, but remain stable
+    with uid_strategy('lazy'):
+        item = DatasetItemPath('a.jpg')
+        assert item._uid is None
+        assert item.uid == item.uid
+        assert DatasetItemPath('a.jpg', uid='given').uid == 'given'
+        # lists of objects with lazy uids do not generate them until they are looked up
+        items = [DatasetItemPath(f'{i}.jpg', annotations=[Annotation(Bbox(0, 0, 1, 1))]) for i in range(5)]
+        dataset = Dataset(items[:2])
+        dataset.extend(items[2:4])
+        dataset.append(items[4])
+        dataset.append(DatasetItemPath('given.jpg', uid='given'))
+        assert len(dataset) == 6 and dataset['given'].path == 'given.jpg'
+        assert all(item._uid is None and item.annotations[0]._uid is None for item in items)
+        assert dataset[items[3].uid] is items[3]
+        assert [item._uid is None for item in items] == [True, True, True, False, True]
+        assert items[1].uid in dataset and 'missing' not in dataset
+        with pytest.raises(KeyError):
+            dataset.append(DatasetItemPath('copy.jpg', uid=items[1].uid))
+        with pytest.raises(KeyError):
+            dataset['missing']
+        # columnar datasets store every uid
+        columnar = Dataset.from_columns(Dataset().to_columns())
+        columnar.extend([DatasetItemPath(f'{i}.jpg') for i in range(3)])
+        assert [columnar[item.uid].path for item in columnar] == ['0.jpg', '1.jpg', '2.jpg']
+    # custom
+    with uid_strategy(lambda: 'custom'):
+        assert Annotation(Bbox(0, 0, 1, 1)).uid == 'custom'
+    with uid_strategy(lambda: 1):
+        with pytest.raises(TypeError):
+            DatasetItemPath('a.jpg')
+    with pytest.raises(KeyError):
+        uid_strategy('random').__enter__()
+    assert get_uid_strategy() == 'uuid4'
+
+
+class _CountingList(list):
+    # counts the items that are read by position
+    reads = 0
+
+    def __getitem__(self, i):
+        self.reads += 1
+        return super().__getitem__(i)
+
+
+def test_lazy_uid_lookups():
+    with uid_strategy('lazy'):
+        items = [DatasetItemPath(f'{i}.jpg') for i in range(100)]
+    dataset = Dataset(items)
+    dataset._items._item_objs = _CountingList(dataset._items._item_objs)
+    # the items with lazy uids are only checked again once a lazy uid is generated
+    dataset.append(DatasetItemPath('a.jpg', uid='a'))
+    assert 'missing' not in dataset
+    reads = dataset._items._item_objs.reads
+    for i in range(100):
+        dataset.append(DatasetItemPath('b.jpg', uid=f'b{i}'))
+        assert f'missing{i}' not in dataset
+    assert dataset._items._item_objs.reads == reads
+    # newly generated uids are still found, and cannot be repeated
+    uid = items[50].uid
+    assert dataset[uid] is items[50]
+    with pytest.raises(KeyError):
+        dataset.append(DatasetItemPath('c.jpg', uid=items[50].uid))
+    assert items[0]._uid is None
+
+
+def test_uid_strategy_dataset():
+    with uid_strategy('counter'):
+        dataset = Dataset([DatasetItemPath(f'{i}.jpg') for i in range(10)])
+    assert len(dataset) == 10
+    assert len({item.uid for item in dataset}) == 10
+
+
+def test_make_source_uid():
+    assert make_source_uid('coco', 'image', 1) == make_source_uid('coco', 'image', 1)
+    assert make_source_uid('coco', 'image', 1) != make_source_uid('coco', 'annotation', 1)
+    assert make_source_uid('coco', 'image', 1) != make_source_uid('coco', 'image', 2)
+    assert len(make_source_uid('coco', 'image', 1)) == 16
+
+
+def _make_random_items(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    labels, tags = ['fire', 'smoke', 'person'], ['occluded', 'truncated']
+    sample = lambda values: rng.sample(values, rng.randint(0, len(values)))
+    return [
+        DatasetItemPath(f'{i}.jpg', labels=sample(labels), tags=sample(tags), annotations=[
+            Annotation(Bbox(0, 0, 1, 1), labels=sample(labels), tags=sample(tags))
+            for _ in range(rng.randint(0, 3))
+        ])
+        for i in range(n)
+    ]
+
+
+def _filter_items_naive(dataset, item_fn=None, item_labels=(), item_tags=(), anno_fn=None, anno_labels=(), anno_tags=()):
+    item_ok = lambda it: (not item_fn or item_fn(it)) and set(item_labels).issubset(it.labels) and set(item_tags).issubset(it.tags)
+    anno_ok = lambda a: (not anno_fn or anno_fn(a)) and set(anno_labels).issubset(a.labels) and set(anno_tags).issubset(a.tags)
+    return [item.uid for item in dataset if item_ok(item) and all(anno_ok(a) for a in item.annotations)]
+
+
+FILTERS = [
+    dict(),
+    dict(item_labels=['fire']),
+    dict(item_labels=['fire', 'smoke'], item_tags=['occluded']),
+    dict(item_labels=['unknown']),
+    dict(anno_labels=['smoke']),
+    dict(anno_labels=['smoke'], anno_tags=['truncated'], item_tags=['occluded']),
+    dict(anno_labels=['fire'], item_fn=lambda it: len(it.annotations) > 1),
+    dict(anno_fn=lambda a: 'person' not in a.labels, item_labels=['person']),
+]
+
+
+@pytest.mark.parametrize('kwargs', FILTERS)
+@pytest.mark.parametrize('columnar', [False, True])
+def test_filter_items(kwargs, columnar):
+    dataset = Dataset(_make_random_items(200), name='random')
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns(), name='random')
+    filtered = dataset.filter_items(**kwargs)
+    assert [item.uid for item in filtered] == _filter_items_naive(dataset, **kwargs)
+    assert filtered.name == 'random'
+
+
+def test_filter_items_index_updates():
+    items = _make_random_items(300)
+    dataset = Dataset(items[:100])
+    # build the index, then make sure that it is kept up to date
+    assert [item.uid for item in dataset.filter_items(anno_labels=['fire'])] == _filter_items_naive(dataset, anno_labels=['fire'])
+    dataset.append(items[100])
+    dataset.extend(items[101:200])
+    with pytest.raises(KeyError):
+        dataset.extend(items[200:250] + items[:1])
+    assert len(dataset) == 250
+    for kwargs in FILTERS:
+        assert [item.uid for item in dataset.filter_items(**kwargs)] == _filter_items_naive(dataset, **kwargs)
+    # modifying annotations of items in the dataset invalidates the index
+    item = dataset.filter_items(anno_labels=['fire'])[0]
+    item.annotations.append(Annotation(Bbox(0, 0, 1, 1), labels=['smoke']))
+    assert item.uid not in [it.uid for it in dataset.filter_items(anno_labels=['fire'])]
+    assert [it.uid for it in dataset.filter_items(anno_labels=['fire'])] == _filter_items_naive(dataset, anno_labels=['fire'])
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_index_invalidation_scope(columnar):
+    make = lambda items: Dataset.from_columns(Dataset(items).to_columns()) if columnar else Dataset(items)
+    a, b = make(_make_random_items(20)), make(_make_random_items(20))
+    view = a[5:15]
+    index_a, index_b, stats = a._get_index(), b._get_index(), view._get_stats()
+    # modifying the items of one dataset only invalidates the indexes of that dataset and its views
+    a[7].labels = ['modified']
+    assert b._get_index() is index_b
+    assert (a._get_index() is not index_a) and (view._get_stats() is not stats)
+    assert a.label_counts(of='items')['modified'] == 1 and view.label_counts(of='items')['modified'] == 1
+    index_a = a._get_index()
+    next(anno for item in a for anno in item.annotations).labels = ['modified']
+    assert (b._get_index() is index_b) and (a._get_index() is not index_a)
+    assert a.label_counts()['modified'] == 1
+    # relabelling keeps the index of the dataset up to date, instead of rebuilding it
+    index_a = a._get_index()
+    a.relabel({'modified': 'relabelled'})
+    assert (a._get_index() is index_a) and (b._get_index() is index_b)
+    assert a.label_counts(of='items')['relabelled'] == 1 and a.label_counts()['relabelled'] == 1
+    # items that are shared by datasets invalidate the indexes of every dataset
+    if not columnar:
+        shared = Dataset(list(a))
+        index_shared = shared._get_index()
+        a[0].labels = ['shared']
+        assert (shared._get_index() is not index_shared) and (shared.label_counts(of='items')['shared'] == 1)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_dataset_extend(columnar):
+    items = _make_random_items(30)
+    make = lambda: Dataset.from_columns(Dataset(items[:5]).to_columns()) if columnar else Dataset(items[:5])
+    # valid batches are added at once
+    dataset = make()
+    dataset.extend(iter(items[5:10]))
+    assert [item.uid for item in dataset] == [item.uid for item in items[:10]]
+    assert dataset[items[7].uid].uid == items[7].uid
+    # invalid batches add the same items as appending them one at a time would
+    for bad, error in [(items[12], KeyError), (items[2], KeyError), (Annotation(Bbox(0, 0, 1, 1)), TypeError)]:
+        dataset = make()
+        with pytest.raises(error):
+            dataset.extend(items[10:15] + [bad] + items[15:20])
+        assert [item.uid for item in dataset] == [item.uid for item in items[:5] + items[10:15]]
+    # the types of trusted items are not checked, but their uids still are
+    dataset = make()
+    dataset.extend(items[5:], trusted=True)
+    assert [item.uid for item in dataset] == [item.uid for item in items]
+    assert all(dataset[item.uid].uid == item.uid for item in items)
+    dataset = make()
+    with pytest.raises(KeyError):
+        dataset.extend(items[10:15] + items[2:3], trusted=True)
+    assert [item.uid for item in dataset] == [item.uid for item in items[:5] + items[10:15]]
+
+
+def test_annotations_extend():
+    annotations = [Annotation(Bbox(0, 0, 1, 1), uid=str(i)) for i in range(5)]
+    item = DatasetItemPath('a.jpg', annotations=annotations[:3])
+    assert [anno.uid for anno in item.annotations] == ['0', '1', '2']
+    with pytest.raises(KeyError):
+        DatasetItemPath('a.jpg', annotations=annotations + annotations[:1])
+    with pytest.raises(TypeError):
+        DatasetItemPath('a.jpg', annotations=[annotations[0], Bbox(0, 0, 1, 1)])
+    with pytest.raises(KeyError):
+        item.annotations.extend(annotations[3:] + annotations[:1])
+    assert [anno.uid for anno in item.annotations] == ['0', '1', '2', '3', '4']
+    assert item.annotations['4'] is annotations[4]
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_dataset_views(columnar):
+    dataset = Dataset(_make_random_items(20), name='random')
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns(), name='random')
+    uids = [item.uid for item in dataset]
+    # slices
+    view = dataset[5:15]
+    assert isinstance(view, DatasetView)
+    assert view.parent is dataset
+    assert view.name == 'random'
+    assert [item.uid for item in view] == uids[5:15]
+    assert view[0].uid == uids[5] and view[-1].uid == uids[14]
+    assert view[uids[7]].uid == uids[7]
+    assert uids[7] in view and uids[0] not in view
+    with pytest.raises(KeyError):
+        view[uids[0]]
+    with pytest.raises(IndexError):
+        view[10]
+    # chained views reference the root dataset
+    chained = view[::2][[1, uids[9], -1]]
+    assert chained.parent is dataset
+    assert chained.indices.tolist() == [7, 9, 13]
+    assert [item.uid for item in chained] == [uids[7], uids[9], uids[13]]
+    with pytest.raises(KeyError):
+        dataset[[0, uids[0]]]
+    # filters of views keep the order of the view
+    reordered = dataset[[3, 1, 2, 0, 19]]
+    filtered = reordered.filter_items(item_fn=lambda it: it.uid != uids[2])
+    assert filtered.parent is dataset
+    assert [item.uid for item in filtered] == [uids[3], uids[1], uids[0], uids[19]]
+    assert [item.uid for item in reordered.filter_items(item_labels=['fire'])] == [uid for uid in [uids[3], uids[1], uids[2], uids[0], uids[19]] if 'fire' in dataset[uid].labels]
+    # views share storage, and are read-only
+    assert dataset[[4]][0].path == dataset[4].path
+    with pytest.raises(TypeError):
+        view.append(DatasetItemPath('new.jpg'))
+    # materialize
+    copy = view.materialize()
+    assert type(copy) is Dataset
+    assert copy.is_columnar == columnar
+    assert [item.uid for item in copy] == uids[5:15]
+    assert view.to_columns().item_uids == uids[5:15]
+    assert view.boxes().shape == (len(copy.boxes()), 4)
+    copy.append(DatasetItemPath('new.jpg'))
+    assert len(copy) == 11 and len(view) == 10 and len(dataset) == 20
+
+
+def test_materialize_plain_items():
+    items = [DatasetItem(annotations=[Annotation(Bbox(0, 0, 1, 1), labels=['fire'], uid=f'{i}0')], labels=['day'], uid=str(i)) for i in range(4)]
+    dataset = Dataset(items)
+    copy = dataset[1:3].materialize()
+    assert [type(item) for item in copy] == [DatasetItem, DatasetItem]
+    assert [item.uid for item in copy] == ['1', '2']
+    assert [anno.uid for item in copy for anno in item.annotations] == ['10', '20']
+    # copies are independent of the originals
+    copy[0].labels = ['night']
+    copy[0].annotations[0].labels = ['smoke']
+    assert items[1].labels == ('day',) and items[1].annotations[0].labels == ('fire',)
+    assert copy[0].annotations[0].value is items[1].annotations[0].value
+
+
+def _count_naive(dataset, kind: str, of: str):
+    counts = Counter()
+    for item in dataset:
+        for obj in (item.annotations if (of == 'annotations') else [item]):
+            counts.update(getattr(obj, kind))
+    return dict(counts)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_label_counts(columnar):
+    dataset = Dataset(_make_random_items(100), name='random')
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns(), name='random')
+    for of in ['annotations', 'items']:
+        assert dataset.label_counts(of=of) == _count_naive(dataset, 'labels', of)
+        assert dataset.tag_counts(of=of) == _count_naive(dataset, 'tags', of)
+        assert dataset[10:30].label_counts(of=of) == _count_naive(dataset[10:30], 'labels', of)
+    with pytest.raises(KeyError):
+        dataset.label_counts(of='unknown')
+    # counts are updated on append and extend
+    before = dataset.label_counts()
+    dataset.append(DatasetItemPath('a.jpg', labels=['fire'], annotations=[Annotation(Bbox(0, 0, 1, 1), labels=['new'])]))
+    dataset.extend([DatasetItemPath('b.jpg', annotations=[Annotation(Bbox(0, 0, 1, 1), labels=['new', 'fire'])])])
+    assert dataset.label_counts() == {**before, 'new': 2, 'fire': before['fire'] + 1}
+    assert dataset.label_counts() == _count_naive(dataset, 'labels', 'annotations')
+    # counts are updated when annotations are modified, columnar annotations are read-only
+    if not columnar:
+        dataset[0].annotations.append(Annotation(Bbox(0, 0, 1, 1), labels=['other']))
+        assert dataset.label_counts()['other'] == 1
+
+
+@pytest.mark.parametrize('deep', [False, True])
+def test_validate(deep):
+    items = [
+        DatasetItemPath('a.jpg', labels=['fire'], annotations=[Annotation(Bbox(0, 0, 1, 1), labels=['fire'])]),
+        DatasetItemPath('b.jpg', labels=['smoke'], annotations=[Annotation(Bbox(0, 0, 1, 1), labels=['fire'])]),
+    ]
+    dataset = Dataset(items, labels=['fire', 'smoke'], name='labelled')
+    with pytest.raises(DatasetLabelNotFoundError, match='labelled'):
+        dataset.validate(deep=deep)
+    dataset[1].annotations.append(Annotation(Bbox(0, 0, 1, 1), labels=['smoke']))
+    assert dataset.validate(deep=deep) is dataset
+    # views only consider their own items
+    with pytest.raises(DatasetLabelNotFoundError):
+        dataset[:1].validate(deep=deep)
+
+
+def test_slots():
+    # items, annotations and boxes are created in bulk, so they should not have a `__dict__`
+    for obj in [Bbox(0, 0, 1, 1), Annotation(Bbox(0, 0, 1, 1)), DatasetItemPath('a.jpg')]:
+        assert not hasattr(obj, '__dict__')
+        with pytest.raises(AttributeError):
+            obj.unknown_attr = 1
+
+
+def test_labels_interned():
+    a = DatasetItemPath('a.jpg', labels=['smoke', 'fire'], tags=['b', 'a'])
+    b = DatasetItemPath('b.jpg', labels=['fire', 'smoke', 'fire'])
+    # labels are sets, stored as sorted tuples, equal sets share the same tuple
+    assert a.labels == ('fire', 'smoke')
+    assert a.labels is b.labels
+    assert a.tags == ('a', 'b')
+    assert Annotation(Bbox(0, 0, 1, 1), labels=['smoke', 'fire']).labels is a.labels
+    assert DatasetItemPath('c.jpg', labels=[]).labels == ()
+    with pytest.raises(TypeError):
+        DatasetItemPath('d.jpg', labels=['fire', 1])
+
+
+def test_isinstance_cached():
+    class Base(metaclass=ABCMeta):
+        pass
+    class Other(object):
+        pass
+    assert isinstance_cached(Other(), Other)
+    assert not isinstance_cached(Other(), Base)
+    # virtual subclasses registered after the first check are detected
+    Base.register(Other)
+    assert isinstance_cached(Other(), Base)
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
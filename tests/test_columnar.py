@@ -0,0 +1,177 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+import numpy as np
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import BboxColumns
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _make_items():
+    return [
+        DatasetItemPath('a.jpg', uid='a', labels=['day'], annotations=[
+            Annotation(Bbox(0.0, 0.0, 0.5, 0.5), labels=['fire'], uid='a0'),
+            Annotation(Bbox(0.25, 0.25, 0.75, 1.0), labels=['smoke'], tags=['occluded'], uid='a1'),
+        ]),
+        DatasetItemPath('b.jpg', uid='b'),
+        DatasetItemPath('c.jpg', uid='c', tags=['night'], annotations=[
+            Annotation(Bbox(0.5, 0.5, 1.0, 1.0), labels=['fire'], uid='c0'),
+        ]),
+    ]
+
+
+def _summarise(items):
+    return [
+        (item.uid, item.path, item.labels, item.tags, [(anno.uid, anno.labels, anno.tags, anno.value.get_xyxy()) for anno in item.annotations])
+        for item in items
+    ]
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+def test_columns_roundtrip():
+    items = _make_items()
+    columns = BboxColumns.from_items(items)
+    assert columns.num_items == 3
+    assert columns.num_annotations == 3
+    assert columns.coords.dtype == np.float32
+    assert columns.item_offsets.tolist() == [0, 2, 2, 3]
+    assert columns.label_sets[columns.anno_label_codes[0]] == ('fire',)
+    # views and materialized copies should match the originals
+    assert _summarise(columns.iter_items()) == _summarise(items)
+    assert _summarise(columns.to_items()) == _summarise(items)
+
+
+def test_columns_derived_anno_uids():
+    columns = BboxColumns.from_items(_make_items(), anno_uids=False)
+    assert columns.anno_uids is None
+    assert [anno.uid for anno in columns.get_item(0).annotations] == ['a:0', 'a:1']
+    assert columns.get_anno_uids() == ['a:0', 'a:1', 'c:0']
+
+
+def test_columns_concat():
+    items = _make_items()
+    a = BboxColumns.from_items(items[:1])
+    b = BboxColumns.from_items(items[1:])
+    columns = BboxColumns.concat([a, b])
+    assert _summarise(columns.iter_items()) == _summarise(items)
+    # labels are reconciled by value
+    assert sorted(columns.label_sets) == sorted(set(columns.label_sets))
+
+
+def test_columns_invalid():
+    with pytest.raises(TypeError):
+        BboxColumns.from_items([object()])
+    with pytest.raises(ValueError):
+        BboxColumns(coords=np.zeros((2, 4)), item_offsets=[0, 1], item_paths=['a.jpg'], item_uids=['a'])
+
+
+def test_columnar_dataset():
+    items = _make_items()
+    dataset = Dataset.from_columns(BboxColumns.from_items(items), labels=['fire', 'smoke'])
+    assert dataset.is_columnar
+    assert len(dataset) == 3
+    assert _summarise(dataset) == _summarise(items)
+    assert _summarise([dataset[0], dataset['b'], dataset[-1]]) == _summarise(items)
+    assert _summarise(dataset[1:]) == _summarise(items[1:])
+    assert 'c' in dataset and items[0] in dataset and 'd' not in dataset
+    with pytest.raises(IndexError):
+        dataset[3]
+    # appending is batched, and uid collisions are still checked
+    dataset.append(DatasetItemPath('d.jpg', uid='d', annotations=[Annotation(Bbox(0, 0, 1, 1), labels=['smoke'])]))
+    with pytest.raises(KeyError):
+        dataset.append(DatasetItemPath('a.jpg', uid='a'))
+    assert len(dataset) == 4
+    assert dataset['d'].annotations[0].labels == ('smoke',)
+    assert dataset.to_columns().num_annotations == 4
+    # annotation lists of views are read-only
+    with pytest.raises(TypeError):
+        dataset[0].annotations.append(Annotation(Bbox(0, 0, 1, 1)))
+
+
+def test_columnar_views_write_through():
+    dataset = Dataset.from_columns(BboxColumns.from_items(_make_items()))
+    bbox = dataset['a'].annotations[0].value
+    bbox.x1 = 0.25
+    assert dataset.to_columns().coords[0].tolist() == [0.0, 0.0, 0.25, 0.5]
+    assert dataset['a'].annotations['a0'].value.get_xywh() == (0.0, 0.0, 0.25, 0.5)
+
+
+def test_columnar_item_cache():
+    items = _make_items()
+    dataset = Dataset.from_columns(BboxColumns.from_items(items))
+    dataset._items._cache_size = 2
+    # recently accessed items are reused, least recently used items are dropped
+    a, b = dataset['a'], dataset[1]
+    assert (dataset[0] is a) and (dataset['b'] is b)
+    c = dataset['c']
+    assert (dataset['c'] is c) and (dataset['b'] is b) and (dataset['a'] is not a)
+    # appending replaces the columns, so cached items are dropped
+    dataset.append(DatasetItemPath('d.jpg', uid='d'))
+    assert (dataset['b'] is not b) and (dataset['d'].path == 'd.jpg')
+    assert _summarise(dataset[:3]) == _summarise(items)
+
+
+def test_columnar_uid_lookup():
+    columns = BboxColumns.from_items(_make_items())
+    # duplicate uids are found when checked, or deferred until the first lookup
+    duplicated = BboxColumns.concat([columns, columns])
+    with pytest.raises(KeyError):
+        Dataset.from_columns(duplicated)
+    dataset = Dataset.from_columns(duplicated, check_uids=False)
+    with pytest.raises(KeyError, match='already in'):
+        dataset['a']
+    # the lookup is rebuilt from both the columns and the pending items
+    dataset = Dataset.from_columns(columns, check_uids=False)
+    dataset.extend([DatasetItemPath('d.jpg', uid='d'), DatasetItemPath('e.jpg')])
+    dataset._items._invalidate_uid_idxs()
+    assert dataset['d'].path == 'd.jpg'
+    assert dataset._items._get_position(dataset[-1].uid) == 4
+    with pytest.raises(KeyError):
+        dataset.append(DatasetItemPath('b.jpg', uid='b'))
+
+
+def test_dataset_to_columns():
+    dataset = Dataset(_make_items())
+    assert not dataset.is_columnar
+    columns = dataset.to_columns()
+    assert _summarise(columns.iter_items()) == _summarise(dataset)
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,115 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+import os
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+from datasmith import find_duplicate_files
+from datasmith import get_image_cache
+from datasmith import image_cache
+from datasmith import _dedupe
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _write(path, data: bytes) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fp:
+        fp.write(data)
+    return str(path)
+
+
+@pytest.fixture()
+def cache_path(tmp_path):
+    with image_cache(str(tmp_path / 'cache' / 'image_meta.sqlite')) as path:
+        yield path
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+@pytest.mark.parametrize('workers', [0, 4])
+def test_find_duplicate_files(tmp_path, cache_path, workers):
+    big = os.urandom(3 * _dedupe._PARTIAL_HASH_SIZE)
+    paths = [
+        _write(tmp_path / 'a.png', b'aaaa'),
+        _write(tmp_path / 'b.png', b'bbbb'),  # same size, different contents
+        _write(tmp_path / 'sub' / 'c.jpg', b'aaaa'),
+        _write(tmp_path / 'd.bin', big),
+        _write(tmp_path / 'e.bin', big[:-1] + b'\x00'),  # only differs at the end
+        _write(tmp_path / 'f.bin', big),
+        _write(tmp_path / 'g.bin', big[:100] + bytes(1) + big[101:]),  # only differs in the middle
+    ]
+    expected = [[paths[0], paths[2]], [paths[3], paths[5]]]
+    assert sorted(find_duplicate_files(paths, workers=workers)) == expected
+    # hashes are reused from the cache, so unchanged files are not read again
+    assert get_image_cache().get_hashes([(paths[0], os.stat(paths[0]).st_mtime_ns, 4)]) == [(_dedupe._hash_full(paths[0]),) * 2]
+    _hash_partial, _hash_full = _dedupe._hash_partial, _dedupe._hash_full
+    try:
+        _dedupe._hash_partial = _dedupe._hash_full = None
+        assert sorted(find_duplicate_files(paths, workers=workers)) == expected
+    finally:
+        _dedupe._hash_partial, _dedupe._hash_full = _hash_partial, _hash_full
+    # modified files are hashed again
+    _write(paths[1], b'aaaa')
+    os.utime(paths[1], ns=(0, 1))
+    assert sorted(find_duplicate_files(paths, workers=workers)) == [[paths[0], paths[1], paths[2]], [paths[3], paths[5]]]
+    # without a cache
+    with image_cache(None):
+        assert sorted(find_duplicate_files(paths, workers=workers)) == [[paths[0], paths[1], paths[2]], [paths[3], paths[5]]]
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_dataset_dedupe(tmp_path, cache_path, columnar):
+    a = _write(tmp_path / 'a.png', b'same')
+    b = _write(tmp_path / 'b.png', b'diff')
+    c = _write(tmp_path / 'c.png', b'same')
+    dataset = Dataset([
+        DatasetItemPath(a, annotations=[Annotation(Bbox(0.1, 0.1, 0.2, 0.2), labels=['cat'], uid='a0')], labels=['x'], uid='a', image_wh=(4, 4)),
+        DatasetItemPath(b, uid='b'),
+        DatasetItemPath(c, annotations=[Annotation(Bbox(0.3, 0.3, 0.4, 0.4), labels=['dog'], uid='c0')], labels=['y'], tags=['t'], uid='c'),
+        DatasetItemPath(os.path.join(str(tmp_path), '.', 'b.png'), uid='b2'),
+    ], labels=['cat', 'dog'], name='images')
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns(), labels=dataset.labels, name=dataset.name)
+    assert dataset.find_duplicates(workers=2) == [[0, 2], [1, 3]]
+    deduped = dataset.dedupe(workers=2)
+    assert deduped.is_columnar == columnar
+    assert (deduped.name, deduped.labels) == ('images', ('cat', 'dog'))
+    assert [item.uid for item in deduped] == ['a', 'b']
+    # the first item of each group is kept, with everything from the other items
+    item = deduped['a']
+    assert (item.path, item.labels, item.tags, item.image_wh) == (a, ('x', 'y'), ('t',), (4, 4))
+    assert [anno.labels for anno in item.annotations] == [('cat',), ('dog',)]
+    assert len(dataset) == 4
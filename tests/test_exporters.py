@@ -0,0 +1,184 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+
+import json
+import os
+
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import bbox_validation
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+from datasmith import export_coco
+from datasmith import export_voc
+from datasmith import export_yolo
+from datasmith import import_coco
+from datasmith import import_voc
+from datasmith import import_yolo
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _make_dataset(root: str):
+    return Dataset([
+        DatasetItemPath(os.path.join(root, 'images', 'a.jpg'), annotations=[
+            Annotation(Bbox.from_xywh(10, 5, 30, 40, image_wh=(100, 50)), labels=['fire']),
+            Annotation(Bbox.from_xywh(0, 0, 100, 50, image_wh=(100, 50)), labels=['smoke']),
+        ]),
+        DatasetItemPath(os.path.join(root, 'images', 'nested', 'b.jpg')),
+        DatasetItemPath(os.path.join(root, 'images', 'ü.jpg'), annotations=[
+            Annotation(Bbox.from_xywh(5, 5, 2.5, 2.5, image_wh=(10, 10)), labels=['person']),
+        ]),
+    ], labels=['fire', 'smoke'])
+
+
+def _summarise(dataset, image_wh):
+    return [
+        (item.path, [(anno.labels, tuple(round(v, 2) for v in anno.value.get_xywh(image_wh=wh))) for anno in item.annotations])
+        for item, wh in zip(dataset, image_wh)
+    ]
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 100])
+@pytest.mark.parametrize('columnar', [False, True])
+def test_export_coco(tmp_path, chunk_size, columnar):
+    root = str(tmp_path)
+    dataset = _make_dataset(root)
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns(), labels=dataset.labels)
+    image_wh = [(100, 50), (20, 20), (10, 10)]
+    path = os.path.join(root, 'annotations', 'instances_default.json')
+    export_coco(dataset, path, image_wh=image_wh, images_dir=os.path.join(root, 'images'), chunk_size=chunk_size)
+    # check the raw output
+    with open(path) as fp:
+        data = json.load(fp)
+    assert data['images'][1] == {'id': 2, 'width': 20, 'height': 20, 'file_name': os.path.join('nested', 'b.jpg')}
+    assert data['annotations'][0] == {'id': 1, 'image_id': 1, 'category_id': 1, 'bbox': [10, 5, 30, 40], 'area': 1200, 'iscrowd': 0}
+    assert data['categories'] == [{'id': 1, 'name': 'fire', 'supercategory': ''}, {'id': 2, 'name': 'smoke', 'supercategory': ''}, {'id': 3, 'name': 'person', 'supercategory': ''}]
+    # round trip
+    imported = import_coco(root)
+    assert imported.labels == ('fire', 'person', 'smoke')
+    assert _summarise(imported, image_wh) == _summarise(dataset, image_wh)
+
+
+def test_export_coco_invalid(tmp_path):
+    dataset = _make_dataset(str(tmp_path))
+    with pytest.raises(ValueError):
+        export_coco(dataset, str(tmp_path / 'out.json'), image_wh=[(10, 10)])
+    # nan and inf are not valid json
+    with pytest.raises(ValueError, match='image sizes that are not finite'):
+        export_coco(dataset, str(tmp_path / 'out.json'), image_wh=[(10, 10), (float('inf'), 10), (10, 10)])
+    with bbox_validation('off'):
+        nan_dataset = Dataset([DatasetItemPath('nan.jpg', annotations=[Annotation(Bbox(float('nan'), 0, 1, 1), labels=['fire'])], uid='nan')])
+    with pytest.raises(ValueError, match="boxes that are not finite.*'nan'"):
+        export_coco(nan_dataset, str(tmp_path / 'out.json'), image_wh=(10, 10))
+    with pytest.raises(ValueError, match='not finite'):
+        export_voc(nan_dataset, str(tmp_path / 'voc'), image_wh=(10, 10))
+    dataset.append(DatasetItemPath('c.jpg', annotations=[Annotation(Bbox(0, 0, 1, 1), labels=['fire', 'smoke'])]))
+    with pytest.raises(ValueError, match='exactly one label'):
+        export_coco(dataset, str(tmp_path / 'out.json'), image_wh=(10, 10))
+    # views and empty datasets
+    export_coco(dataset[:0], str(tmp_path / 'empty.json'), image_wh=(10, 10))
+    with open(tmp_path / 'empty.json') as fp:
+        assert json.load(fp)['images'] == []
+
+
+@pytest.mark.parametrize('chunk_size', [1, 100])
+def test_export_yolo(tmp_path, chunk_size):
+    root = str(tmp_path)
+    dataset = _make_dataset(root)
+    export_yolo(dataset, root, images_dir=os.path.join(root, 'images'), chunk_size=chunk_size)
+    # check the raw output
+    with open(os.path.join(root, 'classes.txt')) as fp:
+        assert fp.read() == 'fire\nsmoke\nperson\n'
+    with open(os.path.join(root, 'labels', 'a.txt')) as fp:
+        assert fp.read() == '0 0.250000 0.500000 0.300000 0.800000\n1 0.500000 0.500000 1.000000 1.000000\n'
+    with open(os.path.join(root, 'labels', 'nested', 'b.txt')) as fp:
+        assert fp.read() == ''
+    # round trip, the image files need to exist
+    for item in dataset:
+        os.makedirs(os.path.dirname(item.path), exist_ok=True)
+        open(item.path, 'w').close()
+    imported = import_yolo(root)
+    assert imported.labels == ('fire', 'person', 'smoke')
+    image_wh = [(1, 1)] * 3
+    assert sorted(_summarise(imported, image_wh)) == sorted(_summarise(dataset, image_wh))
+    # labels can be fixed
+    with pytest.raises(ValueError, match='one known label'):
+        export_yolo(dataset, root, labels=['fire', 'smoke'])
+    # items with the same file name in different directories would overwrite each other
+    with pytest.raises(ValueError, match='would be written for both'):
+        export_yolo(Dataset([DatasetItemPath('x/a.jpg'), DatasetItemPath('y/a.jpg')]), os.path.join(root, 'flat'), chunk_size=chunk_size)
+    export_yolo(Dataset([DatasetItemPath('x/a.jpg'), DatasetItemPath('y/a.jpg')]), os.path.join(root, 'nested'), images_dir='.', chunk_size=chunk_size)
+    assert sorted(os.listdir(os.path.join(root, 'nested', 'labels'))) == ['x', 'y']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 100])
+def test_export_voc(tmp_path, chunk_size):
+    root = str(tmp_path)
+    dataset = _make_dataset(root)
+    dataset[0].annotations[0].tags = ['difficult', 'reviewed']
+    image_wh = [(100, 50), (20, 10), (10, 10)]
+    export_voc(dataset, root, images_dir=os.path.join(root, 'images'), image_wh=image_wh, chunk_size=chunk_size)
+    # check the raw output, boxes are rounded to whole pixels by default
+    with open(os.path.join(root, 'Annotations', 'nested', 'b.xml')) as fp:
+        text = fp.read()
+    assert '<folder>nested</folder>' in text and '<filename>b.jpg</filename>' in text and '<object>' not in text
+    with open(os.path.join(root, 'Annotations', 'a.xml')) as fp:
+        text = fp.read()
+    assert text.count('<object>') == 2
+    assert '<xmin>10</xmin>' in text and '<ymax>45</ymax>' in text and '<difficult>1</difficult>' in text
+    with open(os.path.join(root, 'Annotations', 'ü.xml')) as fp:
+        assert '<xmax>8</xmax>' in fp.read()
+    # round trip, including the image sizes and flags
+    export_voc(dataset, root, images_dir=os.path.join(root, 'images'), image_wh=image_wh, precision=None, chunk_size=chunk_size)
+    imported = import_voc(root, rel_images_dir='images')
+    assert imported.labels == ('fire', 'person', 'smoke')
+    assert sorted(_summarise(imported, image_wh)) == sorted(_summarise(dataset, image_wh))
+    assert sorted(item._get_known_image_wh() for item in imported) == sorted(image_wh)
+    assert imported.tag_counts() == {'difficult': 1}
+    with pytest.raises(ValueError, match='exactly one label'):
+        export_voc(Dataset([DatasetItemPath('x.jpg', annotations=[Annotation(Bbox(0, 0, 1, 1))])]), root, image_wh=(10, 10))
+    # items with the same file name in different directories would overwrite each other
+    with pytest.raises(ValueError, match='would be written for both'):
+        export_voc(Dataset([DatasetItemPath('x/a.jpg'), DatasetItemPath('y/a.jpg')]), os.path.join(root, 'flat'), image_wh=(10, 10), chunk_size=chunk_size)
+    export_voc(Dataset([DatasetItemPath('x/a.jpg'), DatasetItemPath('y/a.jpg')]), os.path.join(root, 'nested'), images_dir='.', image_wh=(10, 10), chunk_size=chunk_size)
+    assert sorted(os.listdir(os.path.join(root, 'nested', 'Annotations'))) == ['x', 'y']
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,189 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+
+import json
+import os
+import struct
+import zlib
+import pytest
+
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+from datasmith import ImageFormatError
+from datasmith import export_coco
+from datasmith import get_image_cache
+from datasmith import image_cache
+from datasmith import import_coco
+from datasmith import probe_images
+from datasmith import read_image_wh
+from datasmith import _images
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _png(w: int, h: int) -> bytes:
+    ihdr = struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr)) + b'\x00' * 64
+
+
+def _bmp(w: int, h: int, core: bool = False) -> bytes:
+    dib = struct.pack('<IHHHH', 12, w, h, 1, 24) if core else struct.pack('<IiiHH', 40, w, h, 1, 24) + b'\x00' * 24
+    return b'BM' + struct.pack('<IHHI', 14 + len(dib), 0, 0, 14 + len(dib)) + dib
+
+
+def _jpeg(w: int, h: int, sof: int = 0xC0) -> bytes:
+    app0 = b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    dqt = b'\x00' + bytes(64)
+    frame = struct.pack('>BHHB', 8, h, w, 3) + b'\x01\x22\x00\x02\x11\x01\x03\x11\x01'
+    segment = lambda marker, payload: bytes([0xFF, marker]) + struct.pack('>H', len(payload) + 2) + payload
+    # includes fill bytes before a marker, and a segment that contains 0xFF bytes
+    return b'\xff\xd8' + segment(0xE0, app0) + b'\xff' + segment(0xDB, dqt) + segment(0xE1, b'\xff\xc0\xff\xff') + segment(sof, frame) + b'\xff\xda\x00\x02\xff\xd9'
+
+
+def _write(path, data: bytes) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fp:
+        fp.write(data)
+    return str(path)
+
+
+@pytest.fixture()
+def cache_path(tmp_path):
+    with image_cache(str(tmp_path / 'cache' / 'image_meta.sqlite')) as path:
+        yield path
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+def test_read_image_wh(tmp_path):
+    assert read_image_wh(_write(tmp_path / 'a.png', _png(640, 480))) == (640, 480)
+    assert read_image_wh(_write(tmp_path / 'a.bmp', _bmp(33, -17))) == (33, 17)
+    assert read_image_wh(_write(tmp_path / 'b.bmp', _bmp(12, 34, core=True))) == (12, 34)
+    assert read_image_wh(_write(tmp_path / 'a.jpg', _jpeg(1920, 1080))) == (1920, 1080)
+    assert read_image_wh(_write(tmp_path / 'b.jpg', _jpeg(3, 5, sof=0xC2))) == (3, 5)
+    # invalid images
+    with pytest.raises(ImageFormatError):
+        read_image_wh(_write(tmp_path / 'a.gif', b'GIF89a' + bytes(20)))
+    with pytest.raises(ImageFormatError):
+        read_image_wh(_write(tmp_path / 'c.jpg', _jpeg(10, 10)[:30]))
+    with pytest.raises(FileNotFoundError):
+        read_image_wh(str(tmp_path / 'missing.png'))
+
+
+@pytest.mark.parametrize('workers', [0, 4])
+def test_probe_images(tmp_path, cache_path, workers):
+    paths = [_write(tmp_path / 'images' / f'{i}.png', _png(i + 1, 2 * i + 1)) for i in range(100)]
+    metas = probe_images(paths, workers=workers)
+    assert [(m.width, m.height) for m in metas] == [(i + 1, 2 * i + 1) for i in range(100)]
+    assert metas[0].size_bytes == os.path.getsize(paths[0])
+    assert metas[0].mtime == pytest.approx(os.path.getmtime(paths[0]))
+    # sizes are read from the cache, even if the header changes while the modification time and size stay the same
+    st = os.stat(paths[0])
+    with open(paths[0], 'r+b') as fp:
+        fp.seek(16)
+        fp.write(struct.pack('>II', 7, 7))
+    os.utime(paths[0], ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert probe_images(paths[:1], workers=workers)[0].width == 1
+    # modified files are read again
+    _write(paths[1], _png(5, 6))
+    os.utime(paths[1], ns=(0, 1))
+    metas = probe_images(paths, workers=workers)
+    assert (metas[1].width, metas[1].height) == (5, 6)
+    # without a cache
+    with image_cache(None):
+        assert get_image_cache() is None
+        assert probe_images(paths[1:2])[0].width == 5
+
+
+def test_image_cache_opt_in(tmp_path, monkeypatch):
+    # disabled by default, so nothing is written to the home directory
+    monkeypatch.delenv('DATASMITH_CACHE_DIR', raising=False)
+    assert _images._get_default_cache() is None
+    # enabled with the env var, the file is only created when first used
+    monkeypatch.setenv('DATASMITH_CACHE_DIR', str(tmp_path / 'cache'))
+    cache = _images._get_default_cache()
+    assert cache.path == str(tmp_path / 'cache' / 'image_meta.sqlite')
+    assert not os.path.exists(tmp_path / 'cache')
+    assert cache.get_many([('a.png', 0, 0)]) == [None]
+    assert os.path.exists(cache.path)
+    cache.close()
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_item_image_meta(tmp_path, cache_path, columnar):
+    items = [
+        DatasetItemPath(_write(tmp_path / 'a.png', _png(10, 20))),
+        DatasetItemPath(_write(tmp_path / 'b.jpg', _jpeg(30, 40)), image_wh=(300, 400)),
+        DatasetItemPath(_write(tmp_path / 'c.bmp', _bmp(50, 60))),
+    ]
+    dataset = Dataset(items)
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns())
+        assert dataset.to_columns().item_wh.tolist() == [[0, 0], [300, 400], [0, 0]]
+    # lazily resolved, known sizes are not read from the file
+    assert (dataset[0].width, dataset[0].height) == (10, 20)
+    assert dataset[1].image_wh == (300, 400)
+    assert dataset[2].size_bytes == os.path.getsize(tmp_path / 'c.bmp')
+    assert dataset[2].mtime == pytest.approx(os.path.getmtime(tmp_path / 'c.bmp'))
+    assert dataset.probe_images(workers=2).tolist() == [[10, 20], [300, 400], [50, 60]]
+    if columnar:
+        assert dataset.to_columns().item_wh.tolist() == [[10, 20], [300, 400], [50, 60]]
+    # sizes are kept when converting and saving
+    assert [item.image_wh for item in Dataset.from_columns(dataset.to_columns()).to_columns().to_items()] == [(10, 20), (300, 400), (50, 60)]
+    dataset.save(str(tmp_path / 'dataset.bin'))
+    assert Dataset.load(str(tmp_path / 'dataset.bin')).to_columns().item_wh.tolist() == [[10, 20], [300, 400], [50, 60]]
+
+
+def test_export_coco_image_sizes(tmp_path, cache_path):
+    # importing keeps the image sizes, so exporting does not need them
+    data = {
+        'categories': [{'id': 1, 'name': 'fire'}],
+        'images': [{'id': 1, 'width': 100, 'height': 50, 'file_name': 'a.jpg'}, {'id': 2, 'width': 20, 'height': 10, 'file_name': 'b.jpg'}],
+        'annotations': [{'id': 1, 'image_id': 2, 'category_id': 1, 'bbox': [1, 2, 3, 4]}],
+    }
+    _write(tmp_path / 'coco' / 'annotations' / 'instances_default.json', json.dumps(data).encode())
+    dataset = import_coco(str(tmp_path / 'coco'))
+    assert [item.image_wh for item in dataset] == [(100, 50), (20, 10)]
+    export_coco(dataset, str(tmp_path / 'out.json'))
+    with open(tmp_path / 'out.json') as fp:
+        exported = json.load(fp)
+    assert [(image['width'], image['height']) for image in exported['images']] == [(100, 50), (20, 10)]
+    assert exported['annotations'][0]['bbox'] == [1, 2, 3, 4]
+    # unknown sizes are probed
+    export_coco(Dataset([DatasetItemPath(_write(tmp_path / 'a.png', _png(10, 20)))]), str(tmp_path / 'out.json'))
+    with open(tmp_path / 'out.json') as fp:
+        assert json.load(fp)['images'][0]['width'] == 10
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,392 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+
+from datasmith import Bbox
+from datasmith import BboxBoundsError
+from datasmith import DatasetItemPath
+from datasmith import import_coco
+from datasmith import import_coco_many
+from datasmith import import_voc
+from datasmith import import_yolo
+from datasmith import make_source_uid
+from datasmith import iter_coco_items
+from datasmith import bbox_validation
+from datasmith import get_bbox_validation
+from datasmith import uid_strategy
+from datasmith._importers import _CocoStreamIndex
+from datasmith._streaming import JsonStreamReader
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+COCO_DATA = {
+    'licenses': [{'name': '', 'id': 0, 'url': ''}],
+    'info': {'contributor': 'ünïcödé', 'description': ''},
+    'categories': [
+        {'id': 1, 'name': 'fire', 'supercategory': ''},
+        {'id': 2, 'name': 'smoke', 'supercategory': ''},
+    ],
+    'images': [
+        {'id': 1, 'width': 100, 'height': 50, 'file_name': 'a.jpg'},
+        {'id': 2, 'width': 200, 'height': 100, 'file_name': 'b.jpg'},
+        {'id': 3, 'width': 10, 'height': 10, 'file_name': 'c.jpg'},
+    ],
+    'annotations': [
+        {'id': 1, 'image_id': 2, 'category_id': 2, 'bbox': [10, 20, 30, 40], 'attributes': {'occluded': False}},
+        {'id': 2, 'image_id': 1, 'category_id': 1, 'bbox': [0, 0, 50, 25.5], 'attributes': {'occluded': True}},
+        {'id': 3, 'image_id': 2, 'category_id': 1, 'bbox': [0.5, 1.5, 2.5, 3.5], 'attributes': {}},
+    ],
+}
+
+
+@pytest.fixture()
+def coco_root(tmp_path):
+    os.makedirs(tmp_path / 'annotations')
+    with open(tmp_path / 'annotations' / 'instances_default.json', 'w') as fp:
+        json.dump(COCO_DATA, fp, indent=2, ensure_ascii=False)
+    return str(tmp_path)
+
+
+def _summarise(dataset):
+    return [
+        (item.path, [(anno.labels, anno.value.get_xyxy()) for anno in item.annotations])
+        for item in dataset
+    ]
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 1 << 20])
+def test_json_stream_reader(chunk_size):
+    data = json.dumps(COCO_DATA, indent=1, ensure_ascii=False).encode('utf-8')
+    reader = JsonStreamReader(io.BytesIO(data), chunk_size=chunk_size)
+    seen = {}
+    for key in reader.iter_object_keys():
+        if key == 'annotations':
+            seen[key] = []
+            for anno, offset, length in reader.iter_array():
+                # byte offsets must point back at the original encoded value
+                assert json.loads(data[offset:offset+length]) == anno
+                seen[key].append(anno)
+        elif key == 'images':
+            # the offset of the read head is kept, even when the offsets of the elements are not
+            offset = reader.offset
+            assert data[offset:].lstrip().startswith(b'[')
+            seen[key] = list(reader.iter_array_values())
+        else:
+            seen[key], _, _ = reader.read_value()
+    assert seen == COCO_DATA
+    assert reader.offset == len(data)
+
+
+def test_json_stream_reader_invalid():
+    with pytest.raises(ValueError):
+        list(JsonStreamReader(io.BytesIO(b'[1, 2]')).iter_object_keys())
+    with pytest.raises(ValueError):
+        list(JsonStreamReader(io.BytesIO(b'[1, 2 3]')).iter_array())
+    with pytest.raises(ValueError):
+        list(JsonStreamReader(io.BytesIO(b'[1, 2 3]')).iter_array_values())
+    assert list(JsonStreamReader(io.BytesIO(b' [ ] ')).iter_array_values()) == []
+
+
+def test_import_coco_streaming(coco_root):
+    dataset = import_coco(coco_root)
+    streamed = import_coco(coco_root, streaming=True)
+    assert streamed.labels == dataset.labels
+    assert _summarise(streamed) == _summarise(dataset)
+    assert _summarise(iter_coco_items(coco_root)) == _summarise(dataset)
+    # check the conversion
+    assert [len(item.annotations) for item in streamed] == [1, 2, 0]
+    assert streamed[1].annotations[0].value.get_xywh(image_wh=(200, 100)) == pytest.approx((10, 20, 30, 40))
+
+
+def test_import_coco_streaming_order(tmp_path, coco_root):
+    expected = _summarise(import_coco(coco_root))
+    # annotations grouped by image in the same order as the images, before the images, with an unknown image
+    annotations = sorted(COCO_DATA['annotations'], key=lambda anno: anno['image_id'])
+    annotations.append({'id': 4, 'image_id': 9, 'category_id': 1, 'bbox': [0, 0, 1, 1]})
+    data = {'annotations': annotations, 'images': COCO_DATA['images'], 'categories': COCO_DATA['categories']}
+    root, rel_file = _write_coco(tmp_path / 'ordered', 'annotations/instances_default.json', data)
+    assert _summarise(import_coco(root, streaming=True)) == [(path.replace(coco_root, root), annos) for path, annos in expected]
+    # only the annotations of the next image are kept in memory
+    index = _CocoStreamIndex(os.path.join(root, rel_file), chunk_size=16, load_annotations=False)
+    assert not index.annotations
+    assert [(len(records), len(index.annotations)) for records in index._iter_image_records()] == [(6, 0), (12, 0), (0, 0)]
+    # otherwise the annotations of images that come later are kept until they are reached
+    index = _CocoStreamIndex(os.path.join(coco_root, 'annotations/instances_default.json'), load_annotations=False)
+    assert [(len(records), len(index.annotations)) for records in index._iter_image_records()] == [(6, 1), (12, 0), (0, 0)]
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_import_coco_lazy(coco_root, streaming):
+    dataset = import_coco(coco_root)
+    lazy = import_coco(coco_root, streaming=streaming, lazy=True)
+    assert lazy.is_columnar
+    assert (len(lazy) == 3) and (lazy.labels == dataset.labels)
+    assert lazy.label_counts() == dataset.label_counts()
+    summary = lambda d: [(item.path, [anno.labels for anno in item.annotations]) for item in d]
+    assert summary(lazy) == summary(dataset)
+    boxes = lambda d: [anno.value.get_xyxy() for item in d for anno in item.annotations]
+    assert np.allclose(boxes(lazy), boxes(dataset))
+    assert [item._get_known_image_wh() for item in lazy] == [(100, 50), (200, 100), (10, 10)]
+    # items are only built when accessed, then reused
+    assert lazy[1] is lazy[1]
+    assert lazy[lazy[2].uid] is lazy[2]
+    # source uids are the same as for eagerly imported datasets
+    uids = lambda d: [(item.uid, [anno.uid for anno in item.annotations]) for item in d]
+    assert uids(import_coco(coco_root, uid_namespace='ns', lazy=True)) == uids(import_coco(coco_root, uid_namespace='ns'))
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_import_coco_source_uids(coco_root, streaming):
+    a = import_coco(coco_root, streaming=streaming, uid_namespace='fire-smoke')
+    b = import_coco(coco_root, streaming=not streaming, uid_namespace='fire-smoke')
+    c = import_coco(coco_root, streaming=streaming, uid_namespace='other')
+    # re-importing produces the same uids, that differ between namespaces
+    uids = lambda dataset: [(item.uid, [anno.uid for anno in item.annotations]) for item in dataset]
+    assert uids(a) == uids(b)
+    assert not (set(uids(a)[0][1]) & set(uids(c)[0][1]))
+    assert a[0].uid == make_source_uid('fire-smoke', 'image', 1)
+    assert a[0].annotations[0].uid == make_source_uid('fire-smoke', 'annotation', 2)
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_import_coco_validation(tmp_path, streaming):
+    os.makedirs(tmp_path / 'annotations')
+    data = dict(COCO_DATA, annotations=COCO_DATA['annotations'] + [
+        {'id': 4, 'image_id': 3, 'category_id': 1, 'bbox': [5, 5, 10, 10]},
+        {'id': 5, 'image_id': 3, 'category_id': 1, 'bbox': [-5, 5, 10, 10]},
+    ])
+    with open(tmp_path / 'annotations' / 'instances_default.json', 'w') as fp:
+        json.dump(data, fp)
+    # a single warning for the whole dataset
+    with pytest.warns(UserWarning, match='2 of 5 boxes have invalid bounds') as record:
+        import_coco(str(tmp_path), streaming=streaming)
+    assert len(record) == 1
+    with pytest.raises(BboxBoundsError):
+        import_coco(str(tmp_path), streaming=streaming, validation='raise')
+    assert len(import_coco(str(tmp_path), streaming=streaming, validation='off')) == 3
+    # the boxes checked while importing are the same as the boxes of the dataset
+    report = import_coco(str(tmp_path), streaming=streaming, validation='off', uid_namespace='ns').check_bounds()
+    assert report.num_invalid == 2
+    with pytest.raises(BboxBoundsError, match=f'annotation: {repr(report.anno_uids[0])} of item: {repr(report.item_uids[0])}'):
+        import_coco(str(tmp_path), streaming=streaming, validation='raise', uid_namespace='ns')
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_import_coco_keeps_validation_state(tmp_path, streaming):
+    data = dict(COCO_DATA, annotations=COCO_DATA['annotations'] + [
+        {'id': 4, 'image_id': 3, 'category_id': 1, 'bbox': [-5, 5, 10, 10]},
+    ])
+    _write_coco(tmp_path, 'annotations/instances_default.json', data)
+    with bbox_validation('warn-once'):
+        # the single warning is shared by all imports and boxes, the mode is never switched
+        with pytest.warns(UserWarning) as record:
+            dataset = import_coco(str(tmp_path), streaming=streaming)
+            import_coco(str(tmp_path), streaming=streaming)
+            Bbox(x0=-1, y0=0, x1=1, y1=1)
+        assert len(record) == 1
+        assert get_bbox_validation() == 'warn-once'
+    # boxes built without checks are the same as the checked boxes
+    with bbox_validation('off'):
+        assert [anno.value.get_xyxy() for item in dataset for anno in item.annotations] == [
+            Bbox.from_xywh(*anno['bbox'], image_wh=(image['width'], image['height'])).get_xyxy()
+            for image in data['images'] for anno in data['annotations'] if anno['image_id'] == image['id']
+        ]
+
+
+def _write_coco(root, rel_instance_file, data):
+    os.makedirs(os.path.dirname(os.path.join(root, rel_instance_file)), exist_ok=True)
+    with open(os.path.join(root, rel_instance_file), 'w') as fp:
+        json.dump(data, fp)
+    return str(root), rel_instance_file
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_import_coco_many(coco_root, workers):
+    # a second split with different category ids and overlapping image ids
+    data = dict(COCO_DATA, categories=[{'id': 7, 'name': 'Smoke'}, {'id': 8, 'name': 'person'}], images=COCO_DATA['images'][:2], annotations=[
+        {'id': 1, 'image_id': 1, 'category_id': 7, 'bbox': [0, 0, 10, 10]},
+        {'id': 2, 'image_id': 1, 'category_id': 8, 'bbox': [10, 10, 10, 10]},
+    ])
+    val = _write_coco(coco_root, 'annotations/instances_val.json', data)
+    dataset = import_coco_many([coco_root, val], workers=workers, label_map={'Smoke': 'smoke'})
+    assert dataset.is_columnar
+    assert dataset.labels == ('fire', 'person', 'smoke')
+    assert len(dataset) == 5 and len(set(item.uid for item in dataset)) == 5
+    # the same as importing each file separately
+    expected = _summarise(import_coco(coco_root)) + [
+        (os.path.join(coco_root, 'images', 'a.jpg'), [(('smoke',), (0, 0, 0.1, 0.2)), (('person',), (0.1, 0.2, 0.2, 0.4))]),
+        (os.path.join(coco_root, 'images', 'b.jpg'), []),
+    ]
+    for (path, annos), (expected_path, expected_annos) in zip(_summarise(dataset), expected):
+        assert path == expected_path
+        assert [labels for labels, _ in annos] == [labels for labels, _ in expected_annos]
+        assert [xyxy for _, xyxy in annos] == [pytest.approx(xyxy) for _, xyxy in expected_annos]
+    assert dataset.label_counts() == {'fire': 2, 'smoke': 2, 'person': 1}
+    # source uids of overlapping image ids are renamed, or rejected
+    a = import_coco_many([coco_root, val], workers=workers, uid_namespace='fire-smoke')
+    b = import_coco_many([coco_root, val], workers=workers, uid_namespace='fire-smoke')
+    assert [item.uid for item in a] == [item.uid for item in b]
+    assert a[3].uid == make_source_uid('fire-smoke', 'image', 1) + '.1'
+    assert a[3].annotations[0].uid == make_source_uid('fire-smoke', 'annotation', 1)
+    with pytest.raises(KeyError):
+        import_coco_many([coco_root, val], workers=workers, uid_namespace='fire-smoke', on_conflict='raise')
+    assert len(import_coco_many([coco_root, val], workers=workers, uid_namespace=['train', 'val'], on_conflict='raise')) == 5
+    # generated uids come from the uid strategy of this process, even if it cannot be sent to the workers
+    uids = iter(range(1000, 2000))
+    for strategy in ['counter', lambda: f'custom-{next(uids)}']:
+        with uid_strategy(strategy):
+            dataset = import_coco_many([coco_root, val], workers=workers)
+            dataset.append(DatasetItemPath('new.jpg'))
+        assert len(dataset) == 6 and len(set(item.uid for item in dataset)) == 6
+    assert [item.uid for item in dataset][:5] == [f'custom-{i}' for i in range(1000, 1005)]
+
+
+def _write_files(root, files):
+    for rel_path, text in files.items():
+        os.makedirs(os.path.dirname(os.path.join(root, rel_path)), exist_ok=True)
+        with open(os.path.join(root, rel_path), 'w') as fp:
+            fp.write(text)
+    return str(root)
+
+
+def test_import_yolo(tmp_path):
+    root = _write_files(tmp_path, {
+        'classes.txt': 'fire\nsmoke\n',
+        'images/b.jpg': '',
+        'images/a.PNG': '',
+        'images/nested/c.jpg': '',
+        'images/notes.md': '',
+        'labels/a.txt': '0 0.5 0.5 0.2 0.4\n1 0.25 0.25 0.5 0.5\n\n',
+        'labels/nested/c.txt': '1 0.1 0.9 0.2 0.2',
+    })
+    dataset = import_yolo(root)
+    assert dataset.labels == ('fire', 'smoke')
+    assert [os.path.relpath(item.path, root) for item in dataset] == ['images/a.PNG', 'images/b.jpg', 'images/nested/c.jpg']
+    assert [[(anno.labels, pytest.approx(anno.value.get_cxywh())) for anno in item.annotations] for item in dataset] == [
+        [(('fire',), (0.5, 0.5, 0.2, 0.4)), (('smoke',), (0.25, 0.25, 0.5, 0.5))],
+        [],
+        [(('smoke',), (0.1, 0.9, 0.2, 0.2))],
+    ]
+    # class names can be given, or are the class ids
+    assert import_yolo(root, labels=['a', 'b']).label_counts() == {'a': 1, 'b': 2}
+    os.remove(os.path.join(root, 'classes.txt'))
+    assert import_yolo(root, workers=1, chunk_size=1).label_counts() == {'0': 1, '1': 2}
+    with pytest.raises(ValueError, match='out of range'):
+        import_yolo(root, labels=['fire'])
+    # source uids
+    assert import_yolo(root, uid_namespace='yolo')[0].uid == make_source_uid('yolo', 'image', 'a.PNG')
+    # invalid label files
+    _write_files(tmp_path, {'labels/b.txt': '0 0.5 0.5 0.2\n'})
+    with pytest.raises(ValueError, match='b.txt'):
+        import_yolo(root)
+    # lines are checked one at a time, even if the total number of values is a multiple of 5
+    _write_files(tmp_path, {'labels/b.txt': '0 0.5 0.5 0.2\n\n1 0.5 0.5 0.2 0.1 0.3\n'})
+    with pytest.raises(ValueError, match='4 values on line 1 of'):
+        import_yolo(root)
+    _write_files(tmp_path, {'labels/b.txt': '0 0.5 0.5 0.2 0.1\n\n1 0.5 0.5 0.2 0.1 0.3\n'})
+    with pytest.raises(ValueError, match='6 values on line 3 of.*b.txt'):
+        import_yolo(root)
+    _write_files(tmp_path, {'labels/b.txt': '0.5 0.5 0.5 0.2 0.1\n'})
+    with pytest.raises(ValueError, match='integers'):
+        import_yolo(root)
+
+
+VOC_XML = """<annotation>
+    <folder>VOC2007</folder>
+    <filename>{file_name}</filename>
+    <size><width>200</width><height>100</height><depth>3</depth></size>
+    <segmented>0</segmented>
+    {objects}
+</annotation>
+"""
+
+VOC_OBJECT = """<object>
+        <name>{name}</name>
+        <pose>Left</pose>
+        <truncated>{truncated}</truncated>
+        <difficult>{difficult}</difficult>
+        <bndbox><xmin>{box[0]}</xmin><ymin>{box[1]}</ymin><xmax>{box[2]}</xmax><ymax>{box[3]}</ymax></bndbox>
+        <part><name>head</name><bndbox><xmin>1</xmin><ymin>1</ymin><xmax>2</xmax><ymax>2</ymax></bndbox></part>
+    </object>"""
+
+
+def _voc_xml(file_name, *objects):
+    return VOC_XML.format(file_name=file_name, objects=''.join(VOC_OBJECT.format(**o) for o in objects))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_import_voc(tmp_path, workers):
+    root = _write_files(tmp_path, {
+        'Annotations/a.xml': _voc_xml('a.jpg',
+            dict(name='dog', truncated=0, difficult=1, box=(20, 10, 120, 60)),
+            dict(name='person', truncated=1, difficult=0, box=(0, 0, 200, 100)),
+        ),
+        'Annotations/b.xml': _voc_xml('b.png'),
+        'Annotations/nested/c.xml': _voc_xml('c.jpg', dict(name='cat', truncated=0, difficult=0, box=(50.5, 25, 150, 75))),
+        'Annotations/notes.txt': '',
+    })
+    dataset = import_voc(root, workers=workers, chunk_size=1)
+    assert dataset.is_columnar
+    assert dataset.labels == ('cat', 'dog', 'person')
+    assert [os.path.relpath(item.path, root) for item in dataset] == ['JPEGImages/a.jpg', 'JPEGImages/b.png', 'JPEGImages/nested/c.jpg']
+    assert [item._get_known_image_wh() for item in dataset] == [(200, 100)] * 3
+    assert [[(anno.labels, anno.tags, pytest.approx(anno.value.get_xyxy())) for anno in item.annotations] for item in dataset] == [
+        [(('dog',), ('difficult',), (0.1, 0.1, 0.6, 0.6)), (('person',), ('truncated',), (0, 0, 1, 1))],
+        [],
+        [(('cat',), (), (0.2525, 0.25, 0.75, 0.75))],
+    ]
+    # labels can be given, source uids
+    assert import_voc(root, labels=['dog', 'cat', 'person', 'bird']).labels == ('bird', 'cat', 'dog', 'person')
+    with pytest.raises(ValueError, match='not in the given labels'):
+        import_voc(root, labels=['dog'])
+    dataset = import_voc(root, uid_namespace='voc')
+    assert dataset[0].uid == make_source_uid('voc', 'image', 'a.xml')
+    assert dataset[0].annotations[1].uid == make_source_uid('voc', 'annotation', 'a.xml', 1)
+    # invalid files
+    _write_files(tmp_path, {'Annotations/b.xml': '<annotation><object><name>dog</name></object></annotation>'})
+    with pytest.raises(ValueError, match='b.xml'):
+        import_voc(root)
+    _write_files(tmp_path, {'Annotations/b.xml': '<annotation>'})
+    with pytest.raises(ValueError, match='b.xml'):
+        import_voc(root)
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
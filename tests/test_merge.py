@@ -0,0 +1,100 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _make_dataset(prefix: str, uids, labels, columnar: bool = False, **kwargs):
+    items = [
+        DatasetItemPath(f'{prefix}/{uid}.jpg', annotations=[Annotation(Bbox(0.1, 0.1, 0.2, 0.2), labels=[label], uid=f'{uid}-0')], labels=[label], uid=uid)
+        for uid, label in zip(uids, labels)
+    ]
+    dataset = Dataset(items, labels=sorted(set(labels)), **kwargs)
+    return Dataset.from_columns(dataset.to_columns(), labels=dataset.labels, tags=dataset.tags) if columnar else dataset
+
+
+def _summary(dataset):
+    return [(item.uid, item.path, item.labels, [anno.labels for anno in item.annotations]) for item in dataset]
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_merge(columnar):
+    a = _make_dataset('a', ['1', '2'], ['cat', 'dog'], columnar=columnar, tags=['train'])
+    b = _make_dataset('b', ['3', '1'], ['cat', 'smoke'], columnar=not columnar, tags=['val'])
+    c = _make_dataset('c', ['1', '1.1', '4'], ['haze', 'haze', 'dog'])
+    # conflicting uids are renamed with the index of the dataset
+    merged = a.merge(b, c, name='merged')
+    assert merged.is_columnar and merged.name == 'merged'
+    assert [item.uid for item in merged] == ['1', '2', '3', '1.1', '1.2', '1.1.2', '4']
+    assert (merged.labels, merged.tags) == (('cat', 'dog', 'haze', 'smoke'), ('train', 'val'))
+    assert [item.path for item in merged] == ['a/1.jpg', 'a/2.jpg', 'b/3.jpg', 'b/1.jpg', 'c/1.jpg', 'c/1.1.jpg', 'c/4.jpg']
+    assert _summary(Dataset.merge(a, b, c)) == _summary(merged)
+    assert merged['1.1'].annotations[0].labels == ('smoke',)
+    # the sources are not modified
+    assert [item.uid for item in b] == ['3', '1']
+    # conflicting items are skipped, or rejected
+    assert [item.uid for item in a.merge(b, c, on_conflict='skip')] == ['1', '2', '3', '1.1', '4']
+    with pytest.raises(KeyError):
+        a.merge(b, on_conflict='raise')
+    assert len(a.merge(c[1:], on_conflict='raise')) == 4
+    with pytest.raises(KeyError):
+        a.merge(b, on_conflict='replace')
+
+
+def test_merge_label_map():
+    a = _make_dataset('a', ['1', '2'], ['smoke', 'dog'])
+    b = _make_dataset('b', ['3', '4'], ['haze', 'Dog'])
+    # the same label map for every dataset
+    merged = a.merge(b, label_map={'haze': 'smoke', 'Dog': 'dog'})
+    assert merged.labels == ('dog', 'smoke')
+    assert [item.labels for item in merged] == [('smoke',), ('dog',), ('smoke',), ('dog',)]
+    assert [item.annotations[0].labels for item in merged] == [('smoke',), ('dog',), ('smoke',), ('dog',)]
+    assert merged.label_counts() == {'smoke': 2, 'dog': 2}
+    assert len(merged.to_columns().label_sets) == 3
+    # a label map for each dataset
+    merged = a.merge(b, label_map=[{'smoke': 'haze'}, None])
+    assert [item.labels for item in merged] == [('haze',), ('dog',), ('haze',), ('Dog',)]
+    with pytest.raises(ValueError):
+        a.merge(b, label_map=[None])
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,201 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+import io
+import json
+import logging
+import os
+import warnings
+
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+from datasmith import JsonSink
+from datasmith import LoggingSink
+from datasmith import bbox_validation
+from datasmith import get_profiler
+from datasmith import import_coco
+from datasmith import profile_count
+from datasmith import profile_stage
+from datasmith import profiling
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+COCO_DATA = {
+    'categories': [{'id': 1, 'name': 'fire'}, {'id': 2, 'name': 'smoke'}],
+    'images': [
+        {'id': 1, 'file_name': 'a.jpg', 'width': 100, 'height': 50},
+        {'id': 2, 'file_name': 'b.jpg', 'width': 200, 'height': 100},
+    ],
+    'annotations': [
+        {'id': 1, 'image_id': 1, 'category_id': 1, 'bbox': [0, 0, 50, 25]},
+        {'id': 2, 'image_id': 2, 'category_id': 2, 'bbox': [10, 10, 20, 20]},
+        {'id': 3, 'image_id': 2, 'category_id': 1, 'bbox': [0, 0, 200, 100]},
+    ],
+}
+
+
+@pytest.fixture()
+def coco_root(tmp_path):
+    os.makedirs(tmp_path / 'annotations')
+    with open(tmp_path / 'annotations' / 'instances_default.json', 'w') as fp:
+        json.dump(COCO_DATA, fp)
+    return str(tmp_path)
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+def test_profiling_disabled():
+    assert get_profiler() is None
+    # stages are a shared no-op when profiling is disabled
+    with profile_stage('a') as stage:
+        stage.count('items', 10)
+        profile_count('items')
+    assert (not stage.enabled) and (profile_stage('b') is stage)
+
+
+def test_profiling_stages():
+    reports = []
+    with profiling([reports.append]) as profiler:
+        assert get_profiler() is profiler
+        with profile_stage('outer') as outer:
+            outer.count('items', 2)
+            for _ in range(3):
+                # counts are added to the innermost stage, and to the totals
+                with profile_stage('inner'):
+                    profile_count('items', 5)
+        profile_count('warnings')
+    assert get_profiler() is None
+    assert len(reports) == 1
+    report = reports[0]
+    assert report == profiler.report()
+    assert report['counters'] == {'items': 17, 'warnings': 1}
+    assert report['stages']['outer']['calls'] == 1
+    assert report['stages']['outer']['counts'] == {'items': 2}
+    assert report['stages']['inner']['calls'] == 3
+    assert report['stages']['inner']['counts'] == {'items': 15}
+    assert report['stages']['inner']['seconds'] <= report['stages']['outer']['seconds'] <= report['seconds']
+    assert report['peak_bytes'] is None
+    # reports can be serialised
+    assert json.loads(json.dumps(report)) == report
+
+
+def test_profiling_nested():
+    with profiling() as outer:
+        with profiling() as inner:
+            with profile_stage('a'):
+                pass
+        with profile_stage('b'):
+            pass
+    assert list(inner.stages) == ['a']
+    assert list(outer.stages) == ['b']
+
+
+def test_profiling_memory():
+    with profiling(trace_memory=True) as profiler:
+        with profile_stage('outer'):
+            with profile_stage('alloc'):
+                data = bytearray(8 * 1024**2)
+                del data
+            with profile_stage('small'):
+                data = bytearray(1024)
+    stages = profiler.stages
+    assert stages['alloc'].peak_bytes >= 8 * 1024**2
+    assert stages['small'].peak_bytes < 1024**2
+    # the peaks of inner stages are included in the outer stages
+    assert stages['outer'].peak_bytes >= stages['alloc'].peak_bytes
+    assert profiler.peak_bytes >= stages['alloc'].peak_bytes
+
+
+@pytest.mark.parametrize(['streaming', 'lazy'], [(False, False), (True, False), (False, True)])
+def test_profiling_import_coco(coco_root, streaming, lazy):
+    with profiling() as profiler:
+        import_coco(coco_root, streaming=streaming, lazy=lazy, validation='warn')
+    stages = profiler.stages
+    assert stages['import_coco'].counts == {'items': 2, 'annotations': 3}
+    assert stages['import_coco'].rates['items'] > 0
+    assert stages['import_coco.read'].counts['bytes_read'] == os.path.getsize(os.path.join(coco_root, 'annotations', 'instances_default.json'))
+    assert stages['validate_bounds'].counts == {'annotations': 3}
+    assert 'import_coco.build' in stages
+    assert ('dataset.add_items' in stages) == (not lazy)
+    assert ('generate_uids' in stages) == lazy
+
+
+def test_profiling_dataset():
+    items = [DatasetItemPath(f'{i}.jpg', labels=['fire'], annotations=[Annotation(Bbox(0.1, 0.1, 0.2, 0.2), labels=['fire'])]) for i in range(4)]
+    with profiling() as profiler:
+        dataset = Dataset(items[:2], labels=['fire'])
+        dataset.extend(items[2:])
+        dataset.validate()
+        dataset.filter_boxes(min_area=0)
+    stages = profiler.stages
+    assert (stages['dataset.add_items'].calls == 2) and (stages['dataset.add_items'].counts == {'items': 4})
+    assert stages['dataset.index'].counts == {'items': 4}
+    assert stages['dataset.validate'].counts == {'items': 4}
+    assert stages['dataset.spatial_index'].counts == {'annotations': 4}
+
+
+def test_profiling_warnings():
+    with profiling() as profiler:
+        with warnings.catch_warnings(record=True), bbox_validation('warn'):
+            Bbox(0.5, 0.5, 1.5, 0.6)
+        with bbox_validation('collect'):
+            Bbox(0.5, 0.5, 1.5, 0.6)
+    assert profiler.counters == {'bbox_violations': 2, 'warnings': 1}
+
+
+def test_profiling_sinks(tmp_path, caplog):
+    path = str(tmp_path / 'profile.jsonl')
+    fp = io.StringIO()
+    logger = logging.getLogger('test_profiling')
+    with caplog.at_level(logging.INFO, logger='test_profiling'):
+        for _ in range(2):
+            with profiling([JsonSink(path), JsonSink(fp), LoggingSink(logger)]):
+                with profile_stage('stage') as stage:
+                    stage.count('items', 3)
+    # json lines are appended
+    with open(path) as f:
+        reports = [json.loads(line) for line in f]
+    assert len(reports) == 2
+    assert reports[0]['stages']['stage']['counts'] == {'items': 3}
+    assert [json.loads(line) for line in fp.getvalue().splitlines()] == reports
+    # the report is logged as a table
+    assert len(caplog.records) == 2
+    assert 'stage' in caplog.records[0].getMessage() and 'items: 3' in caplog.records[0].getMessage()
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
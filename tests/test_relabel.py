@@ -0,0 +1,223 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+
+import numpy as np
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+from datasmith._index import _DatasetIndex
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _make_dataset(n: int = 300, seed: int = 42, columnar: bool = False):
+    rng = np.random.default_rng(seed)
+    labels, tags = ['smoke', 'fire', 'haze', 'cloud'], ['blurry', 'night']
+    items = []
+    for i in range(n):
+        annotations = [
+            Annotation(Bbox(0.1, 0.1, 0.2, 0.2), labels=rng.choice(labels, size=rng.integers(0, 3), replace=False), tags=rng.choice(tags, size=rng.integers(0, 2)))
+            for _ in range(rng.integers(0, 4))
+        ]
+        items.append(DatasetItemPath(f'{i}.jpg', annotations=annotations, labels=rng.choice(labels, size=rng.integers(0, 2)), uid=str(i)))
+    dataset = Dataset(items, labels=labels, tags=tags)
+    return Dataset.from_columns(dataset.to_columns(), labels=labels, tags=tags) if columnar else dataset
+
+
+def _index_state(index: _DatasetIndex):
+    names = ['item_labels', 'item_tags', 'anno_labels', 'anno_tags', 'item_label_counts', 'item_tag_counts', 'anno_label_counts', 'anno_tag_counts']
+    state = {name: {k: v for k, v in getattr(index, name).items() if v} for name in names}
+    return state, index.unannotated, index.size
+
+
+def _check_index(dataset: Dataset):
+    # the incrementally updated index matches an index built from scratch
+    assert _index_state(dataset._get_stats()) == _index_state(_DatasetIndex().add_items(0, dataset))
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_index_add_columns(columnar):
+    dataset = _make_dataset(columnar=columnar)
+    columns = dataset.to_columns()
+    assert _index_state(_DatasetIndex().add_columns(0, columns)) == _index_state(_DatasetIndex().add_items(0, dataset))
+    idxs = np.asarray([5, 3, 100, 7])
+    expected = _DatasetIndex()
+    for pos, i in enumerate(idxs.tolist()):
+        expected.add(pos + 10, dataset[i])
+    assert _index_state(_DatasetIndex().add_columns(0, columns, idxs, positions=np.arange(4) + 10)) == _index_state(expected)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_set_labels(columnar):
+    dataset = _make_dataset(columnar=columnar)
+    counts = dataset.label_counts()
+    item = dataset[0]
+    item.labels = ['b', 'a', 'a']
+    assert item.labels == ('a', 'b')
+    assert dataset[0].labels == ('a', 'b')
+    assert dataset.label_counts(of='items')['a'] == 1
+    # annotations
+    dataset['1'].annotations[0].tags = ['checked']
+    assert dataset['1'].annotations[0].tags == ('checked',)
+    assert dataset.tag_counts()['checked'] == 1
+    assert dataset.label_counts() == counts
+    _check_index(dataset)
+    with pytest.raises(TypeError):
+        item.labels = [1]
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_relabel(columnar):
+    dataset = _make_dataset(columnar=columnar)
+    expected = [(item.labels, [anno.labels for anno in item.annotations]) for item in dataset]
+    counts = dataset.label_counts()
+    index = dataset._get_index()
+    assert dataset.relabel({'smoke': 'haze', 'cloud': None}) is dataset
+    # updated in place, without rebuilding the index
+    assert dataset._get_index() is index
+    assert dataset.labels == ('fire', 'haze')
+    fn = lambda labels: tuple(sorted({'haze' if (v == 'smoke') else v for v in labels if v != 'cloud'}))
+    assert [(item.labels, [anno.labels for anno in item.annotations]) for item in dataset] == [(fn(l), [fn(a) for a in annos]) for l, annos in expected]
+    assert dataset.label_counts()['fire'] == counts['fire']
+    assert 'smoke' not in dataset.label_counts() and 'cloud' not in dataset.label_counts()
+    assert dataset.label_counts()['haze'] <= counts['smoke'] + counts['haze']
+    _check_index(dataset)
+    assert len(dataset.filter_items(anno_labels=['haze'])) == len(_DatasetIndex().add_items(0, dataset).query(anno_labels=['haze']))
+    assert not dataset.filter_items(item_labels=['smoke'])
+    dataset.validate()
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_relabel_only_annotations(columnar):
+    dataset = _make_dataset(columnar=columnar)
+    item_counts = dataset.label_counts(of='items')
+    dataset.relabel({'fire': 'flame'}, items=False)
+    assert dataset.label_counts(of='items') == item_counts
+    assert 'fire' not in dataset.label_counts()
+    _check_index(dataset)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_relabel_view(columnar):
+    dataset = _make_dataset(columnar=columnar)
+    view = dataset[:100]
+    stats = view._get_stats()
+    view.relabel({'smoke': 'haze'})
+    assert view._get_stats() is stats
+    assert all('smoke' not in item.labels for item in view)
+    assert any('smoke' in item.labels for item in dataset[100:])
+    # the root keeps the old labels, as its other items can still have them
+    assert view.labels == ('cloud', 'fire', 'haze')
+    assert dataset.labels == ('cloud', 'fire', 'haze', 'smoke')
+    _check_index(view)
+    _check_index(dataset)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_relabel_copies(columnar):
+    dataset = _make_dataset(columnar=columnar)
+    counts = dataset.label_counts()
+    summary = lambda d: [(item.labels, [anno.labels for anno in item.annotations]) for item in d]
+    expected = summary(dataset)
+    # datasets derived from another dataset never share its items or annotations
+    for copy in [dataset[0:50].materialize(), dataset.dedupe_boxes()]:
+        copy.relabel({'smoke': 'haze'})
+        assert all(['smoke' not in labels for labels in (item.labels, *[anno.labels for anno in item.annotations])] for item in copy)
+        assert summary(dataset) == expected
+        assert dataset.label_counts() == counts
+        assert dataset.validate()
+        _check_index(dataset)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_retag(columnar):
+    dataset = _make_dataset(columnar=columnar)
+    counts = dataset.tag_counts()
+    dataset.retag({'night': 'dark'})
+    assert dataset.tag_counts() == {('dark' if (k == 'night') else k): v for k, v in counts.items()}
+    assert dataset.tags == ('blurry', 'night')
+    _check_index(dataset)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_tag_items(columnar):
+    dataset = _make_dataset(columnar=columnar)
+    index = dataset._get_index()
+    dataset.tag_items(['3', 5, dataset[7]], 'reviewed')
+    assert sorted(dataset._get_index().item_tags['reviewed']) == [3, 5, 7]
+    dataset.tag_items(np.arange(len(dataset)) < 4, ['reviewed', 'easy'])
+    assert sorted(index.item_tags['reviewed']) == [0, 1, 2, 3, 5, 7]
+    assert dataset[0].tags == ('easy', 'reviewed')
+    # views select their items without accessing them
+    dataset.tag_items(dataset.filter_items(item_tags=['easy']), 'done')
+    assert dataset.tag_counts(of='items')['done'] == 4
+    dataset.untag_items(None, 'reviewed')
+    assert 'reviewed' not in dataset.tag_counts(of='items')
+    assert dataset._get_index() is index
+    _check_index(dataset)
+    # annotations are not tagged
+    assert dataset.tag_counts() == _make_dataset(columnar=columnar).tag_counts()
+    with pytest.raises(KeyError):
+        dataset.tag_items(['missing'], 'reviewed')
+    with pytest.raises(ValueError):
+        dataset.tag_items(np.ones(3, dtype=bool), 'reviewed')
+
+
+def test_tag_items_view():
+    dataset = _make_dataset()
+    view = dataset[10:20]
+    view.tag_items(np.asarray([0, -1]), 'reviewed')
+    assert [item.uid for item in dataset if 'reviewed' in item.tags] == ['10', '19']
+    view.tag_items(view[2:4], 'done')
+    assert [item.uid for item in dataset if 'done' in item.tags] == ['12', '13']
+    with pytest.raises(KeyError):
+        view.tag_items(dataset[:2], 'done')
+    _check_index(view)
+    _check_index(dataset)
+
+
+def test_relabel_invalid():
+    dataset = _make_dataset(n=10)
+    with pytest.raises(TypeError):
+        dataset.relabel(['smoke'])
+    with pytest.raises(TypeError):
+        dataset.relabel({'smoke': 1})
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
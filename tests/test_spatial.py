@@ -0,0 +1,144 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+import numpy as np
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+from datasmith import bbox_area
+from datasmith import bbox_validation
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _make_items(n: int, start: int = 0, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(start, start + n):
+        annotations = []
+        for _ in range(rng.integers(0, 5)):
+            # mostly small boxes, with some large and some out of bounds boxes
+            x, y = rng.uniform(-0.1, 1.0, size=2)
+            w, h = rng.uniform(0, 1.0, size=2) * rng.choice([0.01, 0.1, 1.0])
+            annotations.append(Annotation(Bbox(x, y, x + w, y + h)))
+        items.append(DatasetItemPath(f'{i}.jpg', annotations=annotations, uid=str(i)))
+    return items
+
+
+def _naive_find(dataset, region=None, mode='intersects', min_area=None, max_area=None):
+    # check every box
+    columns = dataset.to_columns(anno_uids=False)
+    b = columns.coords
+    keep = np.ones(len(b), dtype=bool)
+    if region is not None:
+        x0, y0, x1, y1 = region
+        if mode == 'intersects':
+            keep = (b[:, 0] <= x1) & (b[:, 2] >= x0) & (b[:, 1] <= y1) & (b[:, 3] >= y0)
+        elif mode == 'within':
+            keep = (b[:, 0] >= x0) & (b[:, 2] <= x1) & (b[:, 1] >= y0) & (b[:, 3] <= y1)
+        else:
+            keep = (b[:, 0] <= x0) & (b[:, 2] >= x1) & (b[:, 1] <= y0) & (b[:, 3] >= y1)
+    if min_area is not None:
+        keep &= bbox_area(b) >= np.float32(min_area)
+    if max_area is not None:
+        keep &= bbox_area(b) <= np.float32(max_area)
+    rows = np.flatnonzero(keep)
+    item_idxs = columns.anno_item_idxs[rows]
+    return list(zip(item_idxs.tolist(), (rows - columns.item_offsets[item_idxs]).tolist()))
+
+
+QUERIES = [
+    dict(region=(0.2, 0.2, 0.3, 0.4)),
+    dict(region=(0.5, 0.5, 0.5, 0.5)),
+    dict(region=(0.0, 0.0, 1.0, 1.0), mode='within'),
+    dict(region=(0.1, 0.6, 0.7, 0.9), mode='within'),
+    dict(region=(0.45, 0.45, 0.46, 0.46), mode='contains'),
+    dict(min_area=0.1),
+    dict(min_area=0.0001, max_area=0.001),
+    dict(region=(0.9, 0.9, 1.5, 1.5), min_area=0.01),
+    dict(),
+]
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_find_boxes(columnar):
+    with bbox_validation('off'):
+        dataset = Dataset(_make_items(2000))
+        if columnar:
+            dataset = Dataset.from_columns(dataset.to_columns())
+        for query in QUERIES:
+            result = dataset.find_boxes(**query)
+            assert list(zip(result.item_idxs.tolist(), result.anno_idxs.tolist())) == _naive_find(dataset, **query)
+            assert np.allclose(result.boxes, [dataset[i].annotations[k].value.get_xyxy() for i, k in zip(result.item_idxs.tolist(), result.anno_idxs.tolist())])
+        # the index is updated when items are added, both before and after the pending boxes are sorted
+        for start, n in [(2000, 10), (2011, 5000)]:
+            dataset.extend(_make_items(n, start=start, seed=start))
+            dataset.append(_make_items(1, start=start + n, seed=start + n)[0])
+            for query in QUERIES:
+                result = dataset.find_boxes(**query)
+                assert list(zip(result.item_idxs.tolist(), result.anno_idxs.tolist())) == _naive_find(dataset, **query)
+
+
+@pytest.mark.filterwarnings(r'ignore:not \(0 <=')
+def test_find_boxes_views_and_changes():
+    dataset = Dataset(_make_items(500))
+    view = dataset[::-3]
+    result = view.find_boxes(region=(0.2, 0.2, 0.6, 0.6))
+    assert list(zip(result.item_idxs.tolist(), result.anno_idxs.tolist())) == _naive_find(view, region=(0.2, 0.2, 0.6, 0.6))
+    # items with at least one matching box
+    filtered = view.filter_boxes(min_area=0.2)
+    assert [item.uid for item in filtered] == [item.uid for item in view if any(bbox_area(a.value.get_xyxy()) >= np.float32(0.2) for a in item.annotations)]
+    # the index is rebuilt when annotations are added to existing items, or when boxes are clipped
+    dataset[0].annotations.append(Annotation(Bbox(0.0, 0.0, 1.0, 1.0), uid='full'))
+    assert (0, len(dataset[0].annotations) - 1) in zip(*dataset.find_boxes(min_area=1.0)[:2])
+    with bbox_validation('off'):
+        dataset.append(DatasetItemPath('out.jpg', annotations=[Annotation(Bbox(-1.0, -1.0, -0.5, -0.5))]))
+    assert dataset.find_boxes(region=(-1, -1, -0.2, -0.2)).item_idxs.tolist() == [500]
+    dataset.check_bounds(clip=True)
+    assert dataset.find_boxes(region=(-1, -1, -0.2, -0.2)).num_matches == 0
+    assert 500 in dataset.find_boxes(region=(0, 0, 0, 0), mode='within').item_idxs.tolist()
+    # invalid queries
+    with pytest.raises(KeyError):
+        dataset.find_boxes(region=(0, 0, 1, 1), mode='overlaps')
+    with pytest.raises(ValueError):
+        dataset.find_boxes(region=(0.5, 0, 0.4, 1))
+    with pytest.raises(TypeError):
+        dataset.find_boxes(region=0.5)
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,121 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+import numpy as np
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import Dataset
+from datasmith import DatasetItem
+from datasmith import DatasetItemPath
+from datasmith import DatasetView
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _make_dataset(n: int = 1000, seed: int = 42):
+    # a few common labels and some rare labels, with some unannotated items
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(n):
+        annotations = [Annotation(Bbox(0.1, 0.1, 0.2, 0.2), labels=[f'l{min(rng.zipf(1.5), 30)}']) for _ in range(rng.integers(0, 4))]
+        items.append(DatasetItemPath(f'{i}.jpg', annotations=annotations, labels=['even' if i % 2 else 'odd'], uid=str(i)))
+    return Dataset(items)
+
+
+def _uids(splits):
+    return [[item.uid for item in split] for split in splits]
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+@pytest.mark.parametrize('stratify', ['annotation_labels', 'item_labels', None])
+def test_split(stratify):
+    dataset = _make_dataset()
+    splits = dataset.split([0.7, 0.2, 0.1], stratify=stratify, seed=1)
+    # zero-copy views, covering every item exactly once, in the order of the dataset
+    assert all(isinstance(split, DatasetView) and (split.parent is dataset) for split in splits)
+    assert [len(split) for split in splits] == [700, 200, 100]
+    assert sorted(uid for split in _uids(splits) for uid in split) == sorted(item.uid for item in dataset)
+    assert all(np.all(np.diff(split.indices) > 0) for split in splits)
+    # deterministic, and the same for columnar datasets
+    assert _uids(dataset.split([7, 2, 1], stratify=stratify, seed=1)) == _uids(splits)
+    assert _uids(Dataset.from_columns(dataset.to_columns()).split([0.7, 0.2, 0.1], stratify=stratify, seed=1)) == _uids(splits)
+    assert _uids(dataset.split([0.7, 0.2, 0.1], stratify=stratify, seed=2)) != _uids(splits)
+
+
+def test_split_stratified():
+    dataset = _make_dataset()
+    counts = dataset.label_counts()
+    for splits in [dataset.split({'train': 0.8, 'test': 0.2}, seed=s) for s in range(3)]:
+        assert list(splits.keys()) == ['train', 'test']
+        # every label is split close to the ratios, even rare labels
+        for label, count in counts.items():
+            assert abs(splits['test'].label_counts().get(label, 0) - 0.2 * count) <= 1
+    # item labels
+    splits = dataset.split([0.5, 0.5], stratify='item_labels')
+    assert [split.label_counts(of='items') for split in splits] == [{'even': 250, 'odd': 250}] * 2
+
+
+@pytest.mark.parametrize('stratify', ['annotation_labels', 'item_labels', None])
+def test_split_plain_items(stratify):
+    # items that cannot be converted to columns are split from their labels directly
+    paths = _make_dataset(200)
+    dataset = Dataset([DatasetItem(annotations=[Annotation(anno.value, labels=anno.labels) for anno in item.annotations], labels=item.labels, uid=item.uid) for item in paths])
+    splits = dataset.split([0.5, 0.5], stratify=stratify, seed=3)
+    assert [len(split) for split in splits] == [100, 100]
+    assert sorted(uid for split in _uids(splits) for uid in split) == sorted(item.uid for item in dataset)
+    # the same as for items with paths, and for columnar datasets
+    assert _uids(splits) == _uids(paths.split([0.5, 0.5], stratify=stratify, seed=3))
+    assert _uids(splits) == _uids(Dataset.from_columns(paths.to_columns()).split([0.5, 0.5], stratify=stratify, seed=3))
+
+
+def test_split_views_and_invalid():
+    dataset = _make_dataset(100)
+    view = dataset[::2]
+    splits = view.split([0.5, 0.5])
+    assert [split.parent for split in splits] == [dataset, dataset]
+    assert sorted(uid for split in _uids(splits) for uid in split) == sorted(item.uid for item in view)
+    assert [len(split) for split in dataset.split([1, 0])] == [100, 0]
+    with pytest.raises(ValueError):
+        dataset.split([0.5, -0.5])
+    with pytest.raises(ValueError):
+        dataset.split([])
+    with pytest.raises(KeyError):
+        dataset.split([0.5, 0.5], stratify='labels')
+    with pytest.raises(KeyError):
+        DatasetView(dataset, [1, 2, 1])
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #
@@ -0,0 +1,124 @@
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+#  MIT License
+#
+#  Copyright (c) 2022 Nathan Juraj Michlo
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#  ~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~=~
+
+
+
+import numpy as np
+import pytest
+
+from datasmith import Annotation
+from datasmith import Bbox
+from datasmith import Dataset
+from datasmith import DatasetItemPath
+from datasmith._storage import _PackedStrings
+
+
+# ========================================================================= #
+# HELPER                                                                    #
+# ========================================================================= #
+
+
+def _make_dataset():
+    return Dataset([
+        DatasetItemPath('images/ä.jpg', labels=['fire'], tags=['night'], annotations=[
+            Annotation(Bbox(0.1, 0.2, 0.3, 0.4), labels=['fire'], tags=['occluded']),
+            Annotation(Bbox(0.0, 0.0, 1.0, 1.0), labels=['smoke', 'fire']),
+        ]),
+        DatasetItemPath('images/b.jpg'),
+        DatasetItemPath('images/c.jpg', labels=['smoke'], annotations=[Annotation(Bbox(0.5, 0.5, 0.6, 0.7), labels=['smoke'], uid='custom')]),
+    ], labels=['fire', 'smoke'], tags=['night'], name='fire-smoke')
+
+
+def _summarise(dataset):
+    return [
+        (item.uid, item.path, item.labels, item.tags, [(anno.uid, anno.labels, anno.tags, tuple(round(v, 5) for v in anno.value.get_xyxy())) for anno in item.annotations])
+        for item in dataset
+    ]
+
+
+# ========================================================================= #
+# TESTS                                                                     #
+# ========================================================================= #
+
+
+def test_packed_strings():
+    strings = ['a', '', 'ünïcödé', 'hello world']
+    packed = _PackedStrings.from_strings(strings)
+    assert len(packed) == 4
+    assert list(packed) == strings
+    assert [packed[i] for i in range(-4, 4)] == strings + strings
+    assert packed[1:] == strings[1:]
+    with pytest.raises(IndexError):
+        packed[4]
+    assert list(_PackedStrings.from_strings([])) == []
+
+
+@pytest.mark.parametrize('mmap', [False, True])
+@pytest.mark.parametrize('columnar', [False, True])
+def test_save_load(tmp_path, mmap, columnar):
+    dataset = _make_dataset()
+    if columnar:
+        dataset = Dataset.from_columns(dataset.to_columns(), labels=dataset.labels, tags=dataset.tags, name=dataset.name, uid=dataset.uid)
+    path = str(tmp_path / 'dataset.bin')
+    assert dataset.save(path) == path
+    loaded = Dataset.load(path, mmap=mmap)
+    assert loaded.is_columnar
+    assert (loaded.name, loaded.uid, loaded.labels, loaded.tags) == (dataset.name, dataset.uid, dataset.labels, dataset.tags)
+    assert _summarise(loaded) == _summarise(dataset)
+    assert loaded[dataset[2].uid].annotations['custom'].labels == ('smoke',)
+    assert dataset[0].uid in loaded
+    loaded.validate()
+    # modifications are not written back to the file
+    loaded[0].annotations[0].value.x0 = 0.15
+    assert loaded[0].annotations[0].value.x0 == pytest.approx(0.15)
+    assert Dataset.load(path, mmap=mmap)[0].annotations[0].value.x0 == pytest.approx(0.1)
+    # loaded datasets can still be appended to, and saved again
+    loaded.append(DatasetItemPath('images/d.jpg', annotations=[Annotation(Bbox(0, 0, 0.5, 0.5))]))
+    with pytest.raises(KeyError):
+        loaded.append(DatasetItemPath('images/e.jpg', uid=dataset[1].uid))
+    loaded.save(path)
+    reloaded = Dataset.load(path, mmap=mmap)
+    assert len(reloaded) == 4
+    assert _summarise(reloaded) == _summarise(loaded)
+
+
+def test_save_load_views(tmp_path):
+    dataset = _make_dataset()
+    view = dataset.filter_items(anno_labels=['smoke'])
+    view.save(str(tmp_path / 'view.bin'))
+    loaded = Dataset.load(str(tmp_path / 'view.bin'))
+    assert [item.uid for item in loaded] == [item.uid for item in view] == [dataset[1].uid, dataset[2].uid]
+    assert np.allclose(loaded.boxes(), view.boxes())
+
+
+def test_load_invalid(tmp_path):
+    path = tmp_path / 'invalid.bin'
+    path.write_bytes(b'{"not": "a dataset"}')
+    with pytest.raises(ValueError, match='magic'):
+        Dataset.load(str(path))
+
+
+# ========================================================================= #
+# END                                                                       #
+# ========================================================================= #